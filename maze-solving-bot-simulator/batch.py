@@ -0,0 +1,148 @@
+import argparse
+import concurrent.futures
+import csv
+import functools
+import importlib
+import os
+import traceback
+
+import maze_compiler
+import settings
+import simulation
+import utils
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+DEFAULT_SCRIPTS = ["scripts.right_hand_rule.RightHandRule",
+                   "scripts.depth_first_search.DepthFirstSearch",
+                   "scripts.flood_fill.FloodFill",
+                   "optimized.optimized_flood_fill.OptimizedFloodFill",
+                   "scripts.d_star_lite.DStarLite",
+                   "scripts.frontier_exploration.FrontierExploration"]
+DIRECTION_NAMES = ["NORTH", "EAST", "SOUTH", "WEST"]
+CSV_COLUMNS = ["maze", "script", "start_x", "start_y", "start_direction", "finished", "steps", "turns",
+               "sensor_reads", "sensor_cache_hit_rate", "exploration_steps", "final_run_steps", "estimated_run_time",
+               "simulated_time", "loops", "wall_time", "error"]
+
+
+def load_class(path: str):
+    """Load a script class from 'module.ClassName'"""
+    module_name, class_name = path.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def parse_start(value: str) -> tuple:
+    """Parse 'X,Y,DIRECTION' start pose (eg: 14,1,EAST)"""
+    x, y, direction = value.split(",")
+    return int(x), int(y), DIRECTION_NAMES.index(direction.strip().upper())
+
+
+def default_start(maze: maze_compiler.CompiledMaze) -> tuple:
+    """Start pose stored in the maze, otherwise the settings start pose moved to the same corner of a maze
+    of this size"""
+    if maze.start is not None:
+        return maze.start
+
+    side = maze.no_of_squares_per_side
+
+    def same_corner(position: int) -> int:
+        return side if position >= settings.settingsGridSideSquares else min(position, side)
+
+    return same_corner(settings.settingsStartX), same_corner(settings.settingsStartY), settings.settingsFaceDirection
+
+
+def find_mazes(directory: str, grid_side_squares: int) -> list:
+    """Compiled maze paths of all mazes in directory. Images are compiled first (once)."""
+    compiled = set()
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            maze_compiler.load_or_compile(path, grid_side_squares)
+            compiled.add(maze_compiler.compiled_path(path))
+        elif name.lower().endswith(".npz"):
+            compiled.add(path)
+    return sorted(compiled)
+
+
+@functools.lru_cache(maxsize=None)
+def load_maze(path: str) -> maze_compiler.CompiledMaze:
+    """Each worker process loads a maze only once"""
+    return maze_compiler.load(path)
+
+
+def run_one(job: tuple) -> dict:
+    """Run one (maze, script, start pose) combination in a worker process.
+    If start pose is None, default_start of the maze is used."""
+    maze_path, script_path, start, max_steps = job
+    utils.set_headless(True)
+    utils.set_goal_size(settings.settingsGoalSize)
+    maze = load_maze(maze_path)
+    if start is None:
+        start = default_start(maze)
+    start_x, start_y, start_direction = start
+    row = dict(maze=maze_path, script=script_path, start_x=start_x, start_y=start_y,
+               start_direction=DIRECTION_NAMES[start_direction], error="")
+    try:
+        bot = simulation.create_compiled_robot(maze, x=start_x, y=start_y,
+                                               direction=start_direction, max_steps=max_steps)
+        result = simulation.run(load_class(script_path), None, bot)
+        row.update(finished=result.finished, steps=result.steps, turns=result.turns,
+                   sensor_reads=result.sensor_reads,
+                   sensor_cache_hit_rate="{:.3f}".format(result.sensor_cache_hit_rate),
+                   exploration_steps=result.exploration_steps, final_run_steps=result.final_run_steps,
+                   estimated_run_time="{:.2f}".format(result.estimated_run_time),
+                   simulated_time="{:.2f}".format(result.simulated_time), loops=result.loops,
+                   wall_time="{:.6f}".format(result.elapsed_time))
+    except Exception:
+        row.update(finished=False, error=traceback.format_exc(limit=1).strip().splitlines()[-1])
+    return row
+
+
+def format_summary(rows: list, scripts: list) -> str:
+    """Finished runs and total exploration steps of each script (over the runs it finished)"""
+
+    lines = ["{:<52} {:>10} {:>18} {:>12}".format("script", "finished", "exploration steps", "mean")]
+    for script_path in scripts:
+        script_rows = [row for row in rows if row["script"] == script_path]
+        finished = [row for row in script_rows if row["finished"]]
+        exploration_steps = sum(row["exploration_steps"] for row in finished)
+        lines.append("{:<52} {:>10} {:>18} {:>12.1f}".format(
+            script_path, "{}/{}".format(len(finished), len(script_rows)), exploration_steps,
+            exploration_steps / len(finished) if finished else 0.0))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run every (maze, script, start pose) combination in parallel '
+                                                 'and write the results to a CSV file')
+    parser.add_argument('mazes', help='Directory with maze images and/or compiled mazes (.npz)')
+    parser.add_argument('--scripts', nargs='+', default=DEFAULT_SCRIPTS,
+                        help='Script classes as module.ClassName')
+    parser.add_argument('--start', action='append', type=parse_start, default=None,
+                        help='Start pose X,Y,DIRECTION (can be repeated, default from the maze or settings)')
+    parser.add_argument('--grid', type=int, default=settings.settingsGridSideSquares,
+                        help='Number of squares per one side in maze images')
+    parser.add_argument('--max-steps', type=int, default=100000, help='Step limit of each run')
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes (default all cores)')
+    parser.add_argument('--out', default='results.csv', help='Output CSV file')
+    args = parser.parse_args()
+
+    starts = args.start or [None]
+    mazes = find_mazes(args.mazes, args.grid)
+    jobs = [(maze_path, script_path, start, args.max_steps)
+            for maze_path in mazes for script_path in args.scripts for start in starts]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.processes) as executor, \
+            open(args.out, 'w', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        rows = []
+        for done, row in enumerate(executor.map(run_one, jobs, chunksize=4), start=1):
+            writer.writerow(row)
+            rows.append(row)
+            print("[{}/{}] {} {} {}".format(done, len(jobs), os.path.basename(row["maze"]), row["script"],
+                                             row["error"] or row["steps"]))
+    print(format_summary(rows, args.scripts))
+
+
+if __name__ == '__main__':
+    main()
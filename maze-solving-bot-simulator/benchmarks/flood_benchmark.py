@@ -0,0 +1,59 @@
+"""Compares OptimizedFloodFill breadth first search flood fill against the NumPy flood_kernel
+on grids with random walls.
+
+Run from the simulator folder: python -m benchmarks.flood_benchmark
+"""
+import time
+
+import numpy
+
+import maze_compiler
+import simulation
+from datatypes import Direction
+from optimized.optimized_flood_fill import OptimizedFloodFill
+
+SIZES = [14, 32, 64, 128]
+WALL_PROBABILITY = 0.3
+REPEATS = 5
+
+
+def make_script(side_squares: int, rng: numpy.random.Generator) -> OptimizedFloodFill:
+    """Flood fill script of a bot in an empty maze with random walls already known"""
+    maze = maze_compiler.CompiledMaze(numpy.zeros((side_squares, side_squares), numpy.uint8),
+                                      numpy.zeros((side_squares, side_squares), bool), cell_side_length=36)
+    src = OptimizedFloodFill(simulation.create_compiled_robot(maze, 1, 1, Direction.EAST))
+    src.setup()
+    for pos in range(side_squares * side_squares):
+        for neighbor in (pos + 1, pos + side_squares):
+            if rng.random() < WALL_PROBABILITY:
+                src.walls.set_wall(pos, neighbor)
+    return src
+
+
+def time_flood(flood, target: int) -> float:
+    """Best time of REPEATS floods"""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start_time = time.perf_counter()
+        flood(target)
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+
+def main():
+    rng = numpy.random.default_rng(0)
+    print("{:>9} {:>10} {:>10} {:>9} {:>6}".format("grid", "bfs ms", "numpy ms", "speedup", "same"))
+    for side_squares in SIZES:
+        src = make_script(side_squares, rng)
+        goal = src.GOAL
+
+        bfs_time = time_flood(src.flood_fill, goal)
+        bfs_grid = list(src.flooded_grid)
+        numpy_time = time_flood(src.numpy_flood_fill, goal)
+        print("{:>9} {:>10.2f} {:>10.2f} {:>8.1f}x {:>6}".format(
+            "{0}x{0}".format(side_squares), bfs_time * 1e3, numpy_time * 1e3, bfs_time / numpy_time,
+            str(bfs_grid == src.flooded_grid)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Compares the CPU time the scripts spend planning (flood fills, searches and the final run planner)
+on generated mazes, and the node expansions of DStarLite per step.
+
+Run from the simulator folder: python -m benchmarks.planner_benchmark
+"""
+import contextlib
+import io
+
+import instrumentation
+import maze_generator
+import simulation
+import utils
+from optimized.optimized_flood_fill import OptimizedFloodFill
+from scripts.d_star_lite import DStarLite
+from scripts.depth_first_search import DepthFirstSearch
+from scripts.flood_fill import FloodFill
+
+SIZES = [16, 32, 64]
+SEEDS = [0, 1, 2]
+BRAID_FACTOR = 0.3
+# Planning functions of each script ("module:attribute" as instrumentation targets)
+PLANNER_TARGETS = {
+    FloodFill: ["scripts.flood_fill:FloodFill.flood_fill"],
+    OptimizedFloodFill: ["optimized.optimized_flood_fill:OptimizedFloodFill.update_flood_fill"],
+    DepthFirstSearch: ["scripts.depth_first_search:DepthFirstSearch.bfs"],
+    DStarLite: ["scripts.d_star_lite:DStarLite.update_search"],
+}
+COMMON_TARGETS = ["planner:Planner.plan"]
+
+
+def planner_time(src_class, maze) -> tuple:
+    """(planner milliseconds, steps, script) of one run"""
+
+    bot = simulation.create_compiled_robot(maze, *maze.start)
+    profiler = instrumentation.Profiler(PLANNER_TARGETS[src_class] + COMMON_TARGETS)
+    # Scripts print their progress
+    with profiler, contextlib.redirect_stdout(io.StringIO()):
+        result = simulation.run(src_class, None, bot)
+    total_ms = sum(stats["total_ms"] for stats in profiler.stats()["functions"].values())
+    return total_ms, result.steps
+
+
+def main():
+    utils.set_headless(True)
+    print("{:>7} {:<20} {:>12} {:>8}".format("grid", "script", "planner ms", "steps"))
+    for side in SIZES:
+        mazes = [maze_generator.generate(side, maze_generator.ALGORITHM_KRUSKAL, BRAID_FACTOR, seed=seed)
+                 for seed in SEEDS]
+        for src_class in PLANNER_TARGETS:
+            runs = [planner_time(src_class, maze) for maze in mazes]
+            print("{:>7} {:<20} {:>12.1f} {:>8.0f}".format(
+                "{0}x{0}".format(side), src_class.__name__, sum(run[0] for run in runs) / len(runs),
+                sum(run[1] for run in runs) / len(runs)))
+
+        # Expansions per step of the last maze
+        src = DStarLite(simulation.create_compiled_robot(mazes[-1], *mazes[-1].start))
+        with contextlib.redirect_stdout(io.StringIO()):
+            simulation.run(lambda bot: src, None, src.bot)
+        print("{:>7} {}".format("", src.expansion_report()))
+
+
+if __name__ == '__main__':
+    main()
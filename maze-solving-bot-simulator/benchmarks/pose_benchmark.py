@@ -0,0 +1,107 @@
+"""Compares the old Point based bot center (two Points and a generator per sensor read) against
+the cell center table (Robot._center_pixel) per sensor read and per simulated step.
+
+Run from the simulator folder: python -m benchmarks.pose_benchmark
+"""
+import time
+import tracemalloc
+
+import robot
+import utils
+from datatypes import Direction
+
+IMAGE_PATH = "Maze.png"
+GRID_SIDE_SQUARES = 14
+REPEATS = 20000
+
+
+class LegacyPoint:
+    """datatypes.Point as it was before slots and the cell center table"""
+
+    def __init__(self, x: float, y: float):
+        self.x = x
+        self.y = y
+
+    def __sub__(self, other):
+        if type(other) is float or type(other) is int:
+            return LegacyPoint(self.x - other, self.y - other)
+        if type(other) is tuple or type(other) is list:
+            return LegacyPoint(self.x - other[0], self.y - other[1])
+        if type(other) is LegacyPoint:
+            return LegacyPoint(self.x - other.x, self.y - other.y)
+        return self
+
+    def __iter__(self):
+        yield int(self.x)
+        yield int(self.y)
+
+
+class LegacyRobot(robot.Robot):
+    """Robot computing its center with points for every sensor read, as before"""
+
+    def _center_pixel(self) -> tuple:
+        corner = LegacyPoint(self._x * self.cell_side_length, self._y * self.cell_side_length)
+        return tuple(corner - self.cell_side_length * 0.5)
+
+    def pose(self) -> tuple:
+        return self._x, self._y, self._direction
+
+
+def make_bot(bot_class, wall_map, ground_map) -> robot.Robot:
+    return bot_class(x=1, y=1, direction=Direction.EAST, wall_map=wall_map, ground_map=ground_map,
+                     no_of_squares_per_side=GRID_SIDE_SQUARES,
+                     cell_side_length=len(wall_map) // GRID_SIDE_SQUARES)
+
+
+def step(bot: robot.Robot):
+    """What a script does in one cell: read all sensors, check the pose and move"""
+    bot.front_sensor()
+    bot.left_sensor()
+    bot.right_sensor()
+    bot.ground_sensor()
+    bot.pose()
+    bot.go_forward()
+    if bot._x > GRID_SIDE_SQUARES:
+        bot._x = 1
+
+
+def measure(function, bot: robot.Robot) -> tuple:
+    """(microseconds per call, peak bytes allocated by one call)"""
+
+    start_time = time.perf_counter()
+    for _ in range(REPEATS):
+        function(bot)
+    elapsed_time = time.perf_counter() - start_time
+
+    # Warm up once so lazily created objects are not counted
+    function(bot)
+    tracemalloc.start()
+    peak = 0
+    for _ in range(100):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        function(bot)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return 1e6 * elapsed_time / REPEATS, peak
+
+
+def main():
+    img = utils.open_image(IMAGE_PATH)
+    wall_map = utils.apply_vision_filter(img)
+    ground_map = utils.apply_ground_filter(img)
+    cases = [("center", lambda bot: bot._center_pixel()),
+             ("sensor read", lambda bot: bot.front_sensor()),
+             ("step", step)]
+
+    print("{:<12} {:>12} {:>12} {:>9} {:>12} {:>12}".format(
+        "", "old us", "new us", "speedup", "old bytes", "new bytes"))
+    for name, function in cases:
+        old_time, old_bytes = measure(function, make_bot(LegacyRobot, wall_map, ground_map))
+        new_time, new_bytes = measure(function, make_bot(robot.Robot, wall_map, ground_map))
+        print("{:<12} {:>12.3f} {:>12.3f} {:>8.2f}x {:>12} {:>12}".format(
+            name, old_time, new_time, old_time / new_time, old_bytes, new_bytes))
+
+
+if __name__ == '__main__':
+    main()
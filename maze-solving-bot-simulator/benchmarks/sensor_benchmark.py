@@ -0,0 +1,80 @@
+"""Compares pixel ray casting (Robot._send_signal) against distance map lookups (Robot._read_distance_map).
+
+Run from the simulator folder: python -m benchmarks.sensor_benchmark
+"""
+import time
+
+import numpy
+
+import robot
+import utils
+from datatypes import Direction
+
+IMAGE_PATH = "Maze.png"
+GRID_SIDE_SQUARES = 14
+# Larger mazes are generated by tiling the maze image TILES x TILES times
+TILES = [1, 2, 4, 8]
+
+
+def make_bot(img: numpy.array, grid_side_squares: int) -> robot.Robot:
+    """Create a bot in the top left cell of the image"""
+    walls = utils.apply_vision_filter(img)
+    ground = utils.apply_ground_filter(img)
+    return robot.Robot(x=1, y=1, direction=Direction.EAST, wall_map=walls, ground_map=ground,
+                       no_of_squares_per_side=grid_side_squares,
+                       cell_side_length=len(img) // grid_side_squares)
+
+
+def time_sensor_reads(bot: robot.Robot, sensor) -> tuple:
+    """Read all 4 directions in every cell. Returns (seconds, readings)"""
+    readings = []
+    start_time = time.perf_counter()
+    for x in range(1, bot.no_of_squares_per_side + 1):
+        for y in range(1, bot.no_of_squares_per_side + 1):
+            bot._x, bot._y = x, y
+            for direction in range(Direction.DIRECTIONS):
+                try:
+                    readings.append(sensor(direction))
+                except IndexError:
+                    # Ray casting left the image
+                    readings.append(None)
+    return time.perf_counter() - start_time, readings
+
+
+def rays_leaving_image(bot: robot.Robot) -> list:
+    """Whether each ray (in time_sensor_reads order) reaches the image border without hitting a barrier.
+    Ray casting either raises or wraps around the image for these, so they are not compared."""
+    leaving = []
+    for x in range(1, bot.no_of_squares_per_side + 1):
+        for y in range(1, bot.no_of_squares_per_side + 1):
+            bot._x, bot._y = x, y
+            pos_x, pos_y = bot._center_pixel()
+            for direction in range(Direction.DIRECTIONS):
+                leaving.append(bot._distanceMaps[direction][pos_y, pos_x] == robot.NO_BARRIER)
+    return leaving
+
+
+def main():
+    img = utils.open_image(IMAGE_PATH)
+    print("{:>9} {:>11} {:>9} {:>12} {:>12} {:>9} {:>6}".format(
+        "grid", "pixels", "build ms", "raycast us", "lookup us", "speedup", "same"))
+    for tiles in TILES:
+        tiled = numpy.tile(img, (tiles, tiles, 1))
+        grid_side_squares = GRID_SIDE_SQUARES * tiles
+
+        start_time = time.perf_counter()
+        bot = make_bot(tiled, grid_side_squares)
+        build_time = time.perf_counter() - start_time
+
+        raycast_time, raycast = time_sensor_reads(bot, bot._send_signal)
+        lookup_time, lookup = time_sensor_reads(bot, bot._read_distance_map)
+        reads = len(raycast)
+        same = all(a == b for a, b, leaving in zip(raycast, lookup, rays_leaving_image(bot)) if not leaving)
+        print("{:>9} {:>11} {:>9.1f} {:>12.2f} {:>12.2f} {:>8.1f}x {:>6}".format(
+            "{0}x{0}".format(grid_side_squares), "{}x{}".format(tiled.shape[1], tiled.shape[0]),
+            build_time * 1e3, raycast_time / reads * 1e6, lookup_time / reads * 1e6,
+            raycast_time / lookup_time, str(same)))
+
+
+if __name__ == '__main__':
+    main()
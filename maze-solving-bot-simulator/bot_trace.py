@@ -0,0 +1,161 @@
+import struct
+
+import numpy
+
+# Trace file layout:
+#   header: magic, version, squares per side, cell side length, start x, start y, start direction, maze hash
+#   events: one byte each, opcode in the top 3 bits.
+#     Sensor events keep the reading in the low 5 bits as the number of whole cells to the wall
+#     (distance // cell_side_length, read back as cell_side_length // 2 + cells * cell_side_length, so walls
+#     next to the bot are still closer than a cell). Readings of SENSOR_ESCAPE cells or more store SENSOR_ESCAPE
+#     followed by the distance as an uint16. OP_OTHER events use the low bits for a sub code.
+MAGIC = b"MZTR"
+VERSION = 1
+HEADER = struct.Struct("<4sBHHHHB16s")
+
+OP_FORWARD = 0
+OP_BACKWARD = 1
+OP_TURN_RIGHT = 2
+OP_TURN_LEFT = 3
+OP_FRONT_SENSOR = 4
+OP_LEFT_SENSOR = 5
+OP_RIGHT_SENSOR = 6
+OP_OTHER = 7
+
+SENSOR_ESCAPE = 0x1F
+DISTANCE = struct.Struct("<H")
+
+OTHER_GROUND_FALSE = 0
+OTHER_GROUND_TRUE = 1
+OTHER_PHASE = 2  # followed by name length byte and name
+OTHER_BALL_COLOR = 3  # followed by 3 bytes (B, G, R)
+
+BUFFER_SIZE = 1 << 16
+
+
+class TraceWriter:
+    """Logs every move, turn and sensor reading of a bot to a trace file.
+    Create it before the run starts, it is attached to the bot (bot.trace)."""
+
+    def __init__(self, filename: str, bot, maze_hash: bytes = bytes(16)):
+        self.filename = filename
+        self._side = bot.cell_side_length
+        self._file = open(filename, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, bot.no_of_squares_per_side, bot.cell_side_length,
+                                     bot._x, bot._y, bot._direction, maze_hash))
+        self._buffer = bytearray()
+        bot.trace = self
+
+    def move(self, forward: bool):
+        self._event(OP_FORWARD if forward else OP_BACKWARD)
+
+    def turn(self, clockwise: bool):
+        self._event(OP_TURN_RIGHT if clockwise else OP_TURN_LEFT)
+
+    def sensor(self, op: int, distance: int):
+        """Log a distance sensor reading (op is OP_FRONT_SENSOR, OP_LEFT_SENSOR or OP_RIGHT_SENSOR),
+        rounded down to whole cells"""
+
+        cells = distance // self._side
+        if 0 <= cells < SENSOR_ESCAPE:
+            self._buffer.append(op << 5 | cells)
+        else:
+            self._buffer.append(op << 5 | SENSOR_ESCAPE)
+            self._buffer += DISTANCE.pack(min(max(distance, 0), 0xFFFF))
+        if len(self._buffer) >= BUFFER_SIZE:
+            self.flush()
+
+    def ground(self, value: bool):
+        self._event(OP_OTHER, OTHER_GROUND_TRUE if value else OTHER_GROUND_FALSE)
+
+    def phase(self, phase: str):
+        name = phase.encode()
+        self._event(OP_OTHER, OTHER_PHASE)
+        self._buffer.append(len(name))
+        self._buffer += name
+
+    def ball_color(self, color):
+        self._event(OP_OTHER, OTHER_BALL_COLOR)
+        self._buffer += bytes(int(c) & 0xFF for c in color)
+
+    def _event(self, op: int, low_bits: int = 0):
+        self._buffer.append(op << 5 | low_bits)
+        if len(self._buffer) >= BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        self._file.write(self._buffer)
+        self._buffer.clear()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class Trace:
+    """Decoded trace file.
+
+    ops and values have one entry per event. values is the sensor distance, 0/1 for ground readings
+    and -1 for other events. phases and ball_colors map event indexes to the value set at that event."""
+
+    def __init__(self, no_of_squares_per_side: int, cell_side_length: int, start: tuple, maze_hash: bytes,
+                 ops: numpy.array, values: numpy.array, phases: dict, ball_colors: dict):
+        self.no_of_squares_per_side = no_of_squares_per_side
+        self.cell_side_length = cell_side_length
+        self.start = start
+        self.maze_hash = maze_hash
+        self.ops = ops
+        self.values = values
+        self.phases = phases
+        self.ball_colors = ball_colors
+
+    def __len__(self):
+        return len(self.ops)
+
+
+def read_trace(filename: str) -> Trace:
+    """Read and decode a trace file"""
+
+    with open(filename, "rb") as file:
+        data = file.read()
+    magic, version, n, side, x, y, direction, maze_hash = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("{} is not a version {} trace file".format(filename, VERSION))
+
+    ops = []
+    values = []
+    phases = {}
+    ball_colors = {}
+    i = HEADER.size
+    while i < len(data):
+        byte = data[i]
+        op, low_bits = byte >> 5, byte & 0x1F
+        i += 1
+        value = -1
+        if OP_FRONT_SENSOR <= op <= OP_RIGHT_SENSOR:
+            if low_bits == SENSOR_ESCAPE:
+                value = DISTANCE.unpack_from(data, i)[0]
+                i += DISTANCE.size
+            else:
+                value = side // 2 + low_bits * side
+        elif op == OP_OTHER:
+            if low_bits == OTHER_GROUND_FALSE or low_bits == OTHER_GROUND_TRUE:
+                value = low_bits
+            elif low_bits == OTHER_PHASE:
+                phases[len(ops)] = data[i + 1:i + 1 + data[i]].decode()
+                i += 1 + data[i]
+            elif low_bits == OTHER_BALL_COLOR:
+                ball_colors[len(ops)] = tuple(data[i:i + 3])
+                i += 3
+        ops.append(op)
+        values.append(value)
+
+    return Trace(n, side, (x, y, direction), maze_hash, numpy.array(ops, numpy.uint8),
+                 numpy.array(values, numpy.int32), phases, ball_colors)
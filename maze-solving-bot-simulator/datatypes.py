@@ -6,6 +6,8 @@ class Direction:
     SOUTH = 2
     WEST = 3
     DIRECTIONS = 4
+    # (x, y) change of one cell forward, indexed by direction
+    OFFSETS = ((0, -1), (1, 0), (0, 1), (-1, 0))
 
 
 class SimulationRunStatus:
@@ -15,39 +17,140 @@ class SimulationRunStatus:
     RESUME_SIMULATION = 0x345
 
 
+class Phase:
+    """Run phases enum (steps are counted per phase)"""
+
+    EXPLORE = "explore"
+    FINAL_RUN = "final_run"
+
+
 class Point:
     """Class to define a point in X Y coordinate plane.
     Top Left of the screen is (0, 0) and X increases Left to Right and Y increases Top to Bottom. """
 
+    # No per instance dictionary, points are created in drawing code for every frame
+    __slots__ = ("x", "y")
+
     def __init__(self, x: float, y: float):
         self.x = x
         self.y = y
 
-    def __addition(self, other, add: bool):
+    def __addition(self, other, multiple: int):
         """Helper function to + and - operators."""
 
-        multiple = 1 if add else -1
-        if type(other) is float or type(other) is int:
+        other_type = type(other)
+        if other_type is float or other_type is int:
             return Point(self.x + multiple * other, self.y + multiple * other)
-        if type(other) is tuple or type(other) is list:
+        if other_type is tuple or other_type is list:
             return Point(self.x + multiple * other[0], self.y + multiple * other[1])
-        if type(other) is Point:
+        if other_type is Point:
             return Point(self.x + multiple * other.x, self.y + multiple * other.y)
-        else:
-            return self
+        return self
 
     def __add__(self, other):
         """Adds a value to point"""
 
-        return self.__addition(other, add=True)
+        return self.__addition(other, 1)
 
     def __sub__(self, other):
         """Subtracts a value from point"""
 
-        return self.__addition(other, add=False)
+        return self.__addition(other, -1)
 
     def __iter__(self):
         """To help convert this to tuples or lists"""
 
-        yield int(self.x)
-        yield int(self.y)
+        return iter((int(self.x), int(self.y)))
+
+    def __eq__(self, other):
+        return type(other) is Point and self.x == other.x and self.y == other.y
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __repr__(self):
+        return "Point({}, {})".format(self.x, self.y)
+
+
+class Pose(tuple):
+    """(x, y, direction) of a bot (Robot positions). A plain tuple, so poses compare and hash as tuples."""
+
+    __slots__ = ()
+
+    def __new__(cls, x: int, y: int, direction: int):
+        return tuple.__new__(cls, (x, y, direction))
+
+    @property
+    def x(self) -> int:
+        return self[0]
+
+    @property
+    def y(self) -> int:
+        return self[1]
+
+    @property
+    def direction(self) -> int:
+        return self[2]
+
+    def __repr__(self):
+        return "Pose(x={}, y={}, direction={})".format(*self)
+
+
+def cell_centers(no_of_squares_per_side: int, cell_side_length: int) -> tuple:
+    """Pixel coordinate of the center of each cell, indexed by Robot position (1 based, 0 and
+    no_of_squares_per_side + 1 are the cells just outside the grid). Same for X and Y."""
+
+    return tuple(int(position * cell_side_length - cell_side_length * 0.5)
+                 for position in range(no_of_squares_per_side + 2))
+
+
+class SimulationResult:
+    """Summary of a finished simulation run"""
+
+    def __init__(self, steps: int, turns: int, sensor_reads: int, loops: int, elapsed_time: float,
+                 finished: bool, phase_steps: dict = None, sensor_cache_hits: int = 0, sensor_cache_misses: int = 0,
+                 phase_time: dict = None, simulated_time: float = 0.0, script_stats: dict = None):
+        self.steps = steps
+        self.turns = turns
+        self.sensor_reads = sensor_reads
+        self.loops = loops
+        self.elapsed_time = elapsed_time
+        self.finished = finished
+        self.phase_steps = phase_steps or {}
+        self.sensor_cache_hits = sensor_cache_hits
+        self.sensor_cache_misses = sensor_cache_misses
+        self.phase_time = phase_time or {}
+        # Seconds on the simulation clock of the bot (actions and sleeps of the script)
+        self.simulated_time = simulated_time
+        # Statistics of the script (UserScript.script_stats), eg: node expansions of DStarLite
+        self.script_stats = script_stats or {}
+
+    @property
+    def exploration_steps(self) -> int:
+        """Steps taken before the final run"""
+        return self.steps - self.final_run_steps
+
+    @property
+    def final_run_steps(self) -> int:
+        """Steps taken in the final run"""
+        return self.phase_steps.get(Phase.FINAL_RUN, 0)
+
+    @property
+    def estimated_run_time(self) -> float:
+        """Estimated seconds the real bot needs for the final run (planner turn and straight run costs)"""
+        return self.phase_time.get(Phase.FINAL_RUN, 0.0)
+
+    @property
+    def sensor_cache_hit_rate(self) -> float:
+        """Fraction of sensor readings of the script answered from the sensor cache"""
+        lookups = self.sensor_cache_hits + self.sensor_cache_misses
+        return self.sensor_cache_hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict:
+        """Result as a plain dictionary"""
+
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        values = ", ".join("{}={}".format(key, value) for key, value in self.as_dict().items())
+        return "SimulationResult({})".format(values)
@@ -0,0 +1,183 @@
+import cv2
+import numpy
+
+import robot
+import utils
+
+WALL_COLOR = (220, 220, 128)
+WALL_THICKNESS = 10
+CIRCLE_COLOR = (0, 0, 255)
+TEXT_COLOR = (0, 0, 0)
+TEXT_FONT = cv2.FONT_HERSHEY_PLAIN
+
+
+def rotate_rect(rect: tuple, shape: tuple, rotate: int) -> tuple:
+    """Where (top, bottom, left, right) of an image of shape ends up after rotating clockwise rotate times"""
+
+    top, bottom, left, right = rect
+    height, width = shape[:2]
+    for _ in range(rotate):
+        top, bottom, left, right = left, right, height - bottom, height - top
+        height, width = width, height
+    return top, bottom, left, right
+
+
+class FloodDebugOverlay:
+    """Debug window showing the rotated maze with known walls and flood values of each cell.
+
+    The frame is built from layers that are cached between refreshes:
+    the rotated maze image with the bot, walls and circles, and pre-rendered flood value glyphs.
+    Each refresh only rebuilds the areas under new walls, the bot and cells whose flood value changed."""
+
+    def __init__(self, window_name: str = "debug", rotate: int = 0):
+        self.window_name = window_name
+        self.rotate = rotate % 4
+        self._source: numpy.array = None
+        self._scratch: numpy.array = None  # Maze image with the bot, not rotated
+        self._under: numpy.array = None  # Rotated maze image with the bot
+        self._layer: numpy.array = None  # Walls and circles
+        self._mask: numpy.array = None  # Pixels of _layer that are drawn on
+        self._frame: numpy.array = None
+        self._walls_x: numpy.array = None
+        self._walls_y: numpy.array = None
+        self._values: numpy.array = None
+        self._robot_rect: tuple = None
+        self._side = 0
+        self._glyphs = {}
+
+    def invalidate(self):
+        """Redraw everything next time (call after drawing on the image)"""
+        self._source = None
+
+    def show(self, img: numpy.array, bot: robot.Robot, flooded_grid, walls_x: numpy.array, walls_y: numpy.array):
+        """Update and show the debug window.
+        flooded_grid is indexed [x][y], walls_x/walls_y as in flood_kernel.flood_fill"""
+
+        if img is not self._source or self._side != bot.cell_side_length or \
+                self._values.shape != (bot.no_of_squares_per_side, bot.no_of_squares_per_side):
+            self._reset(img, bot)
+
+        dirty = []
+        dirty.extend(self._update_walls(walls_x, walls_y))
+        dirty.extend(self._update_robot(bot))
+        dirty.extend(self._update_values(flooded_grid))
+        for rect in dirty:
+            self._compose(rect)
+
+        utils.show_image(self.window_name, self._frame)
+
+    # --- Layers ----------------------------------------------------------------------------------------------------
+
+    def _reset(self, img: numpy.array, bot: robot.Robot):
+        n = bot.no_of_squares_per_side
+        side = bot.cell_side_length
+        if side != self._side:
+            self._glyphs = {}
+        self._source = img
+        self._side = side
+        self._scratch = numpy.copy(img)
+        self._under = numpy.ascontiguousarray(numpy.rot90(img, -self.rotate))
+        self._layer = numpy.zeros_like(self._under)
+        self._mask = numpy.zeros(self._under.shape[:2], numpy.uint8)
+        self._walls_x = numpy.zeros((n - 1, n), bool)
+        self._walls_y = numpy.zeros((n, n - 1), bool)
+        self._values = numpy.full((n, n), -1)
+        self._robot_rect = None
+
+        for canvas, color in ((self._layer, CIRCLE_COLOR), (self._mask, 255)):
+            cv2.circle(canvas, (side // 2, side // 2), side // 2, color, 1)
+            cv2.circle(canvas, (len(img) // 2, len(img) // 2), side, color, 1)
+
+        self._frame = numpy.copy(self._under)
+        self._compose((0, self._frame.shape[0], 0, self._frame.shape[1]))
+
+    def _update_walls(self, walls_x: numpy.array, walls_y: numpy.array) -> list:
+        """Draw walls added since last refresh, returns changed areas"""
+
+        dirty = []
+        side = self._side
+        for walls, drawn, step in ((walls_x, self._walls_x, (1, 0)), (walls_y, self._walls_y, (0, 1))):
+            for x, y in numpy.argwhere(walls & ~drawn):
+                point_a = (int(x) * side + side // 2, int(y) * side + side // 2)
+                point_b = (point_a[0] + step[0] * side, point_a[1] + step[1] * side)
+                cv2.line(self._layer, point_a, point_b, WALL_COLOR, WALL_THICKNESS)
+                cv2.line(self._mask, point_a, point_b, 255, WALL_THICKNESS)
+                reach = WALL_THICKNESS // 2 + 1
+                dirty.append((point_a[1] - reach, point_b[1] + reach + 1, point_a[0] - reach, point_b[0] + reach + 1))
+            drawn |= walls
+        return dirty
+
+    def _update_robot(self, bot: robot.Robot) -> list:
+        """Move the bot on the rotated image, returns changed areas"""
+
+        rects = [utils.robot_area(bot, self._scratch.shape)]
+        if self._robot_rect is not None:
+            top, bottom, left, right = self._robot_rect
+            self._scratch[top:bottom, left:right] = self._source[top:bottom, left:right]
+            rects.append(self._robot_rect)
+        utils.draw_robot(bot, self._scratch)
+        self._robot_rect = rects[0]
+
+        dirty = []
+        for top, bottom, left, right in rects:
+            rotated = rotate_rect((top, bottom, left, right), self._scratch.shape, self.rotate)
+            self._under[rotated[0]:rotated[1], rotated[2]:rotated[3]] = \
+                numpy.rot90(self._scratch[top:bottom, left:right], -self.rotate)
+            dirty.append(rotated)
+        return dirty
+
+    def _update_values(self, flooded_grid) -> list:
+        """Returns areas of cells whose flood value changed"""
+
+        values = numpy.asarray(flooded_grid)
+        side = self._side
+        dirty = [(y * side, (y + 1) * side, x * side, (x + 1) * side)
+                 for x, y in numpy.argwhere(values != self._values).tolist()]
+        self._values = values
+        return dirty
+
+    # --- Composition -----------------------------------------------------------------------------------------------
+
+    def _glyph(self, value: int) -> tuple:
+        """Weight of the background (256 - text alpha) and text color times alpha (rounded) of a cell showing value"""
+
+        glyph = self._glyphs.get(value)
+        if glyph is None:
+            side = self._side
+            text = "{:>2}".format(value)
+            origin = (side // 4, 3 * side // 4)
+            (width, height), _ = cv2.getTextSize(text, TEXT_FONT, 1, 1)
+            # Shrink the text if it does not fit in the cell
+            scale = min(1.0, (side - origin[0]) / width, origin[1] / height)
+            alpha = numpy.zeros((side, side), numpy.uint8)
+            cv2.putText(alpha, text, origin, TEXT_FONT, scale, 255, 1, cv2.LINE_AA)
+            keep = (256 - alpha.astype(numpy.uint16) * 256 // 255)[..., None]
+            ink = (numpy.array(TEXT_COLOR, numpy.uint16) * (256 - keep) + 128).astype(numpy.uint16)
+            glyph = keep, ink
+            self._glyphs[value] = glyph
+        return glyph
+
+    def _compose(self, rect: tuple):
+        """Rebuild an area of the frame from the layers"""
+
+        height, width = self._frame.shape[:2]
+        top, bottom, left, right = rect
+        top, left = max(top, 0), max(left, 0)
+        bottom, right = min(bottom, height), min(right, width)
+        if top >= bottom or left >= right:
+            return
+
+        frame = self._frame[top:bottom, left:right]
+        frame[:] = self._under[top:bottom, left:right]
+        numpy.copyto(frame, self._layer[top:bottom, left:right], where=self._mask[top:bottom, left:right, None] > 0)
+
+        side = self._side
+        n = len(self._values)
+        for x in range(left // side, min((right - 1) // side + 1, n)):
+            for y in range(top // side, min((bottom - 1) // side + 1, n)):
+                cell_top, cell_left = max(top, y * side), max(left, x * side)
+                cell_bottom, cell_right = min(bottom, (y + 1) * side), min(right, (x + 1) * side)
+                keep, ink = self._glyph(int(self._values[x, y]))
+                tile = slice(cell_top - y * side, cell_bottom - y * side), slice(cell_left - x * side, cell_right - x * side)
+                area = self._frame[cell_top:cell_bottom, cell_left:cell_right]
+                area[:] = (area * keep[tile] + ink[tile]) >> 8
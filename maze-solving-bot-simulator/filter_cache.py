@@ -0,0 +1,72 @@
+import hashlib
+import os
+import struct
+import tempfile
+
+import numpy
+
+import utils
+
+# Cached filter outputs of all images are kept in this directory (files are keyed by image contents, so maze
+# folders are not written to)
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                         "maze-solving-bot-simulator", "filter_cache")
+# Change when apply_vision_filter/apply_ground_filter change in a way not covered by the parameters
+FILTER_VERSION = 1
+# Cache file layout: header (magic, height, width) followed by both masks as 0/255 bytes, so memory maps of
+# the file are used as the masks without copying them (magic is part of the cache key)
+MAGIC = b"MZF2"
+HEADER = struct.Struct("<4sII")
+
+
+def filter_parameters() -> tuple:
+    """Everything the filter outputs depend on apart from the image"""
+    return (FILTER_VERSION, utils.VISION_BLUR_SIZE, utils.VISION_THRESHOLD_BLOCK_SIZE, utils.VISION_THRESHOLD_C,
+            utils.VISION_KERNEL_SIZE, tuple(utils.GROUND_HSV_LOWER), tuple(utils.GROUND_HSV_UPPER))
+
+
+def cache_path(image_path: str) -> str:
+    """Cache file of an image for the current filter parameters"""
+
+    key = hashlib.blake2b(utils.content_hash(image_path) + MAGIC + repr(filter_parameters()).encode(),
+                          digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, key + ".bin")
+
+
+def save(path: str, wall_map: numpy.array, ground_map: numpy.array):
+    """Save both masks (written to a temporary file first, so parallel runs never read half a file)"""
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    height, width = wall_map.shape
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(file_descriptor, "wb") as file:
+        file.write(HEADER.pack(MAGIC, height, width))
+        file.write(numpy.where(numpy.stack((wall_map, ground_map)) != 0, 255, 0).astype(numpy.uint8).tobytes())
+    os.replace(temp_path, path)
+
+
+def load(path: str) -> tuple:
+    """(wall_map, ground_map) with 0/255 values like the filters, as read only memory maps of a cache file.
+    Pages are shared through the page cache by every process which loads the same file."""
+
+    with open(path, "rb") as file:
+        magic, height, width = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("{} is not a filter cache file".format(path))
+    masks = numpy.memmap(path, numpy.uint8, "r", offset=HEADER.size, shape=(2, height, width))
+    return masks[0], masks[1]
+
+
+def load_filters(image_path: str) -> tuple:
+    """(wall_map, ground_map) of a maze image, filtered only if they are not in the cache"""
+
+    path = cache_path(image_path)
+    if os.path.exists(path):
+        return load(path)
+
+    img = utils.open_image(image_path)
+    wall_map = utils.apply_vision_filter(img)
+    ground_map = utils.apply_ground_filter(img)
+    save(path, wall_map, ground_map)
+    return wall_map, ground_map
@@ -0,0 +1,62 @@
+import numpy
+
+# Flood fill implementations a script can select
+KERNEL_BFS = "bfs"
+KERNEL_NUMPY = "numpy"
+# KERNEL_NUMPY from NUMPY_MIN_SIDE squares per side, KERNEL_BFS below
+KERNEL_AUTO = "auto"
+# The NumPy kernel is slower than the breadth first search below this (0.5x at 14x14, about 1.2x at 32x32,
+# 2.2x at 64x64 and 3-4x at 128x128 in benchmarks/flood_benchmark.py)
+NUMPY_MIN_SIDE = 32
+
+UNVISITED = -1
+
+
+def select(kernel: str, side_squares: int) -> str:
+    """KERNEL_BFS or KERNEL_NUMPY to use for a grid (resolves KERNEL_AUTO by grid size)"""
+    if kernel == KERNEL_AUTO:
+        return KERNEL_NUMPY if side_squares >= NUMPY_MIN_SIDE else KERNEL_BFS
+    return kernel
+
+
+def flood_fill(walls_0: numpy.array, walls_1: numpy.array, targets: list) -> numpy.array:
+    """Distance from every cell to the closest target (UNVISITED if not reachable), same as a breadth first search.
+    Instead of expanding one cell at a time, the whole wavefront moves one cell per iteration using shifted arrays.
+
+    Arguments:
+        walls_0 -- Boolean (N-1, N) array. walls_0[i, j] is True if there is a wall between [i, j] and [i + 1, j]
+        walls_1 -- Boolean (N, N-1) array. walls_1[i, j] is True if there is a wall between [i, j] and [i, j + 1]
+        targets -- (i, j) cells with distance 0
+    """
+
+    side = walls_1.shape[0]
+    # int16 is enough unless the maze is big enough for a path longer than 32767 cells
+    dtype = numpy.int16 if side * side <= numpy.iinfo(numpy.int16).max else numpy.int32
+    distances = numpy.full((side, side), UNVISITED, dtype)
+    open_0 = ~walls_0
+    open_1 = ~walls_1
+
+    frontier = numpy.zeros((side, side), bool)
+    for target in targets:
+        frontier[target] = True
+    distances[frontier] = 0
+
+    reached = numpy.empty_like(frontier)
+    shifted = numpy.empty_like(frontier)
+    distance = 0
+    while frontier.any():
+        distance += 1
+        reached[:] = False
+        # Move wavefront to [i + 1, j], [i - 1, j], [i, j + 1] and [i, j - 1] through open sides
+        numpy.logical_and(frontier[:-1, :], open_0, out=shifted[1:, :])
+        reached[1:, :] |= shifted[1:, :]
+        numpy.logical_and(frontier[1:, :], open_0, out=shifted[:-1, :])
+        reached[:-1, :] |= shifted[:-1, :]
+        numpy.logical_and(frontier[:, :-1], open_1, out=shifted[:, 1:])
+        reached[:, 1:] |= shifted[:, 1:]
+        numpy.logical_and(frontier[:, 1:], open_1, out=shifted[:, :-1])
+        reached[:, :-1] |= shifted[:, :-1]
+        # Only cells reached for the first time are the next wavefront
+        numpy.logical_and(reached, distances == UNVISITED, out=frontier)
+        distances[frontier] = distance
+    return distances
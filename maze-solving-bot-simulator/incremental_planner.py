@@ -0,0 +1,335 @@
+import functools
+import heapq
+from array import array
+
+from optimized import neighbor_table
+from optimized.neighbor_table import NORTH, EAST, SOUTH, WEST
+
+# g / rhs of cells with no known path to a target
+INFINITE = 0x7FFFFFFF
+# Queue key of cells which are not queued (keys are never negative)
+NOT_QUEUED = -1
+# The queue heap is rebuilt when it has more entries than this many times the cells
+COMPACT_FACTOR = 4
+
+
+class CellQueue:
+    """Min heap (heapq) of the queued cells with the current key of each one. Entries are key << cell_bits | cell,
+    so they compare as (key, cell). Changing the key of a cell or removing it leaves its old entry in the heap,
+    entries which are not the current key of their cell are dropped when they reach the top.
+
+    Keys are integers (DStarLitePlanner packs its two part keys into one)."""
+
+    def __init__(self, cells: int):
+        self.heap = []
+        self.keys = array("q", [NOT_QUEUED]) * cells  # Current key of each cell
+        self.size = 0  # Queued cells (old entries are not counted)
+        self.cell_bits = max(cells - 1, 1).bit_length()
+        self.cell_mask = (1 << self.cell_bits) - 1
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, cell: int) -> bool:
+        return self.keys[cell] != NOT_QUEUED
+
+    def top(self) -> int:
+        self.drop_old_entries()
+        return self.heap[0] & self.cell_mask
+
+    def top_key(self) -> int:
+        self.drop_old_entries()
+        return self.heap[0] >> self.cell_bits
+
+    def push(self, cell: int, key: int):
+        """Queue a cell, or change its key if already queued"""
+
+        current = self.keys[cell]
+        if current == key:
+            return
+        if current == NOT_QUEUED:
+            self.size += 1
+        self.keys[cell] = key
+        heapq.heappush(self.heap, key << self.cell_bits | cell)
+
+    def remove(self, cell: int):
+        """Remove a cell if it is queued"""
+
+        if self.keys[cell] != NOT_QUEUED:
+            self.keys[cell] = NOT_QUEUED
+            self.size -= 1
+
+    def compact(self):
+        """Keep only the current entries if there are too many old ones"""
+        if len(self.heap) > COMPACT_FACTOR * len(self.keys):
+            self.heap = [key << self.cell_bits | cell for cell, key in enumerate(self.keys) if key != NOT_QUEUED]
+            heapq.heapify(self.heap)
+
+    def drop_old_entries(self):
+        """Pop entries from the top until it is the current key of its cell (there must be a queued cell)"""
+        heap, keys, cell_bits, cell_mask = self.heap, self.keys, self.cell_bits, self.cell_mask
+        while keys[heap[0] & cell_mask] != heap[0] >> cell_bits:
+            heapq.heappop(heap)
+
+
+@functools.lru_cache(maxsize=None)
+def _tables(side_squares: int) -> tuple:
+    """(links, x_coords, y_coords) of a grid, shared by every search on grids of this size.
+    links[cell] are (neighbor, index of the side in walls) of the neighbors inside the grid,
+    in (west, east, north, south) order as open_neighbors of OptimizedFloodFill."""
+
+    off_grid = neighbor_table.off_grid(side_squares)
+    links = []
+    for cell, (north, east, south, west) in enumerate(neighbor_table.build(side_squares)):
+        sides = cell * 4
+        cell_links = []
+        if west != off_grid:
+            cell_links.append((west, sides + WEST))
+        if east != off_grid:
+            cell_links.append((east, sides + EAST))
+        if north != off_grid:
+            cell_links.append((north, sides + NORTH))
+        if south != off_grid:
+            cell_links.append((south, sides + SOUTH))
+        links.append(tuple(cell_links))
+    x_coords, y_coords = neighbor_table.coordinates(side_squares)
+    return tuple(links), tuple(x_coords), tuple(y_coords)
+
+
+class DStarLitePlanner:
+    """D* Lite: distances (g) from cells to the closest target, searched backwards from the targets towards the
+    bot. Unknown walls are assumed to be open. When new walls are found, only the cells whose distance can change
+    are searched again, and only as far as needed for the bot's cell to be correct.
+
+    Cells are X*side_squares + Y (as OptimizedUserScript and neighbor_table). Each cell has g (its distance
+    at the last expansion) and rhs (1 + the smallest g of its open neighbors). Cells where these differ are
+    queued, ordered by (min(g, rhs) + Manhattan distance to the bot + km, min(g, rhs)).
+
+    With closed, every side starts as a wall and open_side opens the ones found to be open, so the distances
+    only go through passages known to be open."""
+
+    def __init__(self, side_squares: int, targets: list, start: int, closed: bool = False):
+        cells = side_squares * side_squares
+        self.links, self.x_coords, self.y_coords = _tables(side_squares)
+        # Both parts of a key in one integer: first part * key_scale + second part (second part < key_scale)
+        self.key_scale = cells + 1
+
+        self.g = array("l", [INFINITE]) * cells
+        self.rhs = array("l", [INFINITE]) * cells
+        self.is_target = bytearray(cells)
+        # walls[cell * 4 + direction] is 1 if there is a known wall (or the side is not known to be open if closed)
+        self.walls = bytearray(b"\x01" if closed else b"\x00") * (cells * 4)
+        self.queue = CellQueue(cells)
+
+        self.start = start
+        self.last_start = start  # Bot cell when km was last brought up to date
+        self.km = 0  # Sum of heuristic changes caused by the bot moving
+        self.changed = []  # Cells next to walls added after the last search
+        self.expanded = 0  # Total expansions
+        self.targets = list(targets)
+
+        for target in targets:
+            self.is_target[target] = 1
+            self.rhs[target] = 0
+            self.queue.push(target, self.key(target))
+
+    def heuristic(self, cell: int) -> int:
+        """Manhattan distance between a cell and the bot (never more than the real distance)"""
+        return abs(self.x_coords[cell] - self.x_coords[self.start]) + \
+            abs(self.y_coords[cell] - self.y_coords[self.start])
+
+    def key(self, cell: int) -> int:
+        g, rhs = self.g[cell], self.rhs[cell]
+        distance = g if g < rhs else rhs
+        return (distance + self.heuristic(cell) + self.km) * self.key_scale + distance
+
+    def add_wall(self, a: int, b: int):
+        """A wall between neighbors a and b was found"""
+
+        g, rhs, walls = self.g, self.rhs, self.walls
+        for cell, other in ((a, b), (b, a)):
+            for node, side in self.links[cell]:
+                if node == other:
+                    walls[side] = 1
+        for cell, other in ((a, b), (b, a)):
+            # rhs of a cell only changes if the other cell was its only closest neighbor
+            if g[other] != INFINITE and rhs[cell] == g[other] + 1 and \
+                    not any(g[node] == g[other] and not walls[side] for node, side in self.links[cell]):
+                self.changed.append(cell)
+
+    def open_side(self, a: int, b: int):
+        """The side between neighbors a and b was found to be open (searches created with closed)"""
+
+        for cell, other in ((a, b), (b, a)):
+            for node, side in self.links[cell]:
+                if node == other:
+                    self.walls[side] = 0
+            self.changed.append(cell)
+
+    def set_distances(self, distances: list):
+        """Take the distances of every cell (-1 if not reachable) with the current walls, eg from a flood fill,
+        instead of searching them"""
+
+        self.g = array("l", [distance if distance >= 0 else INFINITE for distance in distances])
+        self.rhs = array("l", self.g)
+        self.queue = CellQueue(len(self.g))
+        self.changed = []
+
+    def copy_walls(self, search: "DStarLitePlanner"):
+        """Take the walls of another search on the same grid (the distances are not updated, see flood)"""
+        self.walls[:] = search.walls
+
+    def flood(self):
+        """Set the distances of every cell with the current walls by a breadth first search from the targets,
+        instead of searching them (faster when most cells would be expanded)"""
+
+        cells = len(self.g)
+        g = self.g = array("l", [INFINITE]) * cells
+        rhs = self.rhs = array("l", [INFINITE]) * cells
+        links, walls = self.links, self.walls
+        for target in self.targets:
+            g[target] = rhs[target] = 0
+        queue = list(self.targets)
+        for cell in queue:
+            distance = g[cell] + 1
+            for node, side in links[cell]:
+                if g[node] == INFINITE and not walls[side]:
+                    g[node] = rhs[node] = distance
+                    queue.append(node)
+        self.queue = CellQueue(cells)
+        self.changed = []
+
+    def move_to(self, cell: int):
+        """The bot is now in cell"""
+        self.start = cell
+
+    def compute(self) -> int:
+        """Bring distances up to date with the walls and the bot's cell. Returns the number of expansions."""
+
+        g, rhs, queue, start = self.g, self.rhs, self.queue, self.start
+        if start != self.last_start:
+            # Keys of queued cells were computed with the bot somewhere else, km keeps them lower bounds
+            self.km += abs(self.x_coords[start] - self.x_coords[self.last_start]) + \
+                abs(self.y_coords[start] - self.y_coords[self.last_start])
+            self.last_start = start
+        changed, self.changed = self.changed, []
+        for cell in changed:
+            self.update_cell(cell)
+
+        links, walls, is_target, x_coords, y_coords = self.links, self.walls, self.is_target, \
+            self.x_coords, self.y_coords
+        heap, keys, cell_bits, cell_mask = queue.heap, queue.keys, queue.cell_bits, queue.cell_mask
+        heappush, heappop = heapq.heappush, heapq.heappop
+        key_scale, km = self.key_scale, self.km
+        start_x, start_y = x_coords[start], y_coords[start]
+        size = queue.size
+        expanded = 0
+        while size:
+            entry = heap[0]
+            cell = entry & cell_mask
+            old_key = entry >> cell_bits
+            if keys[cell] != old_key:
+                # Old entry of a cell whose key changed or which was removed
+                heappop(heap)
+                continue
+            # Stop when the bot's cell is consistent and no queued cell has a smaller key
+            start_g, start_rhs = g[start], rhs[start]
+            if start_g == start_rhs and old_key >= (start_g + km) * key_scale + start_g:
+                break
+            g_cell, rhs_cell = g[cell], rhs[cell]
+            distance = g_cell if g_cell < rhs_cell else rhs_cell
+            new_key = (distance + abs(x_coords[cell] - start_x) + abs(y_coords[cell] - start_y) + km) * key_scale \
+                + distance
+            expanded += 1
+            if old_key < new_key:
+                keys[cell] = new_key
+                heappush(heap, new_key << cell_bits | cell)
+            elif g_cell > rhs_cell:
+                # Distance went down (or was found), neighbors may go through this cell
+                g[cell] = rhs_cell
+                # Removed from the queue, its entry is the top one
+                keys[cell] = NOT_QUEUED
+                size -= 1
+                heappop(heap)
+                distance = rhs_cell + 1
+                for node, side in links[cell]:
+                    if distance < rhs[node] and not walls[side] and not is_target[node]:
+                        rhs[node] = distance
+                        g_node = g[node]
+                        if g_node != distance:
+                            smallest = g_node if g_node < distance else distance
+                            key = (smallest + abs(x_coords[node] - start_x) + abs(y_coords[node] - start_y) + km) \
+                                * key_scale + smallest
+                            if keys[node] != key:
+                                if keys[node] == NOT_QUEUED:
+                                    size += 1
+                                keys[node] = key
+                                heappush(heap, key << cell_bits | node)
+                        elif keys[node] != NOT_QUEUED:
+                            keys[node] = NOT_QUEUED
+                            size -= 1
+            else:
+                # Distance went up, this cell and the neighbors which went through it are checked again (as
+                # update_cell)
+                old_distance = g_cell + 1
+                g[cell] = INFINITE
+                nodes = [node for node, side in links[cell] if rhs[node] == old_distance and not walls[side]]
+                nodes.append(cell)
+                for node in nodes:
+                    if not is_target[node]:
+                        smallest = INFINITE
+                        for other, side in links[node]:
+                            if g[other] < smallest and not walls[side]:
+                                smallest = g[other]
+                        rhs[node] = smallest + 1 if smallest != INFINITE else INFINITE
+                    g_node, rhs_node = g[node], rhs[node]
+                    if g_node != rhs_node:
+                        smallest = g_node if g_node < rhs_node else rhs_node
+                        key = (smallest + abs(x_coords[node] - start_x) + abs(y_coords[node] - start_y) + km) \
+                            * key_scale + smallest
+                        if keys[node] != key:
+                            if keys[node] == NOT_QUEUED:
+                                size += 1
+                            keys[node] = key
+                            heappush(heap, key << cell_bits | node)
+                    elif keys[node] != NOT_QUEUED:
+                        keys[node] = NOT_QUEUED
+                        size -= 1
+        queue.size = size
+        queue.compact()
+        self.expanded += expanded
+        return expanded
+
+    def update_cell(self, cell: int):
+        """Recompute rhs of a cell from its open neighbors and queue it if g and rhs differ"""
+
+        g, rhs = self.g, self.rhs
+        if not self.is_target[cell]:
+            smallest = INFINITE
+            walls = self.walls
+            for node, side in self.links[cell]:
+                if not walls[side] and g[node] < smallest:
+                    smallest = g[node]
+            rhs[cell] = smallest + 1 if smallest != INFINITE else INFINITE
+        if g[cell] != rhs[cell]:
+            self.queue.push(cell, self.key(cell))
+        else:
+            self.queue.remove(cell)
+
+    def open_neighbors(self, cell: int) -> list:
+        """Neighbors of a cell which are not separated by a known wall, in (west, east, north, south) order"""
+        walls = self.walls
+        return [node for node, side in self.links[cell] if not walls[side]]
+
+    def next_cell(self, cell: int) -> int:
+        """Open neighbor with the smallest distance (cell itself if no neighbor is closer to a target)"""
+
+        best, best_distance = cell, self.g[cell]
+        for node in self.open_neighbors(cell):
+            if self.g[node] < best_distance:
+                best, best_distance = node, self.g[node]
+        return best
+
+    def distance(self, cell: int) -> int:
+        """Distance of a cell to the closest target, -1 if not known to be reachable"""
+        return self.g[cell] if self.g[cell] != INFINITE else -1
@@ -0,0 +1,174 @@
+import argparse
+import functools
+import importlib
+import json
+import time
+
+import numpy
+
+# Functions timed by default as "module:attribute" (attribute can be Class.method)
+DEFAULT_TARGETS = ["robot:Robot.front_sensor",
+                   "robot:Robot.left_sensor",
+                   "robot:Robot.right_sensor",
+                   "robot:Robot.ground_sensor",
+                   "robot:Robot.go_forward",
+                   "robot:Robot.go_backward",
+                   "robot:Robot.turn_right",
+                   "robot:Robot.turn_left",
+                   "flood_kernel:flood_fill",
+                   "scripts.flood_fill:FloodFill.flood_fill",
+                   "scripts.flood_fill:FloodFill.show_debug_data",
+                   "scripts.depth_first_search:DepthFirstSearch.bfs",
+                   "scripts.depth_first_search:DepthFirstSearch.shortest_path",
+                   "optimized.optimized_flood_fill:OptimizedFloodFill.update_flood_fill",
+                   "optimized.optimized_flood_fill:OptimizedFloodFill.flood_fill",
+                   "optimized.optimized_flood_fill:OptimizedFloodFill.repair_flood_fill",
+                   "optimized.optimized_flood_fill:OptimizedFloodFill.numpy_flood_fill",
+                   "scripts.d_star_lite:DStarLite.update_search",
+                   "incremental_planner:DStarLitePlanner.compute",
+                   "utils:refresh_screen",
+                   "utils:wait_key",
+                   "sim_clock:SimulationClock.wait"]
+PERCENTILES = (50, 90, 99)
+
+
+class Profiler:
+    """Counts calls and times the target functions while enabled.
+
+    Targets are replaced by timing wrappers in enable() and restored in disable(),
+    so nothing is slowed down when the profiler is not enabled."""
+
+    def __init__(self, targets: list = None):
+        self.targets = DEFAULT_TARGETS if targets is None else targets
+        self.timings = {}
+        self.run_time = 0.0
+        self._originals = []
+        self._start_time = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._start_time is not None
+
+    def enable(self):
+        """Start timing the targets"""
+
+        if self.enabled:
+            return
+        for target in self.targets:
+            module_name, path = target.split(":")
+            owner = importlib.import_module(module_name)
+            *owner_path, name = path.split(".")
+            for attribute in owner_path:
+                owner = getattr(owner, attribute)
+            original = vars(owner)[name]
+            self._originals.append((owner, name, original))
+            # Module functions are named with their module, methods with their class
+            label = path if owner_path else "{}.{}".format(module_name, path)
+            setattr(owner, name, self._wrap(label, original))
+        self._start_time = time.perf_counter()
+
+    def disable(self):
+        """Stop timing and restore the targets"""
+
+        if not self.enabled:
+            return
+        self.run_time += time.perf_counter() - self._start_time
+        self._start_time = None
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals.clear()
+
+    def _wrap(self, name: str, function):
+        if isinstance(function, staticmethod):
+            return staticmethod(self._wrap(name, function.__func__))
+
+        timings = self.timings.setdefault(name, [])
+        clock = time.perf_counter_ns
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timings.append(clock() - start)
+
+        return timed
+
+    def stats(self) -> dict:
+        """Call count and timings (microseconds, total in milliseconds) of each called target"""
+
+        run_time = self.run_time
+        if self.enabled:
+            run_time += time.perf_counter() - self._start_time
+        functions = {}
+        for name, timings in self.timings.items():
+            if not timings:
+                continue
+            timings = numpy.array(timings) / 1000
+            stats = dict(calls=len(timings), total_ms=timings.sum() / 1000, mean_us=timings.mean())
+            for percentile, value in zip(PERCENTILES, numpy.percentile(timings, PERCENTILES)):
+                stats["p{}_us".format(percentile)] = value
+            stats["max_us"] = timings.max()
+            stats["run_percent"] = 100 * stats["total_ms"] / 1000 / run_time if run_time else 0.0
+            functions[name] = {key: value if key == "calls" else float(value) for key, value in stats.items()}
+        return dict(run_time=run_time, functions=functions)
+
+    def summary(self) -> str:
+        """Table of stats(), most time consuming first. Times of nested calls are included in their callers."""
+
+        stats = self.stats()
+        columns = ["calls", "total_ms", "mean_us"] + ["p{}_us".format(p) for p in PERCENTILES] + \
+                  ["max_us", "run_percent"]
+        lines = ["{:<42}".format("function") + "".join("{:>12}".format(column) for column in columns)]
+        for name, values in sorted(stats["functions"].items(), key=lambda item: -item[1]["total_ms"]):
+            lines.append("{:<42}".format(name) + "{:>12}".format(values["calls"]) +
+                         "".join("{:>12.2f}".format(values[column]) for column in columns[1:]))
+        lines.append("Run time: {:.3f}s".format(stats["run_time"]))
+        return "\n".join(lines)
+
+    def dump(self, filename: str):
+        """Write stats() as JSON"""
+
+        with open(filename, "w") as file:
+            json.dump(self.stats(), file, indent=2)
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.disable()
+
+
+def compare(old: dict, new: dict) -> str:
+    """Table of mean time changes between two stats() dumps (eg: two solver versions)"""
+
+    lines = ["{:<42}{:>12}{:>12}{:>12}{:>12}{:>10}".format("function", "old calls", "new calls",
+                                                          "old mean_us", "new mean_us", "change")]
+    for name in sorted(set(old["functions"]) | set(new["functions"])):
+        old_stats = old["functions"].get(name)
+        new_stats = new["functions"].get(name)
+        if old_stats is None or new_stats is None:
+            lines.append("{:<42}{:>12}{:>12}".format(name, old_stats["calls"] if old_stats else "-",
+                                                     new_stats["calls"] if new_stats else "-"))
+            continue
+        change = 100 * (new_stats["mean_us"] / old_stats["mean_us"] - 1) if old_stats["mean_us"] else 0.0
+        lines.append("{:<42}{:>12}{:>12}{:>12.2f}{:>12.2f}{:>+9.1f}%".format(
+            name, old_stats["calls"], new_stats["calls"], old_stats["mean_us"], new_stats["mean_us"], change))
+    lines.append("Run time: {:.3f}s -> {:.3f}s".format(old["run_time"], new["run_time"]))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two profile dumps (run.py --profile-json)')
+    parser.add_argument('old', help='Profile JSON of the old version')
+    parser.add_argument('new', help='Profile JSON of the new version')
+    args = parser.parse_args()
+
+    with open(args.old) as old_file, open(args.new) as new_file:
+        print(compare(json.load(old_file), json.load(new_file)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import os
+
+import numpy
+
+import filter_cache
+import robot
+import utils
+from datatypes import Direction
+
+# Wall bits of a compiled cell, indexed by direction (N = 1, E = 2, S = 4, W = 8)
+WALL_BITS = [1 << direction for direction in range(Direction.DIRECTIONS)]
+# Version saved in compiled mazes. Compiled mazes of an older version are compiled again by load_or_compile
+# (version 1 had the ground of image cells transposed).
+FORMAT_VERSION = 2
+
+
+class CompiledMaze:
+    """Cell level description of a maze.
+    walls[row, col] has WALL_BITS set for each side of the cell that has a wall and
+    ground[row, col] is True if the ground sensor detects the ground color in that cell.
+    Rows and columns are 0 based (Robot positions are 1 based).
+    start is the suggested (x, y, direction) start pose of the bot (Robot positions) or None."""
+
+    def __init__(self, walls: numpy.array, ground: numpy.array, cell_side_length: int, start: tuple = None):
+        self.walls = walls
+        self.ground = ground
+        self.cell_side_length = cell_side_length
+        self.start = start
+
+    @property
+    def no_of_squares_per_side(self) -> int:
+        return len(self.walls)
+
+    def has_wall(self, col: int, row: int, direction: int) -> bool:
+        """Whether cell has a wall in direction"""
+        return bool(self.walls[row, col] & WALL_BITS[direction])
+
+    def is_ground(self, col: int, row: int) -> bool:
+        """Whether cell has the ground color"""
+        return bool(self.ground[row, col])
+
+
+def compile_maze(img: numpy.array, grid_side_squares: int, filters: tuple = None) -> CompiledMaze:
+    """Filter the maze image once and extract the walls of every cell.
+    A side has a wall if the bot in that cell would sense a wall on that side.
+    If filters (wall_map, ground_map) are given, they are used instead and img can be None."""
+
+    if filters is None:
+        filters = utils.apply_vision_filter(img), utils.apply_ground_filter(img)
+    wall_map, ground_map = filters
+    cell_side_length = len(wall_map) // grid_side_squares
+    distance_maps = robot.build_distance_maps(wall_map)
+
+    # Sensor position of the bot in each cell (same as Robot._center_point)
+    centers = (numpy.arange(1, grid_side_squares + 1) * cell_side_length - cell_side_length * 0.5).astype(int)
+    rows = centers[:, None]
+    cols = centers[None, :]
+
+    walls = numpy.zeros((grid_side_squares, grid_side_squares), numpy.uint8)
+    for direction in range(Direction.DIRECTIONS):
+        has_wall = distance_maps[direction][rows, cols] < cell_side_length
+        walls[has_wall] |= WALL_BITS[direction]
+    ground = ground_map[rows, cols] == 255
+    return CompiledMaze(walls, ground, cell_side_length)
+
+
+def compiled_path(image_path: str) -> str:
+    """Path of the compiled maze saved next to the image"""
+    return os.path.splitext(image_path)[0] + ".npz"
+
+
+def save(maze: CompiledMaze, path: str):
+    """Save compiled maze as a .npz file"""
+    extra = {} if maze.start is None else dict(start=numpy.array(maze.start))
+    numpy.savez_compressed(path, walls=maze.walls, ground=maze.ground, cell_side_length=maze.cell_side_length,
+                           version=FORMAT_VERSION, **extra)
+
+
+def format_version(path: str) -> int:
+    """FORMAT_VERSION of the compiler which saved a compiled maze (1 if saved before versions were stored)"""
+    with numpy.load(path) as data:
+        return int(data["version"]) if "version" in data else 1
+
+
+def load(path: str) -> CompiledMaze:
+    """Load compiled maze from a .npz file"""
+    with numpy.load(path) as data:
+        start = tuple(int(value) for value in data["start"]) if "start" in data else None
+        return CompiledMaze(data["walls"], data["ground"], int(data["cell_side_length"]), start)
+
+
+def load_or_compile(image_path: str, grid_side_squares: int) -> CompiledMaze:
+    """Load the compiled maze next to the image. Compile and save it if it is missing or out of date.
+    The start pose of the old compiled maze is kept if the grid size is the same."""
+
+    path = compiled_path(image_path)
+    start = None
+    if os.path.exists(path):
+        maze = load(path)
+        if maze.no_of_squares_per_side == grid_side_squares:
+            if os.path.getmtime(path) >= os.path.getmtime(image_path) and format_version(path) >= FORMAT_VERSION:
+                return maze
+            start = maze.start
+
+    maze = compile_maze(None, grid_side_squares, filter_cache.load_filters(image_path))
+    maze.start = start
+    save(maze, path)
+    return maze
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile maze images to cell walls (.npz next to the image)')
+    parser.add_argument('images', nargs='+', help='Maze images')
+    parser.add_argument('--grid', type=int, required=True, help='Number of squares per one side in the grid')
+    args = parser.parse_args()
+
+    for image_path in args.images:
+        maze = compile_maze(utils.open_image(image_path), args.grid)
+        save(maze, compiled_path(image_path))
+        print(compiled_path(image_path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+import argparse
+import os
+
+import cv2
+import numpy
+
+import maze_compiler
+from datatypes import Direction
+from maze_compiler import WALL_BITS
+
+ALGORITHM_BACKTRACKER = "backtracker"
+ALGORITHM_KRUSKAL = "kruskal"
+
+ALL_WALLS = sum(WALL_BITS)
+# Row and column change when moving in each direction (indexed by direction)
+ROW_STEP = numpy.array([-1, 0, 1, 0])
+COL_STEP = numpy.array([0, 1, 0, -1])
+OPPOSITE = [Direction.SOUTH, Direction.WEST, Direction.NORTH, Direction.EAST]
+
+WALL_COLOR = (40, 40, 40)
+BACKGROUND_COLOR = (255, 255, 255)
+# Same yellow as Maze.png (apply_ground_filter)
+GOAL_COLOR = (0, 242, 255)
+
+
+def remove_wall(walls: numpy.array, row: int, col: int, direction: int):
+    """Remove the wall on direction side of a cell (and the same wall of the neighbor)"""
+    walls[row, col] &= ALL_WALLS ^ WALL_BITS[direction]
+    walls[row + ROW_STEP[direction], col + COL_STEP[direction]] &= ALL_WALLS ^ WALL_BITS[OPPOSITE[direction]]
+
+
+def recursive_backtracker(side: int, rng: numpy.random.Generator) -> numpy.array:
+    """Perfect maze by a randomized depth first search (long winding corridors).
+    Stack and visited cells are plain arrays indexed by row*side + col."""
+
+    walls = numpy.full((side, side), ALL_WALLS, numpy.uint8)
+    visited = numpy.zeros(side * side, bool)
+    stack = numpy.empty(side * side, numpy.int32)
+    stack[0] = 0
+    visited[0] = True
+    top = 1
+    choices = [0] * Direction.DIRECTIONS
+    while top:
+        cell = int(stack[top - 1])
+        row, col = divmod(cell, side)
+        no_of_choices = 0
+        for direction in range(Direction.DIRECTIONS):
+            next_row = row + ROW_STEP[direction]
+            next_col = col + COL_STEP[direction]
+            if 0 <= next_row < side and 0 <= next_col < side and not visited[next_row * side + next_col]:
+                choices[no_of_choices] = direction
+                no_of_choices += 1
+        if not no_of_choices:
+            top -= 1
+            continue
+        direction = choices[int(rng.integers(no_of_choices))]
+        remove_wall(walls, row, col, direction)
+        next_cell = (row + ROW_STEP[direction]) * side + col + COL_STEP[direction]
+        visited[next_cell] = True
+        stack[top] = next_cell
+        top += 1
+    return walls
+
+
+def kruskal(side: int, rng: numpy.random.Generator) -> numpy.array:
+    """Perfect maze by randomized Kruskal's algorithm (many short dead ends).
+    Union-find parents are an array indexed by row*side + col."""
+
+    walls = numpy.full((side, side), ALL_WALLS, numpy.uint8)
+    parent = numpy.arange(side * side, dtype=numpy.int32)
+
+    # Every inner wall as (cell, direction) with direction EAST or SOUTH, in random order
+    cells = numpy.arange(side * side, dtype=numpy.int32).reshape(side, side)
+    east = cells[:, :-1].ravel()
+    south = cells[:-1, :].ravel()
+    edge_cells = numpy.concatenate([east, south])
+    edge_directions = numpy.concatenate([numpy.full(east.size, Direction.EAST, numpy.int8),
+                                         numpy.full(south.size, Direction.SOUTH, numpy.int8)])
+    order = rng.permutation(edge_cells.size)
+
+    def find(cell: int) -> int:
+        while parent[cell] != cell:
+            # Path halving
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    removed = 0
+    for cell, direction in zip(edge_cells[order].tolist(), edge_directions[order].tolist()):
+        other = cell + 1 if direction == Direction.EAST else cell + side
+        root_a = find(cell)
+        root_b = find(other)
+        if root_a == root_b:
+            continue
+        parent[root_a] = root_b
+        remove_wall(walls, cell // side, cell % side, direction)
+        removed += 1
+        if removed == side * side - 1:
+            break
+    return walls
+
+
+def braid(walls: numpy.array, braid_factor: float, rng: numpy.random.Generator):
+    """Remove dead ends (cells with 3 walls) with braid_factor probability by opening one more side.
+    Sides opening to another dead end are preferred. Makes loops, so the maze is no longer perfect."""
+
+    side = len(walls)
+    no_of_walls = numpy.zeros(walls.shape, numpy.uint8)
+    for bit in WALL_BITS:
+        no_of_walls += (walls & bit) != 0
+    dead_ends = numpy.argwhere(no_of_walls == 3)
+    dead_ends = dead_ends[rng.random(len(dead_ends)) < braid_factor]
+
+    for row, col in dead_ends.tolist():
+        # An earlier removal may have opened it already
+        if bin(int(walls[row, col])).count("1") != 3:
+            continue
+        candidates = []
+        preferred = []
+        for direction in range(Direction.DIRECTIONS):
+            next_row = row + ROW_STEP[direction]
+            next_col = col + COL_STEP[direction]
+            if not walls[row, col] & WALL_BITS[direction] or not (0 <= next_row < side and 0 <= next_col < side):
+                continue
+            candidates.append(direction)
+            if bin(int(walls[next_row, next_col])).count("1") == 3:
+                preferred.append(direction)
+        candidates = preferred or candidates
+        if candidates:
+            remove_wall(walls, row, col, candidates[int(rng.integers(len(candidates)))])
+
+
+def goal_cells(side: int, goal_size: int, goal_corner: tuple = None) -> list:
+    """(row, col) cells of a goal_size x goal_size goal region. Centered unless goal_corner (top left row, col)"""
+    if goal_corner is None:
+        goal_corner = ((side - goal_size) // 2, (side - goal_size) // 2)
+    top, left = goal_corner
+    return [(top + row, left + col) for row in range(goal_size) for col in range(goal_size)]
+
+
+def start_pose(side: int, corner: str) -> tuple:
+    """(x, y, direction) start pose in a corner (Robot positions are 1 based). Bot faces the outer wall
+    on its side, like the default settings."""
+    return {"top-left": (1, 1, Direction.WEST),
+            "top-right": (side, 1, Direction.EAST),
+            "bottom-left": (1, side, Direction.WEST),
+            "bottom-right": (side, side, Direction.EAST)}[corner]
+
+
+def generate(side: int, algorithm: str = ALGORITHM_BACKTRACKER, braid_factor: float = 0.0, goal_size: int = 2,
+             goal_corner: tuple = None, start_corner: str = "top-right", cell_side_length: int = 36,
+             seed=None) -> maze_compiler.CompiledMaze:
+    """Generate a maze in compiled maze format. Walls inside the goal region are removed."""
+
+    rng = numpy.random.default_rng(seed)
+    if algorithm == ALGORITHM_BACKTRACKER:
+        walls = recursive_backtracker(side, rng)
+    elif algorithm == ALGORITHM_KRUSKAL:
+        walls = kruskal(side, rng)
+    else:
+        raise ValueError("Unknown maze algorithm {}".format(algorithm))
+    if braid_factor > 0:
+        braid(walls, braid_factor, rng)
+
+    ground = numpy.zeros((side, side), bool)
+    goal = goal_cells(side, goal_size, goal_corner)
+    goal_set = set(goal)
+    for row, col in goal:
+        ground[row, col] = True
+        for direction in (Direction.EAST, Direction.SOUTH):
+            if (row + ROW_STEP[direction], col + COL_STEP[direction]) in goal_set:
+                remove_wall(walls, row, col, direction)
+    return maze_compiler.CompiledMaze(walls, ground, cell_side_length, start_pose(side, start_corner))
+
+
+def render(maze: maze_compiler.CompiledMaze, wall_thickness: int = 2) -> numpy.array:
+    """Draw a maze image which compiles back to the same maze (apply_vision_filter/apply_ground_filter)"""
+
+    side = maze.no_of_squares_per_side
+    length = maze.cell_side_length
+    img = numpy.full((side * length, side * length, 3), BACKGROUND_COLOR, numpy.uint8)
+
+    # Fill goal cells leaving a margin like Maze.png
+    margin = max(2, length // 8)
+    for row, col in numpy.argwhere(maze.ground).tolist():
+        cv2.rectangle(img, (col * length + margin, row * length + margin),
+                      ((col + 1) * length - margin, (row + 1) * length - margin), GOAL_COLOR, cv2.FILLED)
+
+    # Draw north and west walls of every cell, then the south and east border
+    last = side * length - 1
+    for row, col in numpy.argwhere(maze.walls & WALL_BITS[Direction.NORTH]).tolist():
+        cv2.line(img, (col * length, row * length), ((col + 1) * length, row * length), WALL_COLOR, wall_thickness)
+    for row, col in numpy.argwhere(maze.walls & WALL_BITS[Direction.WEST]).tolist():
+        cv2.line(img, (col * length, row * length), (col * length, (row + 1) * length), WALL_COLOR, wall_thickness)
+    for col in numpy.flatnonzero(maze.walls[-1, :] & WALL_BITS[Direction.SOUTH]).tolist():
+        cv2.line(img, (col * length, last), ((col + 1) * length, last), WALL_COLOR, wall_thickness)
+    for row in numpy.flatnonzero(maze.walls[:, -1] & WALL_BITS[Direction.EAST]).tolist():
+        cv2.line(img, (last, row * length), (last, (row + 1) * length), WALL_COLOR, wall_thickness)
+    return img
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate mazes as compiled mazes (.npz) and optionally images')
+    parser.add_argument('out', help='Output directory')
+    parser.add_argument('--count', type=int, default=1, help='Number of mazes')
+    parser.add_argument('--size', type=int, default=16, help='Number of squares per one side')
+    parser.add_argument('--algorithm', choices=[ALGORITHM_BACKTRACKER, ALGORITHM_KRUSKAL],
+                        default=ALGORITHM_BACKTRACKER)
+    parser.add_argument('--braid', type=float, default=0.0, help='Probability of removing each dead end (loops)')
+    parser.add_argument('--goal-size', type=int, default=2, help='Side of the square goal region')
+    parser.add_argument('--goal-corner', type=lambda value: tuple(int(v) for v in value.split(',')), default=None,
+                        help='ROW,COL of the top left goal cell (0 based, default centered)')
+    parser.add_argument('--start-corner', choices=['top-left', 'top-right', 'bottom-left', 'bottom-right'],
+                        default='top-right')
+    parser.add_argument('--cell', type=int, default=36, help='Cell side length in pixels')
+    parser.add_argument('--images', action='store_true', help='Also write .png images')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first maze (next ones use seed + i)')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for i in range(args.count):
+        maze = generate(args.size, args.algorithm, args.braid, args.goal_size, args.goal_corner, args.start_corner,
+                        args.cell, seed=args.seed + i)
+        name = os.path.join(args.out, "maze_{}_{}_{}".format(args.size, args.algorithm, args.seed + i))
+        if args.images:
+            # Image first, so the compiled maze is newer and load_or_compile does not compile it again
+            cv2.imwrite(name + ".png", render(maze))
+        maze_compiler.save(maze, name + ".npz")
+
+
+if __name__ == '__main__':
+    main()
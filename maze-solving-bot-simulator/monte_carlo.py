@@ -0,0 +1,151 @@
+import argparse
+import concurrent.futures
+import contextlib
+import csv
+import io
+import json
+import os
+import time
+import traceback
+
+import numpy
+
+import batch
+import maze_compiler
+import sensor_noise
+import settings
+import simulation
+import utils
+
+CSV_COLUMNS = ["seed", "finished", "steps", "turns", "exploration_steps", "final_run_steps", "estimated_run_time",
+               "loops", "failure"]
+PERCENTILES = (5, 50, 95)
+# Default step limit per maze cell. Noisy runs that fail usually go back and forth until the limit,
+# so a limit not far above what a successful run needs keeps batches short.
+STEPS_PER_CELL = 4
+
+
+def run_seed(job: tuple) -> dict:
+    """Run a script with one noise seed in a worker process"""
+
+    maze_path, script_path, start, noise, seed, max_steps, max_loops = job
+    utils.set_headless(True)
+    utils.set_goal_size(settings.settingsGoalSize)
+    maze = batch.load_maze(maze_path)
+    bot = simulation.create_compiled_robot(maze, *start, max_steps=max_steps)
+    bot.noise = sensor_noise.NoiseModel(seed=seed, **noise)
+    row = dict(seed=seed, failure="")
+    try:
+        # Scripts print their progress, which is only noise for thousands of runs
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = simulation.run(batch.load_class(script_path), None, bot, max_loops=max_loops)
+    except Exception:
+        # Noisy readings can lead scripts out of the maze or into states they do not expect
+        row.update(finished=False, steps=bot.steps, turns=bot.turns,
+                   failure=traceback.format_exc(limit=1).strip().splitlines()[-1].split(":")[0])
+        return row
+    row.update(finished=result.finished, steps=result.steps, turns=result.turns,
+               exploration_steps=result.exploration_steps, final_run_steps=result.final_run_steps,
+               estimated_run_time=result.estimated_run_time, loops=result.loops)
+    if not result.finished:
+        row["failure"] = "StepLimitExceeded" if bot.max_steps is not None and bot.steps >= bot.max_steps \
+            else "LoopLimitExceeded"
+    return row
+
+
+def _distribution(values: list) -> dict:
+    if not values:
+        return {}
+    values = numpy.array(values, float)
+    stats = dict(mean=float(values.mean()), std=float(values.std()), min=float(values.min()),
+                 max=float(values.max()))
+    for percentile, value in zip(PERCENTILES, numpy.percentile(values, PERCENTILES)):
+        stats["p{}".format(percentile)] = float(value)
+    return stats
+
+
+def summarize(rows: list) -> dict:
+    """Success rate, failure reasons and step distributions of the successful runs"""
+
+    finished = [row for row in rows if row["finished"]]
+    failures = {}
+    for row in rows:
+        if row["failure"]:
+            failures[row["failure"]] = failures.get(row["failure"], 0) + 1
+    return dict(runs=len(rows), success_rate=len(finished) / len(rows) if rows else 0.0, failures=failures,
+                steps=_distribution([row["steps"] for row in finished]),
+                final_run_steps=_distribution([row["final_run_steps"] for row in finished]),
+                estimated_run_time=_distribution([row["estimated_run_time"] for row in finished]))
+
+
+def format_summary(summary: dict) -> str:
+    lines = ["Runs: {}  success rate: {:.1%}".format(summary["runs"], summary["success_rate"])]
+    for failure, count in sorted(summary["failures"].items(), key=lambda item: -item[1]):
+        lines.append("  {}: {}".format(failure, count))
+    for name in ("steps", "final_run_steps", "estimated_run_time"):
+        stats = summary[name]
+        if stats:
+            lines.append("{:<20}".format(name) + "  ".join("{}={:.1f}".format(key, value)
+                                                           for key, value in stats.items()))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a script under many sensor noise seeds in parallel and '
+                                                 'summarize its success rate and steps')
+    parser.add_argument('--script', default="scripts.flood_fill.FloodFill", help='Script class as module.ClassName')
+    parser.add_argument('--maze', default=settings.settingsImagePath, help='Maze image or compiled maze (.npz)')
+    parser.add_argument('--grid', type=int, default=settings.settingsGridSideSquares,
+                        help='Number of squares per one side in the maze image')
+    parser.add_argument('--start', type=batch.parse_start, default=None,
+                        help='Start pose X,Y,DIRECTION (default from the maze or settings)')
+    parser.add_argument('--runs', type=int, default=1000, help='Number of seeds')
+    parser.add_argument('--seed', type=int, default=0, help='First seed (runs use seed, seed + 1, ...)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Standard deviation of distance noise (pixels)')
+    parser.add_argument('--dropout', type=float, default=0.0, help='Probability that a reading sees no barrier')
+    parser.add_argument('--false-wall', type=float, default=0.0,
+                        help='Probability that a reading sees a wall at the side of the cell')
+    parser.add_argument('--max-steps', type=int, default=None,
+                        help='Step limit of each run (default {} per maze cell)'.format(STEPS_PER_CELL))
+    parser.add_argument('--max-loops', type=int, default=None,
+                        help='Loop limit of each run (default 10 times the step limit)')
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes (default all cores)')
+    parser.add_argument('--out', default=None, help='Write one CSV row per seed to this file')
+    parser.add_argument('--json', default=None, help='Write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    maze_path = args.maze
+    if not maze_path.lower().endswith(".npz"):
+        maze_compiler.load_or_compile(maze_path, args.grid)
+        maze_path = maze_compiler.compiled_path(maze_path)
+    maze = maze_compiler.load(maze_path)
+    start = args.start or batch.default_start(maze)
+    max_steps = args.max_steps or STEPS_PER_CELL * maze.no_of_squares_per_side ** 2
+    max_loops = args.max_loops or 10 * max_steps
+    noise = dict(jitter=args.jitter, dropout=args.dropout, false_wall=args.false_wall)
+    jobs = [(maze_path, args.script, start, noise, seed, max_steps, max_loops)
+            for seed in range(args.seed, args.seed + args.runs)]
+
+    start_time = time.perf_counter()
+    processes = args.processes or os.cpu_count()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        # Results come back in seed order, so the output does not depend on the number of processes
+        rows = list(executor.map(run_seed, jobs, chunksize=max(1, len(jobs) // (processes * 8))))
+    elapsed_time = time.perf_counter() - start_time
+
+    summary = summarize(rows)
+    summary.update(script=args.script, maze=maze_path, start=list(start), noise=noise, seed=args.seed)
+    print(format_summary(summary))
+    print("{} runs in {:.1f}s".format(len(rows), elapsed_time))
+    if args.out:
+        with open(args.out, 'w', newline='') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=CSV_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(summary, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
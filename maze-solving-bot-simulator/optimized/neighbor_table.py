@@ -0,0 +1,65 @@
+import sys
+
+# Directions as in optimized_base_script
+NORTH = 0
+EAST = 1
+SOUTH = 2
+WEST = 3
+
+
+def off_grid(side_squares: int) -> int:
+    """Sentinel of neighbors outside the grid (one past the last position)"""
+    return side_squares * side_squares
+
+
+def build(side_squares: int) -> list:
+    """Neighbor of each position (X*SIDE_SQUARES + Y, as OptimizedUserScript) in each direction:
+    table[pos][direction], off_grid(side_squares) if the neighbor is outside the grid."""
+
+    outside = off_grid(side_squares)
+    table = []
+    for pos in range(side_squares * side_squares):
+        x, y = pos // side_squares, pos % side_squares
+        table.append((pos - 1 if y > 0 else outside,
+                      pos + side_squares if x < side_squares - 1 else outside,
+                      pos + 1 if y < side_squares - 1 else outside,
+                      pos - side_squares if x > 0 else outside))
+    return table
+
+
+def coordinates(side_squares: int) -> tuple:
+    """(X of each position, Y of each position)"""
+    positions = range(side_squares * side_squares)
+    return [pos // side_squares for pos in positions], [pos % side_squares for pos in positions]
+
+
+def to_c_source(side_squares: int) -> str:
+    """Neighbor and coordinate tables as C arrays for the Arduino port (kept in flash with PROGMEM)"""
+
+    cells = side_squares * side_squares
+    cell_type = "uint8_t" if off_grid(side_squares) <= 0xFF else "uint16_t"
+    x_coords, y_coords = coordinates(side_squares)
+    rows = ",\n".join("  {{{}}}".format(", ".join(str(node) for node in neighbors))
+                      for neighbors in build(side_squares))
+    return "\n".join([
+        "#include <avr/pgmspace.h>",
+        "#include <stdint.h>",
+        "",
+        "#define SIDE_SQUARES {}".format(side_squares),
+        "#define OFF_GRID {}".format(off_grid(side_squares)),
+        "",
+        "// NEIGHBORS[pos][direction]: neighbor of pos (X*SIDE_SQUARES + Y) towards NORTH, EAST, SOUTH, WEST",
+        "const {} NEIGHBORS[{}][4] PROGMEM = {{\n{}\n}};".format(cell_type, cells, rows),
+        "const uint8_t X_COORDS[{}] PROGMEM = {{{}}};".format(cells, ", ".join(map(str, x_coords))),
+        "const uint8_t Y_COORDS[{}] PROGMEM = {{{}}};".format(cells, ", ".join(map(str, y_coords))),
+        ""])
+
+
+def main():
+    # python -m optimized.neighbor_table 14 > neighbors.h
+    side_squares = int(sys.argv[1]) if len(sys.argv) > 1 else 14
+    print(to_c_source(side_squares), end="")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ import numpy
 
 import robot
 import utils
+from optimized import neighbor_table
 
 # #define values
 NORTH = 0
@@ -10,8 +11,8 @@ EAST = 1
 SOUTH = 2
 WEST = 3
 
-# No implementation
-WAIT_DURATION = 200
+# Reuse sensor readings until the bot moves or turns (no implementation)
+CACHE_SENSORS = True
 
 
 class OptimizedUserScript:
@@ -22,11 +23,16 @@ class OptimizedUserScript:
         # Constants
         self.SIDE_SQUARES = bot.no_of_squares_per_side
         self.START = 0
+        # Lookup tables (in flash on the Arduino, see optimized.neighbor_table)
+        self.OFF_GRID = neighbor_table.off_grid(self.SIDE_SQUARES)
+        self.NEIGHBORS = neighbor_table.build(self.SIDE_SQUARES)
+        self.X_COORDS, self.Y_COORDS = neighbor_table.coordinates(self.SIDE_SQUARES)
         # Positional variables
         self.direction: int = None
         self.pos: int = None
         # No implementation in Arduino, so no need to optimize
         self.img: numpy.array = None
+        self.sensor_cache = robot.SensorCache(bot, CACHE_SENSORS)
 
     # ==============================================================
     # ENTRY POINTS =================================================
@@ -47,29 +53,16 @@ class OptimizedUserScript:
     # ==============================================================
 
     def tile_in_the_direction(self, direction: int) -> int:
-        """ Get the coordinates of the tile in the 'direction'"""
-        # First extract X, Y coordinates
-        x = self.get_x_coord(self.pos)
-        y = self.get_y_coord(self.pos)
-        # Then change them
-        if direction == EAST:
-            x += 1
-        elif direction == WEST:
-            x -= 1
-        elif direction == NORTH:
-            y -= 1
-        elif direction == SOUTH:
-            y += 1
-        # Convert them back
-        return self.get_pos(x, y)
+        """ Get the position of the tile in the 'direction' (OFF_GRID if outside the grid)"""
+        return self.NEIGHBORS[self.pos][direction]
 
     def get_x_coord(self, pos):
         """Retrieve X coordinate from pos"""
-        return pos // self.SIDE_SQUARES
+        return self.X_COORDS[pos]
 
     def get_y_coord(self, pos):
         """Retrieve Y coordinate from pos"""
-        return pos % self.SIDE_SQUARES
+        return self.Y_COORDS[pos]
 
     def get_pos(self, x, y):
         """Convert X, Y to a integer by denoting XY in SIDE_SQUARES base"""
@@ -99,6 +92,13 @@ class OptimizedUserScript:
         self.bot.go_forward()
         self.refresh_screen(self.img)
 
+    def go_forward_n(self, cells: int):
+        """Goes cells steps forward in one move (screen is refreshed once)"""
+        for _ in range(cells):
+            self.pos = self.tile_in_the_direction(self.direction)
+        self.bot.go_forward_n(cells)
+        self.refresh_screen(self.img)
+
     # HIGHER ORDER MOVEMENT ---------------------------------------
 
     def go_to_right(self, ):
@@ -121,19 +121,19 @@ class OptimizedUserScript:
 
     def is_wall_in_front(self) -> bool:
         """Return True if wall is in front"""
-        return self.bot.front_sensor() < self.bot.cell_side_length
+        return self.sensor_cache.read(self.bot.front_sensor) < self.bot.cell_side_length
 
     def is_wall_in_right(self) -> bool:
         """Return True if wall is in right"""
-        return self.bot.right_sensor() < self.bot.cell_side_length
+        return self.sensor_cache.read(self.bot.right_sensor) < self.bot.cell_side_length
 
     def is_wall_in_left(self) -> bool:
         """Return True if wall is in left"""
-        return self.bot.left_sensor() < self.bot.cell_side_length
+        return self.sensor_cache.read(self.bot.left_sensor) < self.bot.cell_side_length
 
     def is_ground_center(self) -> bool:
         """Check if ground color is center color"""
-        return self.bot.ground_sensor()
+        return self.sensor_cache.read(self.bot.ground_sensor)
 
     # --------------------------------------------------------------
     # HELPER FUNCTIONS ---------------------------------------------
@@ -142,21 +142,19 @@ class OptimizedUserScript:
     def refresh_screen(self, img: numpy.array) -> bool:
         """Refreshes Screen"""
         utils.refresh_screen(img, self.bot)
-        return self.user_pressed_exit(WAIT_DURATION)
+        return self.user_pressed_exit()
 
     # --------------------------------------------------------------
-    # STATIC METHODS -----------------------------------------------
+    # WAITING (SIMULATION CLOCK, NO IMPLEMENTATION) ----------------
     # --------------------------------------------------------------
 
-    @staticmethod
-    def wait_for_user_key(timeout: int) -> int:
-        """Return user interruption"""
-        return cv2.waitKey(timeout)
+    def wait_for_user_key(self, timeout: int = None) -> int:
+        """Return user interruption (timeouts as UserScript.wait_for_user_key)"""
+        return self.bot.clock.wait(timeout)
 
-    @staticmethod
-    def user_pressed_exit(timeout: int) -> bool:
-        """Wait for some time and if Esc pressed exit, otherwise return False"""
-        pressed_key = OptimizedUserScript.wait_for_user_key(timeout)
+    def user_pressed_exit(self, timeout: int = None) -> bool:
+        """Wait as wait_for_user_key and if Esc pressed exit, otherwise return False"""
+        pressed_key = self.wait_for_user_key(timeout)
         if pressed_key == 27:
             cv2.destroyAllWindows()
             raise SystemExit
@@ -1,12 +1,20 @@
 import collections
 
+import flood_kernel
 import robot
-from datatypes import SimulationRunStatus, Direction
-from optimized import optimized_base_script
+import utils
+from datatypes import SimulationRunStatus, Direction, Phase
+from optimized import optimized_base_script, wall_bitboard
 
 DEBUG = True
 # Top left = 0, Bottom Left = 1, Bottom Right = 2, Bottom Left = 3
 DEBUG_ROTATE = 0
+# Repair only the cells affected by new walls instead of flooding from scratch every step
+INCREMENTAL_FLOOD = True
+# flood_kernel.KERNEL_BFS, flood_kernel.KERNEL_NUMPY (whole grid at once, slower on small mazes, no Arduino
+# implementation) or flood_kernel.KERNEL_AUTO (NumPy from flood_kernel.NUMPY_MIN_SIDE squares per side).
+# NumPy floods the whole grid again after new walls instead of repairing it, so the BFS stays the default.
+FLOOD_KERNEL = flood_kernel.KERNEL_BFS
 
 
 class OptimizedFloodFill(optimized_base_script.OptimizedUserScript):
@@ -16,20 +24,27 @@ class OptimizedFloodFill(optimized_base_script.OptimizedUserScript):
         self.facing_direction_discovered: bool = None
         self.path_traced_to_center: bool = None
         self.real_run: bool = None
+        self.real_run_completed: bool = None
 
-        self.CENTER: int = self.get_pos(self.SIDE_SQUARES // 2, self.SIDE_SQUARES // 2)
+        # Positions of the goal region in the center
+        self.GOAL: list = [self.get_pos(x, y) for x, y in utils.goal_cells(self.SIDE_SQUARES)]
 
         self.flooded_grid: list = None
-        self.walls: list = None
+        self.walls: wall_bitboard.WallBitboard = None
+        self.flood_targets: list = None
+        self.flood_pending: list = None
 
     def setup(self):
         super().setup()
         self.facing_direction_discovered = False
         self.path_traced_to_center = False
         self.real_run = False
+        self.real_run_completed = False
 
         self.flooded_grid = [-1] * self.SIDE_SQUARES * self.SIDE_SQUARES
-        self.walls = []
+        self.walls = wall_bitboard.WallBitboard(self.SIDE_SQUARES)
+        self.flood_targets = []  # Cells the flooded grid was flooded from (empty if not flooded yet)
+        self.flood_pending = []  # Cells next to walls added after the last flood
 
     def loop(self, img) -> int:
         super().loop(img)
@@ -41,17 +56,17 @@ class OptimizedFloodFill(optimized_base_script.OptimizedUserScript):
         elif not self.path_traced_to_center:
             self.bot.set_ball_color([53, 216, 255])
             self.add_walls()
-            self.flood_fill(self.CENTER)
+            self.update_flood_fill(self.GOAL)
             self.go_to_best_cell()
 
-            if self.pos == self.CENTER:
+            if self.pos in self.GOAL:
                 self.path_traced_to_center = True
                 self.wait_for_user_key(0)
 
         elif not self.real_run:
             self.bot.set_ball_color([140, 110, 90])
             self.add_walls()
-            self.flood_fill(self.START)
+            self.update_flood_fill([self.START])
             self.go_to_best_cell()
 
             if self.pos == self.START:
@@ -60,26 +75,28 @@ class OptimizedFloodFill(optimized_base_script.OptimizedUserScript):
 
         else:
             self.bot.set_ball_color([0, 255, 0])
+            self.bot.set_phase(Phase.FINAL_RUN)
             self.add_walls()
-            self.flood_fill(self.CENTER)
+            self.update_flood_fill(self.GOAL)
             self.go_to_best_cell()
 
-            if self.pos == self.CENTER:
+            if self.pos in self.GOAL:
                 self.real_run = False
+                self.real_run_completed = True
                 self.wait_for_user_key(0)
 
+        if self.real_run_completed and utils.HEADLESS:
+            # Nobody is watching the bot going back and forth, so stop after the real run
+            return SimulationRunStatus.STOP_SIMULATION
         return SimulationRunStatus.RESUME_SIMULATION
 
-    def encode_wall(self, a, b):
-        if b < a:
-            a, b = b, a
-        return a * self.SIDE_SQUARES * self.SIDE_SQUARES + b
-
-    def decode_wall_a(self, v):
-        return v // (self.SIDE_SQUARES * self.SIDE_SQUARES)
-
-    def decode_wall_b(self, v):
-        return v % (self.SIDE_SQUARES * self.SIDE_SQUARES)
+    def memory_report(self) -> str:
+        """Memory footprint of the walls and the flooded grid (as 16 bit integers) on an Arduino"""
+        flood_bytes = 2 * self.SIDE_SQUARES * self.SIDE_SQUARES
+        total_bytes = flood_bytes + self.walls.memory_bytes()
+        return "{}\nflood: {} bytes\ntotal: {} bytes ({:.1f}% of {} bytes Arduino SRAM)".format(
+            self.walls.memory_report(), flood_bytes, total_bytes,
+            100 * total_bytes / wall_bitboard.ARDUINO_RAM_BYTES, wall_bitboard.ARDUINO_RAM_BYTES)
 
     def discover_facing_direction(self):
         """Go some distance and identify which side bot is turned"""
@@ -126,55 +143,113 @@ class OptimizedFloodFill(optimized_base_script.OptimizedUserScript):
 
         self.facing_direction_discovered = True
 
-    def flood_fill(self, search_pos: int):
+    def update_flood_fill(self, targets: list):
+        """Bring flooded grid up to date with the walls"""
+        if flood_kernel.select(FLOOD_KERNEL, self.SIDE_SQUARES) == flood_kernel.KERNEL_NUMPY:
+            if not INCREMENTAL_FLOOD or targets != self.flood_targets or self.flood_pending:
+                self.numpy_flood_fill(targets)
+        elif INCREMENTAL_FLOOD and targets == self.flood_targets:
+            self.repair_flood_fill(targets)
+        else:
+            self.flood_fill(targets)
+
+    def numpy_flood_fill(self, targets: list):
+        """Same as flood_fill using flood_kernel"""
+        self.flood_targets = targets
+        self.flood_pending = []
+
+        walls_x, walls_y = self.walls.to_edge_masks()
+        cells = [(self.get_x_coord(target), self.get_y_coord(target)) for target in targets]
+        self.flooded_grid = flood_kernel.flood_fill(walls_x, walls_y, cells).ravel().tolist()
+
+    def flood_fill(self, targets: list):
+        """Flood from all target cells at once (multi-source BFS), distance to the closest one"""
+        self.flood_targets = targets
+        self.flood_pending = []
 
         # Set all cells to -1 (Unvisited)
         for i in range(self.SIDE_SQUARES * self.SIDE_SQUARES):
             self.flooded_grid[i] = -1
 
-        # Set center cell distance to 0
-        self.flooded_grid[search_pos] = 0
-        queue = collections.deque([search_pos])
+        # Set target cell distances to 0
+        for target in targets:
+            self.flooded_grid[target] = 0
+        queue = collections.deque(targets)
 
         while queue:
             current = queue.pop()
-            current_x = self.get_x_coord(current)
-            current_y = self.get_y_coord(current)
 
-            nodes = [self.get_pos(current_x - 1, current_y),
-                     self.get_pos(current_x + 1, current_y),
-                     self.get_pos(current_x, current_y - 1),
-                     self.get_pos(current_x, current_y + 1)]
-
-            for node in nodes:
+            for node in self.NEIGHBORS[current]:
                 # Skip if out of range
-                node_x = self.get_x_coord(node)
-                node_y = self.get_y_coord(node)
-                if not 0 <= node_x < self.bot.no_of_squares_per_side or \
-                        not 0 <= node_y < self.bot.no_of_squares_per_side:
+                if node == self.OFF_GRID:
                     continue
                 # Skip if already visited
                 if self.flooded_grid[node] != -1:
                     continue
                 # Skip if has a wall
-                wall = self.encode_wall(current, node)
-                if wall in self.walls:
+                if self.walls.has_wall(current, node):
                     continue
                 self.flooded_grid[node] = self.flooded_grid[current] + 1
                 queue.appendleft(node)
 
+    def repair_flood_fill(self, targets: list):
+        """Modified flood fill. Walls only make distances larger, so starting from the cells next to new walls,
+        make each cell 1 + minimum of its open neighbors and recheck the neighbors of every cell that changed."""
+
+        # No new walls, flooded grid is still correct
+        if not self.flood_pending:
+            return
+
+        # Distances can not reach this. Cells walled off from the target count up to this and become -1 (Unvisited)
+        unreachable = self.SIDE_SQUARES * self.SIDE_SQUARES
+        stack = self.flood_pending
+        self.flood_pending = []
+
+        while stack:
+            current = stack.pop()
+            if current in targets:
+                continue
+            neighbors = self.open_neighbors(current)
+
+            min_val = -1
+            for node in neighbors:
+                val = self.flooded_grid[node]
+                if val != -1 and (min_val == -1 or val < min_val):
+                    min_val = val
+            if min_val == -1 or min_val + 1 >= unreachable:
+                new_val = -1
+            else:
+                new_val = min_val + 1
+
+            if self.flooded_grid[current] != new_val:
+                self.flooded_grid[current] = new_val
+                stack.extend(neighbors)
+
+    def open_neighbors(self, current: int) -> list:
+        """Neighbors of a cell which are not separated by a known wall (same neighbors flood_fill visits)"""
+        north, east, south, west = self.NEIGHBORS[current]
+
+        neighbors = []
+        for node in (west, east, north, south):
+            # Skip if out of range
+            if node == self.OFF_GRID:
+                continue
+            # Skip if has a wall
+            if self.walls.has_wall(current, node):
+                continue
+            neighbors.append(node)
+        return neighbors
+
     def add_wall_between(self, a: int, b: int):
-        # Skip if out of range
-        a_x = self.get_x_coord(a)
-        a_y = self.get_y_coord(a)
-        b_x = self.get_x_coord(b)
-        b_y = self.get_y_coord(b)
-        if not 0 <= a_x < self.SIDE_SQUARES or not 0 <= a_y < self.SIDE_SQUARES:
+        # Skip if out of range (b is OFF_GRID at the border)
+        if b == self.OFF_GRID:
             return
-        if not 0 <= b_x < self.SIDE_SQUARES or not 0 <= b_y < self.SIDE_SQUARES:
+        if not self.walls.set_wall(a, b):
+            # Already known
             return
-        wall = self.encode_wall(a, b)
-        self.walls.append(wall)
+        # Distances around the new wall may have changed
+        self.flood_pending.append(a)
+        self.flood_pending.append(b)
 
     def add_walls(self):
         this_node = self.pos
@@ -189,12 +264,7 @@ class OptimizedFloodFill(optimized_base_script.OptimizedUserScript):
             self.add_wall_between(this_node, front_node)
 
     def go_to_best_cell(self) -> int:
-        x = self.get_x_coord(self.pos)
-        y = self.get_y_coord(self.pos)
-        nodes = [self.get_pos(x - 1, y),
-                 self.get_pos(x + 1, y),
-                 self.get_pos(x, y - 1),
-                 self.get_pos(x, y + 1)]
+        north, east, south, west = self.NEIGHBORS[self.pos]
 
         right_node = self.tile_in_the_direction((self.direction + 1) % 4)
         front_node = self.tile_in_the_direction(self.direction)
@@ -202,12 +272,10 @@ class OptimizedFloodFill(optimized_base_script.OptimizedUserScript):
 
         min_val = self.flooded_grid[self.pos]
         min_pos = self.pos
-        for node in nodes:
+        # Same order as before the neighbor table, ties go to the first cell
+        for node in (west, east, north, south):
             # Skip if out of range
-            node_x = self.get_x_coord(node)
-            node_y = self.get_y_coord(node)
-            if not 0 <= node_x < self.SIDE_SQUARES or \
-                    not 0 <= node_y < self.SIDE_SQUARES:
+            if node == self.OFF_GRID:
                 continue
 
             if node == right_node and self.is_wall_in_right():
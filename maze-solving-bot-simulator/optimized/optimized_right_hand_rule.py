@@ -1,3 +1,4 @@
+from datatypes import SimulationRunStatus
 from optimized import optimized_base_script
 
 
@@ -24,3 +25,5 @@ class OptimizedRightHandRule(optimized_base_script.OptimizedUserScript):
                 self.go_to_left()
             else:
                 self.go_backward()
+
+        return SimulationRunStatus.STOP_SIMULATION
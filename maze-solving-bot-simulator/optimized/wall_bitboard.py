@@ -0,0 +1,82 @@
+import sys
+
+import numpy
+
+# SRAM of an Arduino Uno (ATmega328P)
+ARDUINO_RAM_BYTES = 2048
+
+
+class WallBitboard:
+    """Walls between neighboring cells stored as bits. Cells are positions X*SIDE_SQUARES + Y
+    (same as OptimizedUserScript). Uses exactly 2*SIDE_SQUARES*(SIDE_SQUARES-1) bits:
+    horizontal -- wall between (X, Y) and (X + 1, Y) is bit X*SIDE_SQUARES + Y
+    vertical   -- wall between (X, Y) and (X, Y + 1) is bit X*(SIDE_SQUARES-1) + Y"""
+
+    def __init__(self, side_squares: int):
+        self.SIDE_SQUARES = side_squares
+        self.EDGES = side_squares * (side_squares - 1)
+        self.horizontal = bytearray((self.EDGES + 7) // 8)
+        self.vertical = bytearray((self.EDGES + 7) // 8)
+
+    def edge(self, a: int, b: int) -> tuple:
+        """(bit array, bit index) of the wall between a and b. (None, -1) if a and b are not neighbors."""
+        if b < a:
+            a, b = b, a
+        if a < 0 or b >= self.SIDE_SQUARES * self.SIDE_SQUARES:
+            return None, -1
+        if b - a == self.SIDE_SQUARES:
+            return self.horizontal, a
+        # Y + 1 of the last row is the first cell of next column, they are not neighbors
+        if b - a == 1 and b % self.SIDE_SQUARES != 0:
+            return self.vertical, a - a // self.SIDE_SQUARES
+        return None, -1
+
+    def set_wall(self, a: int, b: int) -> bool:
+        """Mark wall between a and b. Returns False if wall was already there or a and b are not neighbors."""
+        bits, index = self.edge(a, b)
+        if bits is None:
+            return False
+        mask = 1 << (index & 7)
+        if bits[index >> 3] & mask:
+            return False
+        bits[index >> 3] |= mask
+        return True
+
+    def has_wall(self, a: int, b: int) -> bool:
+        """Whether a and b are separated by a wall. Cells which are not neighbors are always separated."""
+        bits, index = self.edge(a, b)
+        if bits is None:
+            return True
+        return bool(bits[index >> 3] & (1 << (index & 7)))
+
+    def count(self) -> int:
+        """Number of walls stored"""
+        return sum(bin(byte).count("1") for byte in self.horizontal + self.vertical)
+
+    def to_edge_masks(self) -> tuple:
+        """Walls as boolean arrays for flood_kernel (simulation only, no Arduino implementation).
+        Returns (walls between [X, Y] and [X + 1, Y], walls between [X, Y] and [X, Y + 1])"""
+        horizontal = numpy.unpackbits(numpy.frombuffer(self.horizontal, numpy.uint8), bitorder="little")
+        vertical = numpy.unpackbits(numpy.frombuffer(self.vertical, numpy.uint8), bitorder="little")
+        return (horizontal[:self.EDGES].reshape(self.SIDE_SQUARES - 1, self.SIDE_SQUARES).astype(bool),
+                vertical[:self.EDGES].reshape(self.SIDE_SQUARES, self.SIDE_SQUARES - 1).astype(bool))
+
+    def memory_bytes(self) -> int:
+        """Bytes needed to store the walls"""
+        return len(self.horizontal) + len(self.vertical)
+
+    def memory_report(self) -> str:
+        """Memory footprint of the wall store compared to an Arduino Uno SRAM"""
+        return "walls: {}x{} grid, {} bits, {} bytes ({:.1f}% of {} bytes Arduino SRAM)".format(
+            self.SIDE_SQUARES, self.SIDE_SQUARES, 2 * self.EDGES, self.memory_bytes(),
+            100 * self.memory_bytes() / ARDUINO_RAM_BYTES, ARDUINO_RAM_BYTES)
+
+
+def main():
+    # python -m optimized.wall_bitboard 14 16 32
+    for side_squares in sys.argv[1:] or [14]:
+        print(WallBitboard(int(side_squares)).memory_report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import heapq
+from array import array
+
+import numpy
+
+from datatypes import Direction
+
+# Estimated seconds the real bot needs for each action
+CELL_COST = 0.5  # One cell starting from a standstill (after a turn or at the start)
+STRAIGHT_COST = 0.3  # One more cell while already moving straight
+TURN_COST = 0.6  # 90' turn in place
+
+ACTION_FORWARD = 0
+ACTION_TURN_RIGHT = 1
+ACTION_TURN_LEFT = 2
+
+NO_CELL = -1
+UNREACHED = float("inf")
+
+
+class Plan:
+    """Actions (ACTION_*) to reach a target and their estimated time (None and inf if unreachable)"""
+
+    def __init__(self, actions: list, cost: float, target: int):
+        self.actions = actions
+        self.cost = cost
+        self.target = target
+
+    @property
+    def found(self) -> bool:
+        return self.actions is not None
+
+    def __repr__(self):
+        return "Plan(actions={}, cost={:.2f}, target={})".format(self.actions, self.cost, self.target)
+
+
+class Planner:
+    """Dijkstra search over (cell, heading, moving straight) states with turn and straight run costs.
+
+    Cells are indexes of a neighbor table: neighbors[cell * 4 + direction] is the cell reached by
+    going one cell in direction, or NO_CELL if there is a wall."""
+
+    def __init__(self, cell_cost: float = CELL_COST, straight_cost: float = STRAIGHT_COST,
+                 turn_cost: float = TURN_COST):
+        self.cell_cost = cell_cost
+        self.straight_cost = straight_cost
+        self.turn_cost = turn_cost
+        self.expanded = 0
+
+    def plan(self, neighbors, start: int, heading: int, targets) -> Plan:
+        """Cheapest actions from start cell facing heading (bot standing still) to any of targets"""
+
+        targets = set(targets)
+        states = len(neighbors) * 2
+        # State = (cell * 4 + heading) * 2 + moving straight
+        cost = array("d", [UNREACHED]) * states
+        previous = array("l", [-1]) * states
+        action_taken = array("b", [-1]) * states
+
+        first = (start * Direction.DIRECTIONS + heading) * 2
+        cost[first] = 0.0
+        heap = [(0.0, first)]
+        while heap:
+            state_cost, state = heapq.heappop(heap)
+            if state_cost > cost[state]:
+                continue
+            self.expanded += 1
+            cell_heading, moving = state >> 1, state & 1
+            cell, direction = divmod(cell_heading, Direction.DIRECTIONS)
+            if cell in targets:
+                return Plan(self._actions(previous, action_taken, state), state_cost, cell)
+
+            # Turns stop the bot, going forward keeps it moving
+            right = (cell * Direction.DIRECTIONS + (direction + 1) % Direction.DIRECTIONS) * 2
+            left = (cell * Direction.DIRECTIONS + (direction - 1) % Direction.DIRECTIONS) * 2
+            successors = [(right, ACTION_TURN_RIGHT, self.turn_cost), (left, ACTION_TURN_LEFT, self.turn_cost)]
+            next_cell = neighbors[cell_heading]
+            if next_cell != NO_CELL:
+                successors.append(((next_cell * Direction.DIRECTIONS + direction) * 2 + 1, ACTION_FORWARD,
+                                   self.straight_cost if moving else self.cell_cost))
+
+            for successor, action, action_cost in successors:
+                successor_cost = state_cost + action_cost
+                if successor_cost < cost[successor]:
+                    cost[successor] = successor_cost
+                    previous[successor] = state
+                    action_taken[successor] = action
+                    heapq.heappush(heap, (successor_cost, successor))
+
+        return Plan(None, UNREACHED, NO_CELL)
+
+    def action_cost(self, action: int, moving: bool) -> float:
+        """Estimated time of one action with the costs of this planner"""
+        return action_cost(action, moving, self.cell_cost, self.straight_cost, self.turn_cost)
+
+    @staticmethod
+    def _actions(previous: array, action_taken: array, state: int) -> list:
+        actions = []
+        while previous[state] != -1:
+            actions.append(action_taken[state])
+            state = previous[state]
+        actions.reverse()
+        return actions
+
+
+def action_cost(action: int, moving: bool, cell_cost: float = CELL_COST, straight_cost: float = STRAIGHT_COST,
+                turn_cost: float = TURN_COST) -> float:
+    """Estimated time of one action (moving is whether the bot went forward in the previous action)"""
+    if action == ACTION_FORWARD:
+        return straight_cost if moving else cell_cost
+    return turn_cost
+
+
+def compress(actions: list) -> list:
+    """Merge repeated actions into segments [(action, count), ...] (eg: forward 3 cells, turn right twice)"""
+
+    segments = []
+    for action in actions:
+        if segments and segments[-1][0] == action:
+            segments[-1] = (action, segments[-1][1] + 1)
+        else:
+            segments.append((action, 1))
+    return segments
+
+
+def to_c_source(segments: list, name: str = "PATH") -> str:
+    """Segments as C arrays for the bot firmware"""
+
+    letters = {ACTION_FORWARD: "'F'", ACTION_TURN_RIGHT: "'R'", ACTION_TURN_LEFT: "'L'"}
+    return "\n".join([
+        "#include <stdint.h>",
+        "",
+        "// F: forward count cells, R: turn right count times, L: turn left count times",
+        "const int {}_LENGTH = {};".format(name, len(segments)),
+        "const char {}_ACTIONS[] = {{{}}};".format(name, ", ".join(letters[action] for action, _ in segments)),
+        "const uint8_t {}_COUNTS[] = {{{}}};".format(name, ", ".join(str(count) for _, count in segments)),
+        ""])
+
+
+def grid_neighbors(walls_x: numpy.array, walls_y: numpy.array, explored: numpy.array = None) -> list:
+    """Neighbor table of a grid with walls as in flood_kernel.flood_fill (cell = x * side + y).
+    If explored[x, y] is given, only cells whose walls are all known (explored) are connected."""
+
+    side = walls_y.shape[0]
+    # open_to[direction][x, y]: whether (x, y) has no wall on that side
+    open_to = numpy.zeros((Direction.DIRECTIONS, side, side), bool)
+    open_to[Direction.EAST, :-1, :] = ~walls_x
+    open_to[Direction.WEST, 1:, :] = ~walls_x
+    open_to[Direction.SOUTH, :, :-1] = ~walls_y
+    open_to[Direction.NORTH, :, 1:] = ~walls_y
+    if explored is not None:
+        open_to[Direction.EAST, :-1, :] &= explored[:-1, :] & explored[1:, :]
+        open_to[Direction.WEST, 1:, :] &= explored[:-1, :] & explored[1:, :]
+        open_to[Direction.SOUTH, :, :-1] &= explored[:, :-1] & explored[:, 1:]
+        open_to[Direction.NORTH, :, 1:] &= explored[:, :-1] & explored[:, 1:]
+
+    cells = numpy.arange(side * side).reshape(side, side)
+    step = {Direction.NORTH: -1, Direction.EAST: side, Direction.SOUTH: 1, Direction.WEST: -side}
+    neighbors = numpy.full((side, side, Direction.DIRECTIONS), NO_CELL)
+    for direction in range(Direction.DIRECTIONS):
+        neighbors[..., direction] = numpy.where(open_to[direction], cells + step[direction], NO_CELL)
+    return neighbors.reshape(-1).tolist()
+
+
+def graph_neighbors(graph: dict) -> tuple:
+    """Neighbor table of a graph {(x, y): set of connected (x, y)}. Returns (neighbors, cell index of each node)."""
+
+    index = {node: i for i, node in enumerate(graph)}
+    neighbors = [NO_CELL] * (len(index) * Direction.DIRECTIONS)
+    offsets = {(0, -1): Direction.NORTH, (1, 0): Direction.EAST, (0, 1): Direction.SOUTH, (-1, 0): Direction.WEST}
+    for node, connected in graph.items():
+        for other in connected:
+            direction = offsets.get((other[0] - node[0], other[1] - node[1]))
+            if direction is not None:
+                neighbors[index[node] * Direction.DIRECTIONS + direction] = index[other]
+    return neighbors, index
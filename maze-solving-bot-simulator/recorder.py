@@ -0,0 +1,88 @@
+import queue
+import threading
+
+import cv2
+import numpy
+
+import robot
+
+
+class VideoRecorder:
+    """Writes simulation frames to a video file with cv2.VideoWriter.
+
+    Encoding runs on a background thread. Frames go to it through a bounded queue and are dropped
+    (not waited for) when the queue is full, so recording never slows down the bot,
+    unless drop_frames is False, then the bot waits for the encoder instead.
+    Only one frame of every `every` frames is recorded, scaled by `scale`.
+    If phases is given (datatypes.Phase values), only frames of those phases are recorded."""
+
+    def __init__(self, filename: str, fps: float = 30, every: int = 1, scale: float = 1.0, phases: set = None,
+                 queue_size: int = 64, fourcc: str = "mp4v", drop_frames: bool = True):
+        self.filename = filename
+        self.fps = fps
+        self.every = max(every, 1)
+        self.scale = scale
+        self.phases = None if phases is None else set(phases)
+        self.fourcc = fourcc
+        self.drop_frames = drop_frames
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self._count = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer: cv2.VideoWriter = None
+        self._thread = threading.Thread(target=self._encode, name="video-recorder", daemon=True)
+        self._thread.start()
+
+    def wants(self, bot: robot.Robot) -> bool:
+        """Whether the next frame should be recorded (call once per frame)"""
+
+        if self.phases is not None and bot.phase not in self.phases:
+            return False
+        self._count += 1
+        return (self._count - 1) % self.every == 0
+
+    def write(self, frame: numpy.array):
+        """Queue a frame. The frame is copied, so the caller can keep drawing on it."""
+
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        else:
+            frame = numpy.copy(frame)
+        try:
+            self._queue.put(frame, block=not self.drop_frames)
+        except queue.Full:
+            self.frames_dropped += 1
+
+    def close(self):
+        """Write the remaining frames and close the file"""
+
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+    def _encode(self):
+        size = None
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                return
+            if self._writer is None:
+                size = (frame.shape[1], frame.shape[0])
+                self._writer = cv2.VideoWriter(self.filename, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, size)
+            elif (frame.shape[1], frame.shape[0]) != size:
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            self._writer.write(frame)
+            self.frames_written += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return "VideoRecorder({}, written={}, dropped={})".format(self.filename, self.frames_written,
+                                                                  self.frames_dropped)
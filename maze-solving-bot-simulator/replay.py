@@ -0,0 +1,158 @@
+import argparse
+import bisect
+import collections
+import time
+
+import cv2
+import numpy
+
+import bot_trace
+import recorder
+import robot
+import utils
+from datatypes import Direction, Phase
+
+# Cell offset of one step forward in each direction (indexed by Direction)
+STEP_X = numpy.array([0, 1, 0, -1])
+STEP_Y = numpy.array([-1, 0, 1, 0])
+
+
+class Replay:
+    """Bot poses rebuilt from a trace without running the script again.
+
+    Pose 0 is the start pose and pose i is the pose after the i-th move or turn."""
+
+    def __init__(self, trace: bot_trace.Trace):
+        self.trace = trace
+        ops = trace.ops
+        start_x, start_y, start_direction = trace.start
+
+        moves = (ops == bot_trace.OP_FORWARD).astype(numpy.int64) - (ops == bot_trace.OP_BACKWARD)
+        turns = (ops == bot_trace.OP_TURN_RIGHT).astype(numpy.int64) - (ops == bot_trace.OP_TURN_LEFT)
+        # Pose after each event
+        direction = (start_direction + numpy.cumsum(turns)) % Direction.DIRECTIONS
+        x = start_x + numpy.cumsum(moves * STEP_X[direction])
+        y = start_y + numpy.cumsum(moves * STEP_Y[direction])
+
+        # Event index of each pose (-1 for the start pose)
+        self.events = numpy.concatenate(([-1], numpy.flatnonzero(moves | turns)))
+        self.x = numpy.concatenate(([start_x], x[self.events[1:]]))
+        self.y = numpy.concatenate(([start_y], y[self.events[1:]]))
+        self.direction = numpy.concatenate(([start_direction], direction[self.events[1:]]))
+        self._phase_events = sorted(trace.phases)
+        self._color_events = sorted(trace.ball_colors)
+
+    def __len__(self):
+        return len(self.events)
+
+    def pose(self, index: int) -> tuple:
+        """(x, y, direction) of pose index"""
+        return int(self.x[index]), int(self.y[index]), int(self.direction[index])
+
+    def phase(self, index: int) -> str:
+        """Run phase when pose index was reached"""
+        return self._value_at(self._phase_events, self.trace.phases, index, Phase.EXPLORE)
+
+    def ball_color(self, index: int) -> tuple:
+        """Ball color of the bot at pose index"""
+        return self._value_at(self._color_events, self.trace.ball_colors, index, (0, 0, 0))
+
+    def _value_at(self, events: list, values: dict, index: int, default):
+        i = bisect.bisect_right(events, self.events[index]) - 1
+        return values[events[i]] if i >= 0 else default
+
+    def bot(self, index: int = 0) -> robot.Robot:
+        """A bot placed at pose index (only for drawing, it has no sensors)"""
+
+        bot = robot.Robot(0, 0, Direction.NORTH, wall_map=None, ground_map=None,
+                          no_of_squares_per_side=self.trace.no_of_squares_per_side,
+                          cell_side_length=self.trace.cell_side_length, distance_maps=[])
+        self.place(bot, index)
+        return bot
+
+    def place(self, bot: robot.Robot, index: int):
+        """Move a bot to pose index"""
+        bot._x, bot._y, bot._direction = self.pose(index)
+        bot._ball_color = self.ball_color(index)
+        bot.phase = self.phase(index)
+
+    def frame(self, img: numpy.array, index: int, trail: bool = False) -> numpy.array:
+        """Simulation frame at pose index. With trail, the path up to that pose is drawn too."""
+
+        frame = numpy.copy(img)
+        if trail:
+            side = self.trace.cell_side_length
+            points = numpy.stack((self.x[:index + 1], self.y[:index + 1]), axis=1) * side - side // 2
+            cv2.polylines(frame, [points.astype(numpy.int32)], False, (0, 200, 0), 2)
+        return utils.draw_robot(self.bot(index), frame)
+
+    def frames(self, img: numpy.array, every: int = 1):
+        """Yields (index, frame) of every `every` poses. The same frame buffer is reused."""
+
+        renderer = utils.Renderer()
+        bot = self.bot()
+        for index in range(0, len(self), max(every, 1)):
+            self.place(bot, index)
+            yield index, renderer.draw(img, bot)
+
+    def summary(self) -> str:
+        ops = self.trace.ops
+        counts = collections.Counter(ops.tolist())
+        phase_steps = collections.Counter(self.phase(i) for i in range(1, len(self))
+                                          if ops[self.events[i]] <= bot_trace.OP_BACKWARD)
+        sensor_reads = sum(counts[op] for op in (bot_trace.OP_FRONT_SENSOR, bot_trace.OP_LEFT_SENSOR,
+                                                 bot_trace.OP_RIGHT_SENSOR))
+        sensor_reads += numpy.count_nonzero((ops == bot_trace.OP_OTHER) & (self.trace.values >= 0))
+        return "events={} steps={} turns={} sensor_reads={} phase_steps={} end={}".format(
+            len(ops), counts[bot_trace.OP_FORWARD] + counts[bot_trace.OP_BACKWARD],
+            counts[bot_trace.OP_TURN_RIGHT] + counts[bot_trace.OP_TURN_LEFT], sensor_reads,
+            dict(phase_steps), self.pose(len(self) - 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild bot poses and frames from a trace file')
+    parser.add_argument('trace', help='Trace file written with run.py --trace')
+    parser.add_argument('--image', default=None, help='Maze image (needed to draw frames)')
+    parser.add_argument('--frame', type=int, default=None, metavar='POSE', help='Save the frame of this pose')
+    parser.add_argument('--out', default='frame.png', help='File to save --frame to')
+    parser.add_argument('--trail', action='store_true', help='Draw the path up to the pose in --frame')
+    parser.add_argument('--video', default=None, metavar='FILE', help='Write all frames to a video file')
+    parser.add_argument('--every', type=int, default=1, metavar='N', help='Only use one of every N poses')
+    parser.add_argument('--scale', type=float, default=1.0, help='Scale video frames by this factor')
+    parser.add_argument('--fps', type=float, default=30, help='Frame rate of the video')
+    parser.add_argument('--show', action='store_true', help='Play the run in a window')
+    parser.add_argument('--delay', type=int, default=1, help='Milliseconds to show each frame with --show')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    trace = bot_trace.read_trace(args.trace)
+    replay = Replay(trace)
+    elapsed_time = time.perf_counter() - start_time
+    print(replay.summary())
+    print("Rebuilt {} poses in {:.3f}s ({:.0f} poses/s)".format(len(replay), elapsed_time,
+                                                                len(replay) / max(elapsed_time, 1e-9)))
+
+    if args.frame is None and args.video is None and not args.show:
+        return
+    if args.image is None:
+        parser.error("--image is needed to draw frames")
+    if utils.content_hash(args.image) != trace.maze_hash:
+        print("Warning: {} is not the maze this trace was recorded in".format(args.image))
+    img = utils.open_image(args.image)
+
+    if args.frame is not None:
+        cv2.imwrite(args.out, replay.frame(img, args.frame, args.trail))
+    if args.video is not None:
+        with recorder.VideoRecorder(args.video, fps=args.fps, scale=args.scale, drop_frames=False) as video:
+            for _, frame in replay.frames(img, args.every):
+                video.write(frame)
+        print(video)
+    if args.show:
+        for _, frame in replay.frames(img, args.every):
+            utils.show_image(utils.WINDOW_NAME, frame)
+            if utils.wait_key(args.delay) == ord('q'):
+                break
+
+
+if __name__ == '__main__':
+    main()
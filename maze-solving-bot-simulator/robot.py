@@ -1,11 +1,50 @@
 import numpy as np
 
-from datatypes import Point, Direction
+import bot_trace
+import planner
+import sim_clock
+
+from datatypes import Point, Pose, Direction, Phase, cell_centers
+
+
+# Distance stored in distance maps when there is no barrier until the end of the image
+NO_BARRIER = np.iinfo(np.uint16).max
+# Distance sensors read at most this distance - 1 (also when the barrier is farther)
+MAX_SIGNAL_DIST = 1000
+
+
+class StepLimitExceeded(Exception):
+    """Raised when the bot moves more than its allowed number of steps"""
+
+
+def _distance_to_next_barrier(barrier: np.array) -> np.array:
+    """Distance from each pixel to the closest barrier pixel on its right (same row, inclusive)"""
+
+    cols = np.arange(barrier.shape[1], dtype=np.int64)
+    # Index of the barrier itself, or a very large index if not a barrier
+    barrier_cols = np.where(barrier, cols, np.int64(cols.size) + NO_BARRIER)
+    # Running minimum from the right gives the next barrier column
+    next_barrier_cols = np.minimum.accumulate(barrier_cols[:, ::-1], axis=1)[:, ::-1]
+    return np.minimum(next_barrier_cols - cols, NO_BARRIER).astype(np.uint16)
+
+
+def build_distance_maps(wall_map: np.array, barrier_color: int = 0) -> list:
+    """Build 4 maps (indexed by direction) with the distance from each pixel to the closest barrier
+    in that direction. NO_BARRIER is used when there is no barrier until the image border."""
+
+    barrier = wall_map == barrier_color
+    distance_maps = [None] * Direction.DIRECTIONS
+    distance_maps[Direction.EAST] = _distance_to_next_barrier(barrier)
+    distance_maps[Direction.WEST] = _distance_to_next_barrier(barrier[:, ::-1])[:, ::-1]
+    distance_maps[Direction.SOUTH] = _distance_to_next_barrier(barrier.T).T
+    distance_maps[Direction.NORTH] = _distance_to_next_barrier(barrier.T[:, ::-1])[:, ::-1].T
+    return distance_maps
 
 
 class Robot:
     def __init__(self, x: int, y: int, direction: int, wall_map: np.array, ground_map: np.array,
-                 no_of_squares_per_side: int, cell_side_length: int):
+                 no_of_squares_per_side: int, cell_side_length: int, max_steps: int = None,
+                 distance_maps: list = None, maze=None, sensor_table: tuple = None):
         """[summary]
 
         Arguments:
@@ -15,6 +54,11 @@ class Robot:
             wall_map -- Image which is filtered so that barriers are marked with 0 value (Black)
             ground_map -- Image which is filtered so that ground colors are marked with 255 value (White)
             side -- Side length of one block the robot can travel
+            max_steps -- Raise StepLimitExceeded after moving this many steps (None for no limit)
+            distance_maps -- Precomputed build_distance_maps(wall_map) (built here if not given)
+            maze -- maze_compiler.CompiledMaze to answer sensors from cell walls instead of the maps (maps can be None)
+            sensor_table -- (distances, ground) of world.build_sensor_table to answer sensors by one lookup
+                            (shared by all bots of a world.SimulationWorld)
         """
 
         self._x = x
@@ -23,9 +67,36 @@ class Robot:
         self._direction = direction
         self._wallMap = wall_map
         self._groundMap = ground_map
+        self._maze = maze
+        if distance_maps is None and maze is None:
+            distance_maps = build_distance_maps(wall_map)
+        self._distanceMaps = distance_maps
+        self._sensorTable = sensor_table
         self.no_of_squares_per_side = no_of_squares_per_side
         self.cell_side_length = cell_side_length
+        # Sensor pixel coordinate of each position (same for X and Y)
+        self._cellCenters = cell_centers(no_of_squares_per_side, cell_side_length)
         self._ball_color = (0, 0, 0)
+        # Counters used to report simulation statistics
+        self.steps = 0
+        self.turns = 0
+        self.sensor_reads = 0
+        self.max_steps = max_steps
+        self.phase = Phase.EXPLORE
+        self.phase_steps = {}
+        # Estimated time of the real bot in each phase (action costs of cost_model)
+        self.phase_time = {}
+        # planner.Planner whose costs give the estimated times, scripts set the planner of their final run
+        self.cost_model = planner.Planner()
+        self._moving = False
+        # planner.ACTION_* done in the final run (to export the path to the bot firmware)
+        self.final_run_actions = []
+        # bot_trace.TraceWriter logging moves and sensor readings (None to not log)
+        self.trace = None
+        # sensor_noise.NoiseModel of the distance sensors (None for exact readings)
+        self.noise = None
+        # Simulated time of the bot, advanced by its actions and the sleeps of its script
+        self.clock = sim_clock.SimulationClock()
 
     def _top_corner_point(self) -> Point:
         """Get the position of vehicle as a Point"""
@@ -37,6 +108,11 @@ class Robot:
 
         return self._top_corner_point() - self.cell_side_length * 0.5
 
+    def _center_pixel(self) -> tuple:
+        """(x, y) pixel of the vehicle center (same as tuple(self._center_point()) but looked up)"""
+
+        return self._cellCenters[self._x], self._cellCenters[self._y]
+
     def _left_side_direction(self) -> int:
         """Get direction of left side"""
 
@@ -52,14 +128,21 @@ class Robot:
 
         direction_multiplier = 1 if forward else -1
 
-        if self._direction == Direction.EAST:
-            self._x += direction_multiplier
-        elif self._direction == Direction.WEST:
-            self._x -= direction_multiplier
-        elif self._direction == Direction.NORTH:
-            self._y -= direction_multiplier
-        elif self._direction == Direction.SOUTH:
-            self._y += direction_multiplier
+        if self.max_steps is not None and self.steps >= self.max_steps:
+            raise StepLimitExceeded("Bot exceeded {} steps".format(self.max_steps))
+        self.steps += 1
+        self.phase_steps[self.phase] = self.phase_steps.get(self.phase, 0) + 1
+        self._add_time(self.cost_model.action_cost(planner.ACTION_FORWARD, self._moving and forward))
+        self._moving = forward
+        if self.phase == Phase.FINAL_RUN:
+            # Going backward only happens when exploring
+            self.final_run_actions.append(planner.ACTION_FORWARD)
+        if self.trace is not None:
+            self.trace.move(forward)
+
+        step_x, step_y = Direction.OFFSETS[self._direction]
+        self._x += direction_multiplier * step_x
+        self._y += direction_multiplier * step_y
 
     def _rotate(self, clockwise: bool):
         """Helper function to turn clockwise/anti-clockwise."""
@@ -68,11 +151,25 @@ class Robot:
             self._direction = self._right_side_direction()
         else:
             self._direction = self._left_side_direction()
-
-    def _send_signal(self, signal_direction: int, max_signal_dist: int = 1000, barrier_color: int = 0) -> int:
+        self._add_time(self.cost_model.action_cost(
+            planner.ACTION_TURN_RIGHT if clockwise else planner.ACTION_TURN_LEFT, self._moving))
+        self._moving = False
+        if self.phase == Phase.FINAL_RUN:
+            self.final_run_actions.append(planner.ACTION_TURN_RIGHT if clockwise else planner.ACTION_TURN_LEFT)
+        if self.trace is not None:
+            self.trace.turn(clockwise)
+
+    def _add_time(self, seconds: float):
+        """Add to the estimated time of the current phase"""
+
+        self.phase_time[self.phase] = self.phase_time.get(self.phase, 0.0) + seconds
+        self.clock.advance(seconds)
+
+    def _send_signal(self, signal_direction: int, max_signal_dist: int = MAX_SIGNAL_DIST,
+                     barrier_color: int = 0) -> int:
         """Send a signal and return distance to closest barrier"""
 
-        pos_x, pos_y = tuple(self._center_point())
+        pos_x, pos_y = self._center_pixel()
         distance = max_signal_dist
         for distance in range(max_signal_dist):
             if self._wallMap[pos_y, pos_x] == barrier_color:
@@ -87,16 +184,74 @@ class Robot:
                 pos_y += 1
         return distance
 
+    def _read_distance_map(self, signal_direction: int, max_signal_dist: int = MAX_SIGNAL_DIST) -> int:
+        """Same as _send_signal (with barrier color 0) but looks up the precomputed distance maps"""
+
+        pos_x, pos_y = self._center_pixel()
+        distance = int(self._distanceMaps[signal_direction][pos_y, pos_x])
+        if distance >= max_signal_dist:
+            # _send_signal stops at the last distance it checked
+            return max(max_signal_dist - 1, 0)
+        return distance
+
+    def _read_cell_walls(self, signal_direction: int, max_signal_dist: int = MAX_SIGNAL_DIST) -> int:
+        """Distance to closest wall using the compiled maze. Measured from cell center like _send_signal."""
+
+        col, row = self._x - 1, self._y - 1
+        distance = self.cell_side_length // 2
+        while not self._maze.has_wall(col, row, signal_direction) and distance < max_signal_dist:
+            if signal_direction == Direction.EAST:
+                col += 1
+            elif signal_direction == Direction.WEST:
+                col -= 1
+            elif signal_direction == Direction.NORTH:
+                row -= 1
+            elif signal_direction == Direction.SOUTH:
+                row += 1
+            if not 0 <= col < self.no_of_squares_per_side or not 0 <= row < self.no_of_squares_per_side:
+                break
+            distance += self.cell_side_length
+        return min(distance, max(max_signal_dist - 1, 0))
+
+    def _sense(self, signal_direction: int) -> int:
+        """Distance to closest barrier with the sensor noise of the bot (if any)"""
+
+        distance = self._sense_exact(signal_direction)
+        if self.noise is not None:
+            return self.noise.distance(distance, self.cell_side_length)
+        return distance
+
+    def _sense_exact(self, signal_direction: int) -> int:
+        """Distance to closest barrier from the sensor table or the compiled maze if there is one,
+        otherwise from distance maps"""
+
+        if self._sensorTable is not None:
+            return int(self._sensorTable[0][self._y - 1, self._x - 1, signal_direction])
+        if self._maze is not None:
+            return self._read_cell_walls(signal_direction)
+        return self._read_distance_map(signal_direction)
+
     def _check_ground(self, true_color: int = 255) -> bool:
         """Check if ground mask color"""
 
-        return self._groundMap[tuple(self._center_point())] == true_color
+        if self._sensorTable is not None:
+            return bool(self._sensorTable[1][self._y - 1, self._x - 1])
+        if self._maze is not None:
+            return self._maze.is_ground(self._x - 1, self._y - 1)
+        x, y = self._center_pixel()
+        return self._groundMap[y, x] == true_color
 
     def go_forward(self):
         """Goes one step forward"""
 
         self._go(forward=True)
 
+    def go_forward_n(self, cells: int):
+        """Goes cells steps forward in one move"""
+
+        for _ in range(cells):
+            self._go(forward=True)
+
     def go_backward(self):
         """Goes one step backward"""
 
@@ -105,34 +260,124 @@ class Robot:
     def turn_right(self):
         """Turns 90' clockwise"""
 
+        self.turns += 1
         self._rotate(clockwise=True)
 
     def turn_left(self):
         """Turns 90' counter-clockwise"""
 
+        self.turns += 1
         self._rotate(clockwise=False)
 
     def front_sensor(self) -> int:
         """Distance from front sensor to object"""
 
-        return self._send_signal(self._direction)
+        distance = self._sense(self._direction)
+        self.record_reading(bot_trace.OP_FRONT_SENSOR, distance)
+        return distance
 
     def left_sensor(self) -> int:
         """Distance from left sensor to object"""
 
-        return self._send_signal(self._left_side_direction())
+        distance = self._sense(self._left_side_direction())
+        self.record_reading(bot_trace.OP_LEFT_SENSOR, distance)
+        return distance
 
     def right_sensor(self) -> int:
         """Distance from right sensor to object"""
 
-        return self._send_signal(self._right_side_direction())
+        distance = self._sense(self._right_side_direction())
+        self.record_reading(bot_trace.OP_RIGHT_SENSOR, distance)
+        return distance
 
     def ground_sensor(self) -> bool:
         """True if ground has the filtered color"""
 
-        return self._check_ground()
+        value = self._check_ground()
+        self.record_reading(bot_trace.OP_OTHER, value)
+        return value
+
+    def record_reading(self, op: int, value):
+        """Count a sensor reading and log it to the trace. op is bot_trace.OP_FRONT_SENSOR, OP_LEFT_SENSOR,
+        OP_RIGHT_SENSOR or OP_OTHER for the ground sensor. Also used for readings made for the bot outside
+        the sensor methods (SimulationWorld.sense_all)."""
+
+        self.sensor_reads += 1
+        if self.trace is not None:
+            if op == bot_trace.OP_OTHER:
+                self.trace.ground(value)
+            else:
+                self.trace.sensor(op, value)
 
     def set_ball_color(self, color):
         """Set ball color of the robot (Analogous to a LED)"""
 
+        if self.trace is not None and tuple(color) != tuple(self._ball_color):
+            self.trace.ball_color(color)
         self._ball_color = color
+
+    def set_phase(self, phase: str):
+        """Set current run phase (datatypes.Phase). Steps are counted separately for each phase."""
+
+        if self.trace is not None and phase != self.phase:
+            self.trace.phase(phase)
+        if phase != self.phase:
+            # Each phase starts from a standstill
+            self._moving = False
+        self.phase = phase
+
+    def pose(self) -> Pose:
+        """(x, y, direction) of the bot"""
+
+        return tuple.__new__(Pose, (self._x, self._y, self._direction))
+
+
+class SensorCache:
+    """Remembers sensor readings of a bot until it moves or turns (readings only depend on the bot pose).
+    Bots with sensor noise (bot.noise) are read every time, so each reading is a new noisy sample."""
+
+    def __init__(self, bot: Robot, enabled: bool = True):
+        self.bot = bot
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._pose = None
+        self._readings = {}
+        self._primed = {}
+
+    def prime(self, readings: dict):
+        """Readings of the current pose made outside the script ({sensor: (bot_trace op, value)}, eg: by
+        SimulationWorld.sense_all). They are used instead of calling the sensors, and counted by the bot
+        only when the script reads them."""
+
+        if not self.enabled or self.bot.noise is not None:
+            return
+        pose = self.bot.pose()
+        if pose != self._pose:
+            self._readings.clear()
+            self._pose = pose
+        self._primed = {sensor: reading for sensor, reading in readings.items() if sensor not in self._readings}
+
+    def read(self, sensor):
+        """Value of sensor (a bound sensor method of the bot) at the current pose"""
+
+        if not self.enabled or self.bot.noise is not None:
+            self.misses += 1
+            return sensor()
+        pose = self.bot.pose()
+        if pose != self._pose:
+            self._readings.clear()
+            self._primed = {}
+            self._pose = pose
+        value = self._readings.get(sensor)
+        if value is None:
+            self.misses += 1
+            if sensor in self._primed:
+                op, value = self._primed.pop(sensor)
+                self.bot.record_reading(op, value)
+            else:
+                value = sensor()
+            self._readings[sensor] = value
+        else:
+            self.hits += 1
+        return value
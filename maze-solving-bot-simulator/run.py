@@ -1,38 +1,131 @@
-import numpy
+import argparse
 
-import robot
+import bot_trace
+import filter_cache
+import instrumentation
+import maze_compiler
+import planner
+import recorder
 import settings
+import sim_clock
+import simulation
 import utils
-from datatypes import SimulationRunStatus
+from datatypes import Phase
 
 
 def main():
-    # Open Image File as a coloured image
-    img = utils.open_image(settings.settingsImagePath)
-    # Retrieve filtered image
-    walls = utils.apply_vision_filter(img)
-    ground = utils.apply_ground_filter(img)
+    parser = argparse.ArgumentParser(description='Maze solving bot simulator')
+    parser.add_argument('--headless', dest='headless', action='store_true',
+                        help='Run without drawing or waiting and print the run statistics')
+    parser.add_argument('--windowed', dest='headless', action='store_false',
+                        help='Show the simulation window (overrides settingsHeadless)')
+    parser.add_argument('--max-loops', type=int, default=None,
+                        help='Stop after this many loop() calls')
+    parser.add_argument('--max-steps', type=int, default=None,
+                        help='Stop after the bot moved this many steps')
+    parser.add_argument('--max-fps', type=float, default=settings.settingsMaxFps,
+                        help='Show at most this many frames per second (simulation speed is not affected)')
+    parser.add_argument('--speed', type=float, default=None, metavar='FACTOR',
+                        help='Simulated seconds per wall second, 0 for as fast as possible '
+                             '(default settingsRealTimeFactor, or as fast as possible when headless)')
+    parser.add_argument('--wait-for-keys', dest='auto_advance', action='store_false',
+                        help='Wait for a key press at the pauses of the scripts instead of continuing by itself')
+    parser.add_argument('--compiled', dest='compiled', action='store_true',
+                        help='Sense walls from the compiled maze (.npz next to the image, created if missing)')
+    parser.add_argument('--pixels', dest='compiled', action='store_false',
+                        help='Sense walls from the image pixels (overrides settingsUseCompiledMaze)')
+    parser.add_argument('--record', metavar='FILE', default=None,
+                        help='Record the simulation to a video file (works when headless too)')
+    parser.add_argument('--record-every', type=int, default=1, metavar='N',
+                        help='Record one of every N frames')
+    parser.add_argument('--record-scale', type=float, default=1.0,
+                        help='Scale recorded frames by this factor')
+    parser.add_argument('--record-fps', type=float, default=30,
+                        help='Frame rate of the recorded video')
+    parser.add_argument('--record-all', action='store_true',
+                        help='Wait for the encoder instead of dropping frames when it falls behind')
+    parser.add_argument('--record-phase', action='append', default=None,
+                        choices=[Phase.EXPLORE, Phase.FINAL_RUN],
+                        help='Only record this phase (repeat for more phases)')
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help='Log moves and sensor readings to a trace file (see replay.py)')
+    parser.add_argument('--export-path', metavar='FILE', default=None,
+                        help='Write the final run as forward/turn segments to a C header for the bot firmware')
+    parser.add_argument('--profile', action='store_true',
+                        help='Time sensors, moves, flood fills, path searches and screen refreshes and print a summary')
+    parser.add_argument('--profile-json', metavar='FILE', default=None,
+                        help='Also write the profile to a JSON file (implies --profile)')
+    parser.set_defaults(headless=settings.settingsHeadless, compiled=settings.settingsUseCompiledMaze,
+                        auto_advance=settings.settingsAutoAdvance)
+    args = parser.parse_args()
+
+    utils.set_headless(args.headless)
+    utils.set_max_fps(args.max_fps)
+    utils.set_goal_size(settings.settingsGoalSize)
+
+    use_filter_cache = settings.settingsUseFilterCache and not args.compiled
+    # Open Image File as a coloured image (not needed for sensors if the maze is compiled or filters are cached,
+    # unless something is drawn or recorded)
+    img = None
+    if not args.headless or args.record or not (args.compiled or use_filter_cache):
+        img = utils.open_image(settings.settingsImagePath)
     # Initialize Bot with startup settings
-    bot = robot.Robot(x=settings.settingsStartX, y=settings.settingsStartY,
-                      direction=settings.settingsFaceDirection, wall_map=walls,
-                      ground_map=ground, no_of_squares_per_side=settings.settingsGridSideSquares,
-                      cell_side_length=len(img) // settings.settingsGridSideSquares)
-
-    # Initialize user bot scripts
-    src = settings.settingsSrcClass(bot)
-
-    # Run setup
-    src.setup()
-    loop_img = numpy.copy(img)
-    while True:
-        # Refresh Screen
-        utils.refresh_screen(loop_img, bot)
-        # Loop
-        loop_img = numpy.copy(img)
-        ret = src.loop(loop_img)
-        if ret == SimulationRunStatus.STOP_SIMULATION:
-            # If stop simulation signal, Exit
-            break
+    if args.compiled:
+        maze = maze_compiler.load_or_compile(settings.settingsImagePath, settings.settingsGridSideSquares)
+        bot = simulation.create_compiled_robot(maze, x=settings.settingsStartX, y=settings.settingsStartY,
+                                               direction=settings.settingsFaceDirection,
+                                               max_steps=args.max_steps)
+    else:
+        filters = filter_cache.load_filters(settings.settingsImagePath) if use_filter_cache else None
+        bot = simulation.create_robot(img, x=settings.settingsStartX, y=settings.settingsStartY,
+                                      direction=settings.settingsFaceDirection,
+                                      grid_side_squares=settings.settingsGridSideSquares,
+                                      max_steps=args.max_steps, filters=filters)
+
+    speed = args.speed
+    if speed is None:
+        speed = 0 if args.headless else settings.settingsRealTimeFactor
+    bot.clock = sim_clock.SimulationClock(real_time_factor=speed or sim_clock.UNLIMITED,
+                                          auto_advance=args.auto_advance, wait_key=utils.wait_key)
+
+    video = None
+    if args.record:
+        video = recorder.VideoRecorder(args.record, fps=args.record_fps, every=args.record_every,
+                                       scale=args.record_scale, phases=args.record_phase,
+                                       drop_frames=not args.record_all)
+        utils.set_recorder(video)
+
+    trace = None
+    if args.trace:
+        trace = bot_trace.TraceWriter(args.trace, bot, utils.content_hash(settings.settingsImagePath))
+
+    profiler = None
+    if args.profile or args.profile_json:
+        profiler = instrumentation.Profiler()
+        profiler.enable()
+
+    try:
+        result = simulation.run(settings.settingsSrcClass, img, bot, max_loops=args.max_loops)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            print(profiler.summary())
+            if args.profile_json:
+                profiler.dump(args.profile_json)
+        if trace is not None:
+            trace.close()
+        if video is not None:
+            utils.set_recorder(None)
+            video.close()
+            print(video)
+    if args.export_path:
+        segments = planner.compress(bot.final_run_actions)
+        with open(args.export_path, 'w') as file:
+            file.write(planner.to_c_source(segments))
+        print("Final run: {} actions in {} segments written to {}".format(
+            len(bot.final_run_actions), len(segments), args.export_path))
+    if args.headless:
+        print(result)
 
 
 if __name__ == '__main__':
@@ -1,10 +1,14 @@
 import cv2
 import numpy
 
+import planner
 import robot
 import utils
 from datatypes import Direction, SimulationRunStatus
 
+# Reuse sensor readings until the bot moves or turns
+CACHE_SENSORS = True
+
 
 class UserScript:
 
@@ -13,11 +17,13 @@ class UserScript:
         Values which should be considered as CONSTANTS are given the value
         and other variables are give 'None' value"""
         self.bot = bot
+        self.sensor_cache = robot.SensorCache(bot, CACHE_SENSORS)
+        # Planner of the final run (costs of the real bot), the bot estimates the run time with the same costs
+        self.planner = planner.Planner()
         self.direction: int = None
         self.x: int = None
         self.y: int = None
         self.start: tuple = None
-        self.waitDuration: int = None
         self.img: numpy.array = None
 
     # --------------------------------------------------------------
@@ -42,6 +48,13 @@ class UserScript:
         self.bot.go_forward()
         self.refresh_screen(self.img)
 
+    def go_forward_n(self, cells: int):
+        """Goes cells steps forward in one move (screen is refreshed once)"""
+        for _ in range(cells):
+            self.x, self.y = self.tile_in_the_direction(self.direction)
+        self.bot.go_forward_n(cells)
+        self.refresh_screen(self.img)
+
     # HIGHER ORDER -------------------------------------------------
 
     def go_to_right(self, ):
@@ -60,25 +73,42 @@ class UserScript:
         self.turn_right()
         self.go_forward()
 
+    def do_action(self, action: int):
+        """Do a planner action (planner.ACTION_FORWARD, ACTION_TURN_RIGHT or ACTION_TURN_LEFT)"""
+        if action == planner.ACTION_FORWARD:
+            self.go_forward()
+        elif action == planner.ACTION_TURN_RIGHT:
+            self.turn_right()
+        else:
+            self.turn_left()
+
+    def do_segment(self, action: int, count: int):
+        """Do a planner action count times (planner.compress segment), forward cells in one move"""
+        if action == planner.ACTION_FORWARD:
+            self.go_forward_n(count)
+        else:
+            for _ in range(count):
+                self.do_action(action)
+
     # --------------------------------------------------------------
     # ROBOT SENSOR DATA --------------------------------------------
     # --------------------------------------------------------------
 
     def is_wall_in_front(self) -> bool:
         """Return True if wall is in front"""
-        return self.bot.front_sensor() < self.bot.cell_side_length
+        return self.sensor_cache.read(self.bot.front_sensor) < self.bot.cell_side_length
 
     def is_wall_in_right(self) -> bool:
         """Return True if wall is in right"""
-        return self.bot.right_sensor() < self.bot.cell_side_length
+        return self.sensor_cache.read(self.bot.right_sensor) < self.bot.cell_side_length
 
     def is_wall_in_left(self) -> bool:
         """Return True if wall is in left"""
-        return self.bot.left_sensor() < self.bot.cell_side_length
+        return self.sensor_cache.read(self.bot.left_sensor) < self.bot.cell_side_length
 
     def is_ground_center(self) -> bool:
         """Check if ground color is center color"""
-        return self.bot.ground_sensor()
+        return self.sensor_cache.read(self.bot.ground_sensor)
 
     # --------------------------------------------------------------
     # HELPER FUNCTIONS ---------------------------------------------
@@ -86,41 +116,31 @@ class UserScript:
 
     def tile_in_the_direction(self, direction: int) -> tuple:
         """ Get the coordinates of the tile in the 'direction'"""
-        dir_x = self.x
-        dir_y = self.y
-        if direction == Direction.EAST:
-            dir_x += 1
-        elif direction == Direction.WEST:
-            dir_x -= 1
-        elif direction == Direction.NORTH:
-            dir_y -= 1
-        elif direction == Direction.SOUTH:
-            dir_y += 1
-        return dir_x, dir_y
+        step_x, step_y = Direction.OFFSETS[direction]
+        return self.x + step_x, self.y + step_y
 
     def refresh_screen(self, img: numpy.array) -> bool:
         """Refreshes Screen"""
         utils.refresh_screen(img, self.bot)
-        return self.user_pressed_exit(self.waitDuration)
+        return self.user_pressed_exit()
 
     # --------------------------------------------------------------
-    # STATIC METHODS -----------------------------------------------
+    # WAITING (SIMULATION CLOCK) -----------------------------------
     # --------------------------------------------------------------
 
-    @staticmethod
-    def wait_for_user_key(timeout: int) -> int:
-        """Return user interruption"""
-        return cv2.waitKey(timeout)
+    def wait_for_user_key(self, timeout: int = None) -> int:
+        """Wait on the simulation clock and return user interruption.
+        None waits until wall time catches up with simulated time, 0 is a "press any key" pause
+        (auto-advanced by default) and other timeouts are milliseconds of simulated time"""
+        return self.bot.clock.wait(timeout)
 
-    @staticmethod
-    def sleep(timeout: int):
-        """Wait for some time"""
-        UserScript.wait_for_user_key(timeout)
+    def sleep(self, timeout: int):
+        """Do nothing for timeout milliseconds of simulated time"""
+        self.bot.clock.sleep(timeout)
 
-    @staticmethod
-    def user_pressed_exit(timeout: int) -> bool:
-        """Wait for some time and if Esc pressed exit, otherwise return False"""
-        pressed_key = UserScript.wait_for_user_key(timeout)
+    def user_pressed_exit(self, timeout: int = None) -> bool:
+        """Wait as wait_for_user_key and if Esc pressed exit, otherwise return False"""
+        pressed_key = self.wait_for_user_key(timeout)
         if pressed_key == 27:
             cv2.destroyAllWindows()
             raise SystemExit
@@ -136,7 +156,10 @@ class UserScript:
         self.start = (0, 0)
         self.x, self.y = self.start
         self.direction = Direction.NORTH
-        self.waitDuration = 100
+
+    def script_stats(self) -> dict:
+        """Statistics of the script for the run statistics (SimulationResult.script_stats)"""
+        return {}
 
     def loop(self, img: numpy.array):
         """Loop Function"""
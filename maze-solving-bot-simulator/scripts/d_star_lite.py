@@ -0,0 +1,124 @@
+import numpy
+
+import incremental_planner
+import robot
+from scripts import flood_fill
+
+# Start the first search from the distances without walls (it only knows the walls around the start) and later
+# ones from one flood of the walls already known, instead of expanding cell by cell
+SEED_SEARCHES = True
+
+
+class DStarLite(flood_fill.FloodFill):
+    """FloodFill with the flood replaced by D* Lite (incremental_planner). There is one search for the goal region
+    and one for the start, each kept through the whole run, so a new wall only searches again the cells whose
+    distance it changes instead of flooding the whole maze. The final run is planned as in FloodFill."""
+
+    def __init__(self, bot: robot.Robot):
+        """Initialize"""
+        super().__init__(bot)
+        self.searches: dict = None
+        self.search: incremental_planner.DStarLitePlanner = None
+        self.expansions: list = None
+
+    def setup(self):
+        """Setup"""
+        super().setup()
+        self.searches = {}  # Search of each target list (as a tuple)
+        self.search = None  # Search used in this step
+        self.expansions = []  # Expansions of each step
+
+    def traverse_to_point(self, targets: list, ball_color: list, on_locate):
+        """Go to any of the target cells along the distances of the D* Lite search for them"""
+        self.bot.set_ball_color(ball_color)
+        self.add_walls()
+        self.update_search(targets)
+        self.go_to_best_cell()
+
+        if (self.x, self.y) in targets:
+            on_locate()
+            self.wait_for_user_key(0)
+
+    def update_search(self, targets: list):
+        """Bring the search for targets up to date with the walls and the bot's cell"""
+
+        side = self.bot.no_of_squares_per_side
+        key = tuple(targets)
+        created = key not in self.searches
+        if created:
+            search = incremental_planner.DStarLitePlanner(side, [x * side + y for x, y in targets],
+                                                          self.x * side + self.y)
+            if SEED_SEARCHES and self.searches:
+                # Every search has the walls found so far
+                search.copy_walls(next(iter(self.searches.values())))
+                search.flood()
+            else:
+                if SEED_SEARCHES:
+                    search.set_distances(self.open_distances(targets))
+                # Walls found before this search
+                for a, neighbors in self.walls.items():
+                    for b in neighbors:
+                        if a < b:
+                            search.add_wall(a[0] * side + a[1], b[0] * side + b[1])
+            self.searches[key] = search
+        self.search = self.searches[key]
+        self.search.move_to(self.x * side + self.y)
+        if created or self.search.changed:
+            # Without new walls which change a distance, the bot's cell is still on a shortest path
+            self.expansions.append(self.search.compute())
+
+    def open_distances(self, targets: list) -> list:
+        """Distances of every cell to the closest target if there were no walls (Manhattan distances)"""
+        side = self.bot.no_of_squares_per_side
+        coords = numpy.arange(side)
+        distances = numpy.full((side, side), 2 * side)
+        for x, y in targets:
+            distances = numpy.minimum(distances, numpy.abs(coords - x)[:, None] + numpy.abs(coords - y)[None, :])
+        return distances.ravel().tolist()
+
+    def add_wall_between(self, a: tuple, b: tuple):
+        known = b in self.walls.get(a, ())
+        super().add_wall_between(a, b)
+        if known or a not in self.walls or b not in self.walls[a]:
+            # Already known or out of range
+            return
+        side = self.bot.no_of_squares_per_side
+        for search in self.searches.values():
+            search.add_wall(a[0] * side + a[1], b[0] * side + b[1])
+
+    def go_to_best_cell(self) -> tuple:
+        """Go to the open neighbor closest to the targets"""
+        side = self.bot.no_of_squares_per_side
+        best_cell = self.search.next_cell(self.x * side + self.y)
+        best = (best_cell // side, best_cell % side)
+
+        if best == self.tile_in_the_direction((self.direction + 1) % 4):
+            self.go_to_right()
+        elif best == self.tile_in_the_direction(self.direction):
+            self.go_forward()
+        elif best == self.tile_in_the_direction((self.direction - 1) % 4):
+            self.go_to_left()
+        else:
+            self.go_backward()
+
+        return best
+
+    def script_stats(self) -> dict:
+        """Node expansions of the searches (total, steps with a search and most in one step)"""
+        return dict(expansions=sum(self.expansions), search_steps=len(self.expansions),
+                    max_expansions=max(self.expansions, default=0))
+
+    def expansion_report(self) -> str:
+        """Node expansions of the searches per step"""
+        if not self.expansions:
+            return "D* Lite: no searches"
+        return "D* Lite: {} expansions in {} steps (mean {:.1f}, max {} per step)".format(
+            sum(self.expansions), len(self.expansions), sum(self.expansions) / len(self.expansions),
+            max(self.expansions))
+
+    def show_debug_data(self, img: numpy.array):
+        """Show walls and distances of the current search in a separate window"""
+        if self.search is not None:
+            side = self.bot.no_of_squares_per_side
+            self.flooded_grid = [[self.search.distance(x * side + y) for y in range(side)] for x in range(side)]
+        super().show_debug_data(img)
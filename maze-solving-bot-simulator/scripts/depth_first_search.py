@@ -2,10 +2,14 @@ import collections
 
 import numpy
 
+import planner
 import robot
-from datatypes import SimulationRunStatus
+from datatypes import SimulationRunStatus, Phase
 from scripts import base_script
 
+# Take the path with the least estimated time (turns cost more than straight runs) instead of the fewest cells
+FINAL_RUN_PLANNER = True
+
 
 class DepthFirstSearch(base_script.UserScript):
     def __init__(self, bot: robot.Robot):
@@ -14,7 +18,7 @@ class DepthFirstSearch(base_script.UserScript):
         self.visited: set = None
         self.graph: dict = None
         self.stack: list = None
-        self.center: tuple = None
+        self.goal: set = None
         self.was_running_before: bool = None
 
     # --------------------------------------------------------------
@@ -41,6 +45,7 @@ class DepthFirstSearch(base_script.UserScript):
         self.visited = set()  # variable to record visited nodes
         self.graph = dict()  # graph
         self.stack = [self.start]  # Stack to DFS
+        self.goal = set()  # Cells with the center ground color (the goal region)
         self.was_running_before = False  # Variable to record whether script just started to run or has been running
 
     def loop(self, img: numpy.array) -> int:
@@ -80,9 +85,9 @@ class DepthFirstSearch(base_script.UserScript):
         # mark this point as discovered
         self.visited.add(this_point)
 
-        # Check if this is center tile
+        # Check if this is a tile of the center region
         if self.is_ground_center():
-            self.center = this_point
+            self.goal.add(this_point)
 
         # Record all possible turns and add to the graph
         if no_wall_in_front:
@@ -121,6 +126,31 @@ class DepthFirstSearch(base_script.UserScript):
         """Second half of loop (going to center of maze)"""
 
         self.bot.set_ball_color((0, 242, 255))
+        self.bot.set_phase(Phase.FINAL_RUN)
+        if FINAL_RUN_PLANNER:
+            self.follow_fastest_path()
+        else:
+            self.follow_shortest_path()
+        self.bot.set_ball_color((0, 255, 0))
+
+        # Refresh screen until user exits
+        self.refresh_screen(self.img)
+        self.user_pressed_exit(0)
+        return SimulationRunStatus.STOP_SIMULATION
+
+    def follow_fastest_path(self):
+        """Go to center by the path with the least estimated time"""
+
+        neighbors, index = planner.graph_neighbors(self.graph)
+        self.bot.cost_model = self.planner
+        plan = self.planner.plan(neighbors, index[(self.x, self.y)], self.direction,
+                                 [index[cell] for cell in self.goal])
+        for action, count in planner.compress(plan.actions):
+            self.do_segment(action, count)
+
+    def follow_shortest_path(self):
+        """Go to center by the path with the fewest cells"""
+
         # Compute distance Grid and shortest path
         grid = self.bfs()
         path = self.shortest_path(grid)
@@ -141,27 +171,24 @@ class DepthFirstSearch(base_script.UserScript):
                 self.turn_left()
                 self.turn_left()
             self.go_forward()
-        self.bot.set_ball_color((0, 255, 0))
-
-        # Refresh screen until user exits
-        self.refresh_screen(self.img)
-        self.user_pressed_exit(0)
-        return SimulationRunStatus.STOP_SIMULATION
 
     # --------------------------------------------------------------
     # GRAPH THEORY ALGORITHMS --------------------------------------
     # --------------------------------------------------------------
 
-    def bfs(self) -> dict:
-        """USe breadth first search algorithm to find shortest distance from center point"""
+    def bfs(self, goal: set = None) -> dict:
+        """USe breadth first search algorithm to find shortest distance from the goal region (self.goal by default).
+        All goal cells are searched from at once, so distances are to the closest one."""
         distances_graph = {}
 
         # BFS from middle to the robot start point
-        start = self.center
+        if goal is None:
+            goal = self.goal
         search = self.start
 
-        distances_graph[start] = 0
-        queue = collections.deque([start])
+        for cell in goal:
+            distances_graph[cell] = 0
+        queue = collections.deque(goal)
 
         while True:
             # Get next node
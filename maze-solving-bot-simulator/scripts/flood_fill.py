@@ -1,16 +1,24 @@
 import collections
 
-import cv2
 import numpy
 
+import debug_overlay
+import flood_kernel
+import planner
 import robot
 import utils
-from datatypes import SimulationRunStatus, Direction
+from datatypes import SimulationRunStatus, Direction, Phase
 from scripts import base_script
 
 DEBUG = True
 # Top left = 0, Bottom Left = 1, Bottom Right = 2, Top Right = 3
 DEBUG_ROTATE = 3
+# flood_kernel.KERNEL_BFS, flood_kernel.KERNEL_NUMPY (whole grid at once, slower on small mazes)
+# or flood_kernel.KERNEL_AUTO (NumPy from flood_kernel.NUMPY_MIN_SIDE squares per side)
+FLOOD_KERNEL = flood_kernel.KERNEL_AUTO
+# In the real run take the path with the least estimated time (turns cost more than straight runs)
+# instead of stepping to the neighbor with the lowest flood value
+FINAL_RUN_PLANNER = True
 
 
 class FloodFill(base_script.UserScript):
@@ -20,13 +28,21 @@ class FloodFill(base_script.UserScript):
         self.facing_direction_discovered: bool = None
         self.path_traced_to_center: bool = None
         self.real_run: bool = None
-        self.center: tuple = None
+        self.real_run_completed: bool = None
+        self.goal: list = None
         self.flooded_grid: list = None
         self.walls: dict = None
+        self.walls_x: numpy.array = None
+        self.walls_y: numpy.array = None
+        self.debug_overlay: debug_overlay.FloodDebugOverlay = None
+        self.run_plan: list = None
+        self.run_plan_walls: int = None
+        self.run_plan_explored: bool = None
+        self.explored: numpy.array = None
 
     def refresh_screen(self, img: numpy.array):
         """Refreshes screen. Overrides parent function to show debug window"""
-        if DEBUG:
+        if DEBUG and not utils.HEADLESS:
             self.show_debug_data(img)
         super().refresh_screen(img)
 
@@ -36,9 +52,15 @@ class FloodFill(base_script.UserScript):
         self.facing_direction_discovered = False  # Whether direction which the bot is facing detected
         self.path_traced_to_center = False  # Whether went to center at least once
         self.real_run = False  # Whether this is the trip from Start to Center
-        self.center = (self.bot.no_of_squares_per_side // 2, self.bot.no_of_squares_per_side // 2)  # Center coordinates
+        self.real_run_completed = False  # Whether the trip from Start to Center finished at least once
+        self.goal = utils.goal_cells(self.bot.no_of_squares_per_side)  # Cells of the goal region in the center
         self.flooded_grid = [[-1] * self.bot.no_of_squares_per_side for _ in range(self.bot.no_of_squares_per_side)]
         self.walls = {}  # All walls
+        # Same walls for flood_kernel: between [x][y] and [x + 1][y] / [x][y] and [x][y + 1]
+        self.walls_x = numpy.zeros((self.bot.no_of_squares_per_side - 1, self.bot.no_of_squares_per_side), bool)
+        self.walls_y = numpy.zeros((self.bot.no_of_squares_per_side, self.bot.no_of_squares_per_side - 1), bool)
+        self.run_plan = None  # Planned actions of the real run
+        self.explored = numpy.zeros((self.bot.no_of_squares_per_side, self.bot.no_of_squares_per_side), bool)
 
     def loop(self, img) -> int:
         """Loop"""
@@ -51,34 +73,80 @@ class FloodFill(base_script.UserScript):
             def located():
                 self.path_traced_to_center = True
 
-            self.traverse_to_point(self.center, [53, 216, 255], located)
+            self.traverse_to_point(self.goal, [53, 216, 255], located)
 
         elif not self.real_run:
             def located():
                 self.real_run = True
 
-            self.traverse_to_point(self.start, [140, 110, 90], located)
+            self.traverse_to_point([self.start], [140, 110, 90], located)
 
         else:
             def located():
                 self.real_run = False
-
-            self.traverse_to_point(self.center, [0, 255, 0], located)
-
-        self.user_pressed_exit(self.waitDuration)
+                self.real_run_completed = True
+
+            self.bot.set_phase(Phase.FINAL_RUN)
+            if FINAL_RUN_PLANNER:
+                self.run_to_point(self.goal, [0, 255, 0], located)
+            else:
+                self.traverse_to_point(self.goal, [0, 255, 0], located)
+
+        self.user_pressed_exit()
+        if self.real_run_completed and utils.HEADLESS:
+            # Nobody is watching the bot going back and forth, so stop after the real run
+            return SimulationRunStatus.STOP_SIMULATION
         return SimulationRunStatus.RESUME_SIMULATION
 
-    def traverse_to_point(self, target: tuple, ball_color: list, on_locate):
-        """Go to a point while flooding"""
+    def traverse_to_point(self, targets: list, ball_color: list, on_locate):
+        """Go to any of the target cells while flooding"""
         self.bot.set_ball_color(ball_color)
         self.add_walls()
-        self.flood_fill(target)
+        self.flood_fill(targets)
         self.go_to_best_cell()
 
-        if (self.x, self.y) == target:
+        if (self.x, self.y) in targets:
+            on_locate()
+            self.wait_for_user_key(0)
+
+    def run_to_point(self, targets: list, ball_color: list, on_locate):
+        """Go to any of the target cells by the path with the least estimated time, one segment (eg: forward 3 cells) per loop.
+        Only known cells (known_neighbors) are used if possible, otherwise unknown walls are assumed to be open
+        and the bot goes one cell at a time. The path is planned again when a new wall is found."""
+        self.bot.set_ball_color(ball_color)
+        self.add_walls()
+        walls_known = numpy.count_nonzero(self.walls_x) + numpy.count_nonzero(self.walls_y)
+        if not self.run_plan or walls_known != self.run_plan_walls:
+            side = self.bot.no_of_squares_per_side
+            start, goal = self.x * side + self.y, [x * side + y for x, y in targets]
+            self.bot.cost_model = self.planner
+            plan = self.planner.plan(self.known_neighbors(), start, self.direction, goal)
+            self.run_plan_explored = plan.found
+            if not plan.found:
+                plan = self.planner.plan(planner.grid_neighbors(self.walls_x, self.walls_y),
+                                         start, self.direction, goal)
+            self.run_plan = planner.compress(plan.actions) if plan.found else None
+            self.run_plan_walls = walls_known
+        if not self.run_plan:
+            # Known walls block every path (can not happen in a valid maze), flood fill anyway
+            self.traverse_to_point(targets, ball_color, on_locate)
+            return
+
+        action, count = self.run_plan.pop(0)
+        if action == planner.ACTION_FORWARD and not self.run_plan_explored and count > 1:
+            # Walls ahead are not known, so sense them in each cell
+            self.run_plan.insert(0, (action, count - 1))
+            count = 1
+        self.do_segment(action, count)
+        if (self.x, self.y) in targets:
+            self.run_plan = None
             on_locate()
             self.wait_for_user_key(0)
 
+    def known_neighbors(self):
+        """Neighbors function (planner.grid_neighbors) of the cells run_to_point tries first, the explored ones"""
+        return planner.grid_neighbors(self.walls_x, self.walls_y, self.explored)
+
     def discover_facing_direction(self):
         """Go some distance and identify which side bot is turned"""
 
@@ -127,17 +195,23 @@ class FloodFill(base_script.UserScript):
         self.facing_direction_discovered = True
         print(self.direction)
 
-    def flood_fill(self, search_pos):
-        """Fill and build flood array"""
+    def flood_fill(self, targets: list):
+        """Fill and build flood array. All target cells are flooded from at once (multi-source BFS),
+        so each cell gets its distance to the closest one."""
+
+        if flood_kernel.select(FLOOD_KERNEL, self.bot.no_of_squares_per_side) == flood_kernel.KERNEL_NUMPY:
+            self.flooded_grid = flood_kernel.flood_fill(self.walls_x, self.walls_y, targets).tolist()
+            return
 
         # Set all cells to -1 (Unvisited)
         for i in range(self.bot.no_of_squares_per_side):
             for j in range(self.bot.no_of_squares_per_side):
                 self.flooded_grid[i][j] = -1
 
-        # Set center cell distance to 0
-        self.flooded_grid[search_pos[1]][search_pos[0]] = 0
-        queue = collections.deque([search_pos])
+        # Set target cell distances to 0
+        for x, y in targets:
+            self.flooded_grid[x][y] = 0
+        queue = collections.deque(targets)
 
         while queue:
             current = queue.pop()
@@ -174,10 +248,16 @@ class FloodFill(base_script.UserScript):
             self.walls[b] = set()
         self.walls[a].add(b)
         self.walls[b].add(a)
+        if a[1] == b[1] and abs(a[0] - b[0]) == 1:
+            self.walls_x[min(a[0], b[0]), a[1]] = True
+        elif a[0] == b[0] and abs(a[1] - b[1]) == 1:
+            self.walls_y[a[0], min(a[1], b[1])] = True
 
     def add_walls(self):
         """Add a wall between 2 nodes"""
         this_node = (self.x, self.y)
+        if 0 <= self.x < self.bot.no_of_squares_per_side and 0 <= self.y < self.bot.no_of_squares_per_side:
+            self.explored[self.x, self.y] = True
         front_node = self.tile_in_the_direction(self.direction)
         right_node = self.tile_in_the_direction((self.direction + 1) % 4)
         left_node = self.tile_in_the_direction((self.direction - 1) % 4)
@@ -231,32 +311,7 @@ class FloodFill(base_script.UserScript):
         return min_pos
 
     def show_debug_data(self, img: numpy.array):
-        debug_data = numpy.copy(img)
-        utils.draw_robot(self.bot, debug_data)
-
-        for _ in range(DEBUG_ROTATE):
-            debug_data = cv2.rotate(debug_data, cv2.ROTATE_90_CLOCKWISE)
-
-        cv2.circle(debug_data, (self.bot.cell_side_length // 2, self.bot.cell_side_length // 2),
-                   self.bot.cell_side_length // 2, (0, 0, 255), 1)
-        cv2.circle(debug_data, (len(img) // 2, len(img) // 2),
-                   self.bot.cell_side_length, (0, 0, 255), 1)
-
-        for wall_a in self.walls:
-            left_a = wall_a[0] * self.bot.cell_side_length + self.bot.cell_side_length // 2
-            top_a = wall_a[1] * self.bot.cell_side_length + self.bot.cell_side_length // 2
-            for wall_b in self.walls[wall_a]:
-                left_b = wall_b[0] * self.bot.cell_side_length + self.bot.cell_side_length // 2
-                top_b = wall_b[1] * self.bot.cell_side_length + self.bot.cell_side_length // 2
-                cv2.line(debug_data, (left_a, top_a), (left_b, top_b), (220, 220, 128), 10)
-
-        for col_i in range(self.bot.no_of_squares_per_side):
-            col = self.flooded_grid[col_i]
-            for row_i in range(self.bot.no_of_squares_per_side):
-                cell = col[row_i]
-                top = row_i * self.bot.cell_side_length + 3 * self.bot.cell_side_length // 4
-                left = col_i * self.bot.cell_side_length + 1 * self.bot.cell_side_length // 4
-                cv2.putText(debug_data, "{:>2} ".format(cell), (left, top), cv2.FONT_HERSHEY_PLAIN,
-                            1, (0, 0, 0), 1, cv2.LINE_AA)
-
-        cv2.imshow("debug", debug_data)
+        """Show walls and flood values in a separate window"""
+        if self.debug_overlay is None:
+            self.debug_overlay = debug_overlay.FloodDebugOverlay("debug", DEBUG_ROTATE)
+        self.debug_overlay.show(img, self.bot, self.flooded_grid, self.walls_x, self.walls_y)
@@ -0,0 +1,288 @@
+from array import array
+
+import numpy
+
+import incremental_planner
+import planner
+import robot
+import utils
+from datatypes import SimulationRunStatus, Direction, Phase
+from scripts import flood_fill
+
+# Also mark the sides along each distance reading as sensed (open up to the wall the reading ends at), not only
+# the sides of the bot's cell. Readings of bots with sensor noise are only trusted for the bot's cell.
+RAY_SENSING = True
+# Once there is a known path to the goal, head back to the start, going through useful cells only if the trip is
+# at most this many maze sides longer than the shortest way back (None: explore until the shortest path is proven)
+RETURN_DETOUR_SIDES = 3
+
+
+class FrontierExploration(flood_fill.FloodFill):
+    """Explores only the cells which could be on the shortest path between the start and the goal region.
+
+    The optimistic length assumes unknown walls are open and the pessimistic length only uses passages known
+    to be open. Each is kept by a D* Lite search (incremental_planner) from the goal region to the start, so new
+    walls and sensed sides only search again the cells whose distance they change. An unexplored cell is useful
+    if it is on a shortest optimistic path. Until there is a known path to the goal, the bot goes towards the
+    useful cell with the least distance from the bot plus distance to the goal (so it heads for the goal like
+    FloodFill). Then it heads back to the start through useful cells (see RETURN_DETOUR_SIDES) and does the final
+    run through sides sensed open. Exploration also ends when the shortest path is proven (both lengths agree)."""
+
+    def __init__(self, bot: robot.Robot):
+        """Initialize"""
+        super().__init__(bot)
+        self.exploration_completed: bool = None
+        self.known_x: numpy.array = None
+        self.known_y: numpy.array = None
+        self.previous_cell: tuple = None
+        self.optimistic: incremental_planner.DStarLitePlanner = None
+        self.pessimistic: incremental_planner.DStarLitePlanner = None
+        self.bounds: tuple = None
+        self.return_budget: int = None
+        self.unsensed_sides: bytearray = None
+        self.walls_found: int = None
+        self.route: list = None
+        self.route_state: tuple = None
+        self.on_path: list = None
+        self.on_path_walls: int = None
+
+    def setup(self):
+        """Setup"""
+        super().setup()
+        side = self.bot.no_of_squares_per_side
+        self.exploration_completed = False  # Whether the bot is done exploring
+        # Whether the side between [x][y] and [x + 1][y] / [x][y] and [x][y + 1] was sensed (as walls_x / walls_y)
+        self.known_x = numpy.zeros((side - 1, side), bool)
+        self.known_y = numpy.zeros((side, side - 1), bool)
+        self.previous_cell = None  # Cell of the last add_walls
+        # Sides inside the maze which were not sensed of each cell (X * side + Y)
+        self.unsensed_sides = bytearray(4 - (x in (0, side - 1)) - (y in (0, side - 1))
+                                        for x in range(side) for y in range(side))
+        goal = [x * side + y for x, y in self.goal]
+        start = self.start[0] * side + self.start[1]
+        # Distances to the goal with unknown walls open / through passages known to be open
+        self.optimistic = incremental_planner.DStarLitePlanner(side, goal, start)
+        self.pessimistic = incremental_planner.DStarLitePlanner(side, goal, start, closed=True)
+        self.bounds = (-1, -1)  # (optimistic, pessimistic) shortest path lengths, -1 if there is no such path
+        self.return_budget = None  # Steps left for the trip back to the start (None before it starts)
+        self.walls_found = 0  # Walls added to the optimistic search
+        self.route = None  # Rest of the way to the useful cell the bot is going to
+        self.route_state = None  # (heading for the goal, walls_found) when the route was searched
+        self.on_path = None  # Cells on a shortest optimistic path
+        self.on_path_walls = None  # walls_found when on_path was traced
+
+    def loop(self, img) -> int:
+        """Loop"""
+        super(flood_fill.FloodFill, self).loop(img)
+
+        if not self.facing_direction_discovered:
+            self.discover_facing_direction()
+
+        elif not self.exploration_completed:
+            self.explore()
+
+        elif not self.real_run:
+            def located():
+                self.real_run = True
+
+            self.run_to_point([self.start], [140, 110, 90], located)
+
+        else:
+            def located():
+                self.real_run = False
+                self.real_run_completed = True
+
+            self.bot.set_phase(Phase.FINAL_RUN)
+            self.run_to_point(self.goal, [0, 255, 0], located)
+
+        self.user_pressed_exit()
+        if self.real_run_completed and utils.HEADLESS:
+            # Nobody is watching the bot going back and forth, so stop after the real run
+            return SimulationRunStatus.STOP_SIMULATION
+        return SimulationRunStatus.RESUME_SIMULATION
+
+    def explore(self):
+        """Go one cell towards the chosen useful cell, or end exploration if there is none"""
+        self.bot.set_ball_color([53, 216, 255])
+        self.add_walls()
+        frontier = self.useful_frontier()
+        optimistic, pessimistic = self.bounds
+        g = self.optimistic.g
+        route_state = (pessimistic == -1, self.walls_found)
+        if not frontier:
+            route = None
+        elif self.route and self.route[-1] in frontier and self.route_state == route_state:
+            # Without new walls every other cell gets at most one step closer, so the same cell is still the best
+            route = self.route
+        elif pessimistic == -1:
+            # Head for the goal
+            route = self.route_towards(frontier, lambda cell: g[cell])
+        else:
+            # Head back to the start, the distance from the start of a useful cell is optimistic - its distance
+            if self.return_budget is None and RETURN_DETOUR_SIDES is not None:
+                way_back = len(self.route_towards({self.optimistic.start}, lambda cell: 0))
+                self.return_budget = way_back + RETURN_DETOUR_SIDES * self.bot.no_of_squares_per_side
+            route = self.route_towards(frontier, lambda cell: optimistic - g[cell], self.return_budget)
+        if route is None:
+            self.exploration_completed = True
+            return
+
+        self.route, self.route_state = route[1:], route_state
+        if self.return_budget is not None:
+            self.return_budget -= 1
+        side = self.bot.no_of_squares_per_side
+        best = (route[0] // side, route[0] % side)
+        if best == (self.x, self.y):
+            # The side behind the bot is the last one to sense here
+            self.turn_right()
+        elif best == self.tile_in_the_direction((self.direction + 1) % 4):
+            self.go_to_right()
+        elif best == self.tile_in_the_direction(self.direction):
+            self.go_forward()
+        elif best == self.tile_in_the_direction((self.direction - 1) % 4):
+            self.go_to_left()
+        else:
+            self.go_backward()
+
+    def route_towards(self, targets: set, remaining, limit: int = None) -> list:
+        """Breadth first search from the bot (unknown walls open) for the target cell with the least distance
+        from the bot plus remaining(cell), then the nearest one. Cells where that sum is over limit are skipped.
+        Returns the cells of the way to it (only the bot's cell if it is the target), None if there is none."""
+
+        side = self.bot.no_of_squares_per_side
+        bot_cell = self.x * side + self.y
+        links, walls = self.optimistic.links, self.optimistic.walls
+        parents = array("l", [-1]) * (side * side)
+        parents[bot_cell] = bot_cell
+        queue = [bot_cell]
+        best, best_key = None, None
+        distance, last_of_distance = 0, 0  # Distance from the bot of the cells up to queue[last_of_distance]
+        for index, cell in enumerate(queue):
+            if index > last_of_distance:
+                distance, last_of_distance = distance + 1, len(queue) - 1
+            if best_key is not None and distance >= best_key[0] or limit is not None and distance > limit:
+                # Cells further away can not have a smaller sum
+                break
+            if cell in targets:
+                total = distance + remaining(cell)
+                if (limit is None or total <= limit) and (best_key is None or (total, distance) < best_key):
+                    best, best_key = cell, (total, distance)
+            for node, wall in links[cell]:
+                if not walls[wall] and parents[node] == -1:
+                    parents[node] = cell
+                    queue.append(node)
+        if best is None:
+            return None
+        route = [best]
+        while parents[route[-1]] != bot_cell:
+            route.append(parents[route[-1]])
+        return route[::-1]
+
+    def useful_frontier(self) -> set:
+        """Cells with unsensed sides on a shortest optimistic path between the start and the goal region (empty
+        if the shortest path is proven). Also updates bounds."""
+
+        self.optimistic.compute()
+        self.pessimistic.compute()
+        start = self.optimistic.start
+        optimistic, pessimistic = self.optimistic.distance(start), self.pessimistic.distance(start)
+        self.bounds = optimistic, pessimistic
+        if optimistic == -1 or optimistic == pessimistic:
+            return set()
+
+        if self.on_path_walls != self.walls_found:
+            # Going from the start to a neighbor one cell closer to the goal region stays on a shortest path (these
+            # cells are consistent after compute as their keys are below the start's)
+            g, links, walls = self.optimistic.g, self.optimistic.links, self.optimistic.walls
+            self.on_path = [start]
+            on_path = {start}
+            for cell in self.on_path:
+                closer = g[cell] - 1
+                for node, wall in links[cell]:
+                    if not walls[wall] and g[node] == closer and node not in on_path:
+                        on_path.add(node)
+                        self.on_path.append(node)
+            self.on_path_walls = self.walls_found
+        unsensed_sides = self.unsensed_sides
+        return {cell for cell in self.on_path if unsensed_sides[cell]}
+
+    def known_neighbors(self):
+        """Neighbors function of the sides sensed open, so run_to_point follows the best known path"""
+        return planner.grid_neighbors(self.walls_x | ~self.known_x, self.walls_y | ~self.known_y)
+
+    def add_walls(self):
+        """Add walls around the bot and mark the sensed sides (and the side it came through) as known"""
+        super().add_walls()
+        this_node = (self.x, self.y)
+        if self.previous_cell is not None and self.previous_cell != this_node:
+            self.mark_known(self.previous_cell, this_node)
+        self.previous_cell = this_node
+        for direction, sensor in ((self.direction, self.bot.front_sensor),
+                                  ((self.direction + 1) % 4, self.bot.right_sensor),
+                                  ((self.direction - 1) % 4, self.bot.left_sensor)):
+            if RAY_SENSING and self.bot.noise is None:
+                self.sense_ray(direction, self.sensor_cache.read(sensor))
+            else:
+                self.mark_known(this_node, self.tile_in_the_direction(direction))
+
+    def sense_ray(self, direction: int, distance: int):
+        """Mark the sides passed by a distance reading as known, and the wall it ends at"""
+        step_x, step_y = Direction.OFFSETS[direction]
+        cell = (self.x, self.y)
+        for _ in range(distance // self.bot.cell_side_length):
+            ahead = (cell[0] + step_x, cell[1] + step_y)
+            self.mark_known(cell, ahead)
+            cell = ahead
+        ahead = (cell[0] + step_x, cell[1] + step_y)
+        if distance < robot.MAX_SIGNAL_DIST - 1:
+            # Otherwise the wall may be further away
+            self.add_wall_between(cell, ahead)
+            self.mark_known(cell, ahead)
+
+    def add_wall_between(self, a: tuple, b: tuple):
+        known = b in self.walls.get(a, ())
+        super().add_wall_between(a, b)
+        if known or a not in self.walls or b not in self.walls[a]:
+            # Already known or out of range
+            return
+        side = self.bot.no_of_squares_per_side
+        self.optimistic.add_wall(a[0] * side + a[1], b[0] * side + b[1])
+        self.walls_found += 1
+
+    def mark_known(self, a: tuple, b: tuple):
+        """Mark the side between neighbors a and b as sensed (walls must already be added)"""
+        side = self.bot.no_of_squares_per_side
+        # Skip if out of range
+        if not (0 <= a[0] < side and 0 <= a[1] < side and 0 <= b[0] < side and 0 <= b[1] < side):
+            return
+        if a[1] == b[1] and abs(a[0] - b[0]) == 1:
+            known, wall = self.known_x, self.walls_x
+            index = (min(a[0], b[0]), a[1])
+        elif a[0] == b[0] and abs(a[1] - b[1]) == 1:
+            known, wall = self.known_y, self.walls_y
+            index = (a[0], min(a[1], b[1]))
+        else:
+            return
+        if known[index]:
+            return
+        known[index] = True
+        a, b = a[0] * side + a[1], b[0] * side + b[1]
+        self.unsensed_sides[a] -= 1
+        self.unsensed_sides[b] -= 1
+        if not wall[index]:
+            self.pessimistic.open_side(a, b)
+
+    def script_stats(self) -> dict:
+        """Optimistic and pessimistic shortest path lengths (cells, -1 if no path) when exploration ended (the
+        path is proven if they agree) and node expansions of both searches"""
+        optimistic, pessimistic = self.bounds
+        return dict(optimistic_path_cells=optimistic, pessimistic_path_cells=pessimistic,
+                    path_proven=optimistic != -1 and optimistic == pessimistic,
+                    expansions=self.optimistic.expanded + self.pessimistic.expanded)
+
+    def show_debug_data(self, img: numpy.array):
+        """Show walls and optimistic distances to the goal in a separate window"""
+        if self.optimistic is not None:
+            side = self.bot.no_of_squares_per_side
+            self.flooded_grid = [[self.optimistic.distance(x * side + y) for y in range(side)] for x in range(side)]
+        super().show_debug_data(img)
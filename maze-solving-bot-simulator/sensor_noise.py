@@ -0,0 +1,68 @@
+import numpy
+
+# Distance the IR sensors give when they see no barrier (Robot sensors give max_signal_dist - 1)
+DROPOUT_DISTANCE = 999
+# Random numbers are drawn in blocks of this size (one numpy call per block instead of per reading)
+BLOCK_SIZE = 1024
+
+JITTER = 0
+DROPOUT = 1
+FALSE_WALL = 2
+
+
+class NoiseModel:
+    """Noise of the distance sensors of a bot (set as bot.noise).
+
+    jitter -- Standard deviation of the gaussian noise added to each distance (pixels)
+    dropout -- Probability that a reading is lost (the sensor sees no barrier)
+    false_wall -- Probability that a reading sees a wall right at the side of the cell
+    seed -- Seed of the noise. Each kind of noise has its own random stream spawned from it (or give a
+            (jitter, dropout, false wall) tuple of seeds), so changing one probability does not change the others.
+    """
+
+    def __init__(self, jitter: float = 0.0, dropout: float = 0.0, false_wall: float = 0.0, seed=0):
+        self.jitter = jitter
+        self.dropout = dropout
+        self.false_wall = false_wall
+        if isinstance(seed, (tuple, list)):
+            seed_sequences = [numpy.random.SeedSequence(stream_seed) for stream_seed in seed]
+        else:
+            seed_sequences = numpy.random.SeedSequence(seed).spawn(3)
+        self._generators = [numpy.random.default_rng(seed_sequence) for seed_sequence in seed_sequences]
+        self._blocks = [None] * 3
+        self._next = [BLOCK_SIZE] * 3
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.jitter or self.dropout or self.false_wall)
+
+    def _draw(self, stream: int) -> float:
+        """Next random number of a stream (standard normal for jitter, uniform in [0, 1) otherwise)"""
+
+        if self._next[stream] == BLOCK_SIZE:
+            generator = self._generators[stream]
+            if stream == JITTER:
+                self._blocks[stream] = generator.standard_normal(BLOCK_SIZE).tolist()
+            else:
+                self._blocks[stream] = generator.random(BLOCK_SIZE).tolist()
+            self._next[stream] = 0
+        value = self._blocks[stream][self._next[stream]]
+        self._next[stream] += 1
+        return value
+
+    def distance(self, distance: int, cell_side_length: int) -> int:
+        """Noisy reading of a sensor whose exact reading is distance"""
+
+        jitter = self._draw(JITTER) if self.jitter else 0.0
+        dropout = self.dropout and self._draw(DROPOUT) < self.dropout
+        false_wall = self.false_wall and self._draw(FALSE_WALL) < self.false_wall
+        if dropout:
+            return DROPOUT_DISTANCE
+        if false_wall:
+            return cell_side_length // 2
+        if jitter:
+            return min(max(int(round(distance + self.jitter * jitter)), 0), DROPOUT_DISTANCE)
+        return distance
+
+    def __repr__(self):
+        return "NoiseModel(jitter={}, dropout={}, false_wall={})".format(self.jitter, self.dropout, self.false_wall)
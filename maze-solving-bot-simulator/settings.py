@@ -9,3 +9,18 @@ settingsStartY = 1
 settingsFaceDirection = Direction.EAST
 settingsGridSideSquares = 14
 settingsSrcClass = OptimizedFloodFill
+# Side of the square goal region in the middle of the maze (2 for the 2x2 goal of micromouse mazes, 1 for one cell)
+settingsGoalSize = 2
+# Run without drawing and key waits (can also be set with --headless)
+settingsHeadless = False
+# Sense walls from the compiled maze next to the image (can also be set with --compiled)
+settingsUseCompiledMaze = False
+# Show at most this many frames per second, None for no limit (can also be set with --max-fps)
+settingsMaxFps = None
+# Simulated seconds per wall second when the simulation is shown, None for as fast as possible
+# (can also be set with --speed, headless runs are not slowed down unless --speed is given)
+settingsRealTimeFactor = 5
+# Continue after "press any key" pauses of the scripts by itself (can also be set with --wait-for-keys)
+settingsAutoAdvance = True
+# Keep filtered maze images in a cache (filter_cache.CACHE_DIR) instead of filtering at every start
+settingsUseFilterCache = True
@@ -0,0 +1,92 @@
+import time
+
+# real_time_factor of a clock which never waits
+UNLIMITED = None
+# Wall seconds (at real time) an auto-advanced "press any key" pause is shown for
+PAUSE_TIME = 1.0
+
+
+class SimulationClock:
+    """Simulated time of a bot in seconds. Bot actions advance it by their estimated time (planner costs)
+    and script sleeps by their duration, so it does not depend on how fast the simulation runs.
+
+    real_time_factor -- Wall time is held back to simulated time divided by this
+                        (1 = real time, 10 = ten times faster, UNLIMITED = as fast as possible)
+    auto_advance -- Continue after "press any key" pauses by itself (pause_time wall seconds at real time)
+    wait_key -- Function waiting milliseconds for a key press and returning it (eg: utils.wait_key),
+                used for waiting when the simulation is shown. Without it, time.sleep is used.
+    """
+
+    def __init__(self, real_time_factor: float = UNLIMITED, auto_advance: bool = True,
+                 pause_time: float = PAUSE_TIME, wait_key=None):
+        self.time = 0.0
+        self.real_time_factor = real_time_factor
+        self.auto_advance = auto_advance
+        self.pause_time = pause_time
+        self.wait_key = wait_key
+        # Wall time and simulated time the wall clock is synced from
+        self._wall_start = None
+        self._time_start = 0.0
+
+    def advance(self, seconds: float):
+        """Simulated time passes (does not wait)"""
+        self.time += seconds
+
+    def sleep(self, milliseconds: int) -> int:
+        """The bot does nothing for milliseconds. Returns the pressed key or -1."""
+        self.advance(milliseconds / 1000)
+        return self.sync()
+
+    def sync(self) -> int:
+        """Wait until wall time catches up with simulated time. Returns the pressed key or -1."""
+
+        if self.real_time_factor is UNLIMITED:
+            return self._hold(0.0)
+        now = time.perf_counter()
+        if self._wall_start is None:
+            self._restart(now)
+        behind = (self.time - self._time_start) / self.real_time_factor - (now - self._wall_start)
+        return self._hold(behind)
+
+    def pause(self) -> int:
+        """A "press any key" pause. Simulated time does not pass. Returns the pressed key or -1."""
+
+        if self.auto_advance:
+            key = self._hold(0.0 if self.real_time_factor is UNLIMITED else self.pause_time / self.real_time_factor)
+        else:
+            key = self.wait_key(0) if self.wait_key is not None else -1
+        # Wall time spent in the pause is not caught up with
+        self._restart(time.perf_counter())
+        return key
+
+    def wait(self, timeout: int = None) -> int:
+        """Wait of a script: None syncs, 0 is a pause and other timeouts are sleeps (milliseconds)"""
+
+        if timeout is None:
+            return self.sync()
+        if timeout == 0:
+            return self.pause()
+        return self.sleep(timeout)
+
+    def _hold(self, seconds: float) -> int:
+        """Wait seconds of wall time (a key check only if not positive)"""
+
+        if self.wait_key is None:
+            if seconds > 0:
+                time.sleep(seconds)
+            return -1
+        # wait_key(0) waits forever, so wait at least a millisecond
+        end = time.perf_counter() + seconds
+        key = self.wait_key(max(int(seconds * 1000), 1))
+        remaining = end - time.perf_counter()
+        if key == -1 and seconds > 0 and remaining > 0:
+            # wait_key may return at once (eg: when headless)
+            time.sleep(remaining)
+        return key
+
+    def _restart(self, now: float):
+        self._wall_start = now
+        self._time_start = self.time
+
+    def __repr__(self):
+        return "SimulationClock(time={:.2f}, real_time_factor={})".format(self.time, self.real_time_factor)
@@ -0,0 +1,73 @@
+import time
+
+import numpy
+
+import robot
+import utils
+from datatypes import SimulationResult, SimulationRunStatus
+
+
+def create_robot(img: numpy.array, x: int, y: int, direction: int, grid_side_squares: int,
+                 max_steps: int = None, filters: tuple = None) -> robot.Robot:
+    """Filters the maze image and places a bot in it.
+    If filters (wall_map, ground_map) are given (eg: from filter_cache), they are used instead and img can be None."""
+
+    if filters is None:
+        filters = utils.apply_vision_filter(img), utils.apply_ground_filter(img)
+    walls, ground = filters
+    return robot.Robot(x=x, y=y, direction=direction, wall_map=walls, ground_map=ground,
+                       no_of_squares_per_side=grid_side_squares,
+                       cell_side_length=len(walls) // grid_side_squares, max_steps=max_steps)
+
+
+def create_compiled_robot(maze, x: int, y: int, direction: int, max_steps: int = None) -> robot.Robot:
+    """Places a bot in a compiled maze (maze_compiler.CompiledMaze). No image filtering is needed."""
+
+    return robot.Robot(x=x, y=y, direction=direction, wall_map=None, ground_map=None,
+                       no_of_squares_per_side=maze.no_of_squares_per_side,
+                       cell_side_length=maze.cell_side_length, max_steps=max_steps, maze=maze)
+
+
+def run(src_class, img: numpy.array, bot: robot.Robot, max_loops: int = None) -> SimulationResult:
+    """Runs setup() and loop() of a user script until it stops the simulation
+    (or max_loops loops ran or the bot hit its step limit) and returns the run statistics.
+    img can be None when headless."""
+
+    # Initialize user bot scripts
+    src = src_class(bot)
+
+    start_time = time.perf_counter()
+    # Run setup
+    loops = 0
+    finished = False
+    try:
+        src.setup()
+        # Copied once, the screen only redraws the area around the bot each refresh
+        loop_img = None if img is None else numpy.copy(img)
+        while max_loops is None or loops < max_loops:
+            # Refresh Screen
+            utils.refresh_screen(loop_img, bot)
+            ret = src.loop(loop_img)
+            loops += 1
+            if ret == SimulationRunStatus.STOP_SIMULATION:
+                # If stop simulation signal, Exit
+                finished = True
+                break
+    except robot.StepLimitExceeded:
+        pass
+    elapsed_time = time.perf_counter() - start_time
+    return result_of(src, bot, loops, elapsed_time, finished)
+
+
+def result_of(src, bot: robot.Robot, loops: int, elapsed_time: float, finished: bool) -> SimulationResult:
+    """Run statistics of a user script and its bot"""
+
+    # Scripts not based on the base scripts may not have a sensor cache
+    sensor_cache = getattr(src, "sensor_cache", None)
+    script_stats = getattr(src, "script_stats", None)
+    return SimulationResult(steps=bot.steps, turns=bot.turns, sensor_reads=bot.sensor_reads, loops=loops,
+                            elapsed_time=elapsed_time, finished=finished, phase_steps=dict(bot.phase_steps),
+                            sensor_cache_hits=sensor_cache.hits if sensor_cache else 0,
+                            sensor_cache_misses=sensor_cache.misses if sensor_cache else 0,
+                            phase_time=dict(bot.phase_time), simulated_time=bot.clock.time,
+                            script_stats=script_stats() if script_stats else None)
@@ -1,9 +1,61 @@
+import hashlib
+import time
+
 import cv2
 import numpy
 
 import robot
 from datatypes import Direction
 
+WINDOW_NAME = 'maze-solving-bot-simulator'
+
+# When headless, nothing is drawn and no key waits happen (set by run.py)
+HEADLESS = False
+
+# Side of the square goal region in the middle of the maze in cells (set from settings.py by the runners)
+GOAL_SIZE = 2
+
+# Filter parameters (filter_cache.py keys cached filter outputs on these)
+VISION_BLUR_SIZE = 5
+VISION_THRESHOLD_BLOCK_SIZE = 5
+VISION_THRESHOLD_C = 3
+VISION_KERNEL_SIZE = 3
+GROUND_HSV_LOWER = (0, 200, 0)
+GROUND_HSV_UPPER = (100, 255, 255)
+
+
+def set_headless(headless: bool):
+    """Enables/disables headless (render-free) mode"""
+    global HEADLESS
+    HEADLESS = headless
+
+
+def set_goal_size(goal_size: int):
+    """Sets the side of the goal region scripts search for"""
+    global GOAL_SIZE
+    GOAL_SIZE = goal_size
+
+
+def goal_cells(no_of_squares_per_side: int) -> list:
+    """(x, y) cells of the goal region, centered in the maze (the N // 2 cell if GOAL_SIZE is 1).
+    Scripts see the maze mirrored or rotated depending on the start, which does not move a centered region."""
+    first = no_of_squares_per_side // 2 - GOAL_SIZE // 2
+    return [(x, y) for x in range(first, first + GOAL_SIZE) for y in range(first, first + GOAL_SIZE)]
+
+
+def wait_key(timeout: int) -> int:
+    """Waits timeout milliseconds for a key press. Returns -1 immediately when headless."""
+    if HEADLESS:
+        return -1
+    return cv2.waitKey(timeout)
+
+
+def show_image(window_name: str, img: numpy.array):
+    """Shows an image in a window. Does nothing when headless."""
+    if HEADLESS:
+        return
+    cv2.imshow(window_name, img)
+
 
 def open_image(filename):
     """"Opens an image in disk"""
@@ -11,46 +63,123 @@ def open_image(filename):
     return img
 
 
+def content_hash(filename: str) -> bytes:
+    """128 bit hash of a file's contents (identifies a maze image independent of its name)"""
+    with open(filename, "rb") as file:
+        return hashlib.blake2b(file.read(), digest_size=16).digest()
+
+
+class Renderer:
+    """Keeps a frame buffer of the maze image. When the bot moves, only the area under the bot's
+    previous position is restored from the image before drawing the bot again."""
+
+    def __init__(self, window_name: str = WINDOW_NAME, max_fps: float = None):
+        self.window_name = window_name
+        self.max_fps = max_fps
+        self._background: numpy.array = None
+        self._frame: numpy.array = None
+        self._dirty: tuple = None
+        self._last_shown = 0.0
+
+    def invalidate(self):
+        """Redraw the full image next time (call after drawing on the image)"""
+        self._background = None
+
+    def draw(self, img: numpy.array, bot: robot.Robot, edit_function=None) -> numpy.array:
+        """Draw bot on the frame buffer and return the frame buffer"""
+
+        if edit_function is not None or img is not self._background or self._frame.shape != img.shape:
+            # Different image, copy everything once
+            self._frame = numpy.copy(img)
+            if edit_function is not None:
+                self._frame = edit_function(self._frame)
+                img = None
+            self._background = img
+        elif self._dirty is not None:
+            top, bottom, left, right = self._dirty
+            self._frame[top:bottom, left:right] = self._background[top:bottom, left:right]
+
+        draw_robot(bot, self._frame)
+        self._dirty = robot_area(bot, self._frame.shape)
+        return self._frame
+
+    def show(self, img: numpy.array, bot: robot.Robot, edit_function=None):
+        """Draw bot and show the frame unless frame rate is above max_fps"""
+        self.present(self.draw(img, bot, edit_function))
+
+    def present(self, frame: numpy.array):
+        """Show a drawn frame unless frame rate is above max_fps"""
+
+        now = time.perf_counter()
+        if self.max_fps is not None and now - self._last_shown < 1 / self.max_fps:
+            return
+        self._last_shown = now
+        show_image(self.window_name, frame)
+
+
+SCREEN = Renderer()
+# recorder.VideoRecorder receiving the drawn frames (also when headless)
+RECORDER = None
+
+
+def set_max_fps(max_fps: float):
+    """Limit how many frames are shown per second (None for no limit). Simulation speed is not affected."""
+    SCREEN.max_fps = max_fps
+
+
+def set_recorder(recorder):
+    """Record refreshed frames with a recorder.VideoRecorder (None to stop recording)"""
+    global RECORDER
+    RECORDER = recorder
+
+
 def refresh_screen(img: numpy.array, bot: robot.Robot, edit_function=None):
     """Refreshes Screen. Adds bot position."""
 
-    copy = numpy.copy(img)
-    if edit_function is not None:
-        copy = edit_function(copy)
-    bot_added = draw_robot(bot, copy)
-    cv2.imshow('maze-solving-bot-simulator', bot_added)
+    recording = RECORDER is not None and img is not None and RECORDER.wants(bot)
+    if HEADLESS and not recording:
+        return
+    frame = SCREEN.draw(img, bot, edit_function)
+    if recording:
+        RECORDER.write(frame)
+    if not HEADLESS:
+        SCREEN.present(frame)
+
+
+def robot_area(bot: robot.Robot, shape: tuple) -> tuple:
+    """(top, bottom, left, right) of the image area draw_robot draws on"""
+
+    center_x, center_y = bot._center_pixel()
+    # Circle reaches 0.45 of the cell from the center, and a pixel more for the outline
+    reach = int(bot.cell_side_length * 0.5) + 2
+    return (max(center_y - reach, 0), min(center_y + reach, shape[0]),
+            max(center_x - reach, 0), min(center_x + reach, shape[1]))
 
 
 def draw_robot(bot: robot.Robot, img: numpy.array):
     """Draws a robot in the image"""
 
-    middle = bot._center_point()
-
-    rect_start = middle - bot.cell_side_length * 0.3
-    rect_end = middle + bot.cell_side_length * 0.3
-
-    circle_radius = bot.cell_side_length * 0.2
-    side25p = bot.cell_side_length * 0.25
-    if bot._direction == Direction.EAST:
-        circle_center = middle + (side25p, 0)
-    elif bot._direction == Direction.WEST:
-        circle_center = middle + (-side25p, 0)
-    elif bot._direction == Direction.NORTH:
-        circle_center = middle + (0, -side25p)
-    elif bot._direction == Direction.SOUTH:
-        circle_center = middle + (0, side25p)
-    else:
-        # This never happens
-        circle_center = middle
+    # Same coordinates as bot._center_point(), without creating points
+    side = bot.cell_side_length
+    middle_x = bot._x * side - side * 0.5
+    middle_y = bot._y * side - side * 0.5
+
+    rect_start = (int(middle_x - side * 0.3), int(middle_y - side * 0.3))
+    rect_end = (int(middle_x + side * 0.3), int(middle_y + side * 0.3))
+
+    circle_radius = side * 0.2
+    side25p = side * 0.25
+    step_x, step_y = Direction.OFFSETS[bot._direction]
+    circle_center = (int(middle_x + step_x * side25p), int(middle_y + step_y * side25p))
 
     color_black = (0, 0, 0)
     color_orange = (23, 74, 230)
 
-    cv2.rectangle(img, tuple(rect_start), tuple(rect_end), color_orange, cv2.FILLED)
-    cv2.rectangle(img, tuple(rect_start), tuple(rect_end), color_black, 1)
+    cv2.rectangle(img, rect_start, rect_end, color_orange, cv2.FILLED)
+    cv2.rectangle(img, rect_start, rect_end, color_black, 1)
 
-    cv2.circle(img, tuple(circle_center), int(circle_radius), bot._ball_color, cv2.FILLED)
-    cv2.circle(img, tuple(circle_center), int(circle_radius), color_black, 1)
+    cv2.circle(img, circle_center, int(circle_radius), bot._ball_color, cv2.FILLED)
+    cv2.circle(img, circle_center, int(circle_radius), color_black, 1)
 
     return img
 
@@ -59,9 +188,10 @@ def apply_vision_filter(img):
     """Apply a filtered image to use for sensor functionality"""
 
     greyscale = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    blurred = cv2.medianBlur(greyscale, 5)
-    threshholded = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 5, 3)
-    kernel = numpy.ones((3, 3), numpy.uint8)
+    blurred = cv2.medianBlur(greyscale, VISION_BLUR_SIZE)
+    threshholded = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+                                         VISION_THRESHOLD_BLOCK_SIZE, VISION_THRESHOLD_C)
+    kernel = numpy.ones((VISION_KERNEL_SIZE, VISION_KERNEL_SIZE), numpy.uint8)
     dilated = cv2.dilate(threshholded, kernel, iterations=1)
     eroded = cv2.erode(dilated, kernel, iterations=1)
     return eroded
@@ -71,7 +201,7 @@ def apply_ground_filter(img):
     """ Apply a ground image to use for sensor functionality. Currently tuned for [255,242,0] (yellow)"""
 
     hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    lower_yellow = numpy.array([0, 200, 0])
-    upper_yellow = numpy.array([100, 255, 255])
+    lower_yellow = numpy.array(GROUND_HSV_LOWER)
+    upper_yellow = numpy.array(GROUND_HSV_UPPER)
     mask = cv2.inRange(hsv, lower_yellow, upper_yellow)
     return mask
@@ -0,0 +1,255 @@
+import argparse
+import time
+
+import cv2
+import numpy
+
+import batch
+import bot_trace
+import filter_cache
+import maze_compiler
+import robot
+import settings
+import simulation
+import utils
+from datatypes import Direction, SimulationRunStatus
+
+# Sensors give this distance when it is not below it (same as Robot._read_distance_map)
+MAX_SIGNAL_DIST = robot.MAX_SIGNAL_DIST
+
+
+def _open_runs(open_next: numpy.array) -> numpy.array:
+    """Number of cells that can be passed going right from each cell (open_next[row, col] is whether
+    the bot can go from col to col + 1)"""
+
+    runs = numpy.zeros(open_next.shape, numpy.int64)
+    for col in range(open_next.shape[1] - 2, -1, -1):
+        runs[:, col] = numpy.where(open_next[:, col], runs[:, col + 1] + 1, 0)
+    return runs
+
+
+def build_sensor_table(distance_maps: list = None, ground_map: numpy.array = None, maze=None,
+                       no_of_squares_per_side: int = None, cell_side_length: int = None) -> tuple:
+    """Sensor readings of a bot in every cell, from the distance maps and ground map or from a compiled maze.
+    Returns (distances[row, col, direction], ground[row, col]) with the same values the bot would sense there."""
+
+    if maze is not None:
+        side, length = maze.no_of_squares_per_side, maze.cell_side_length
+        distances = numpy.zeros((side, side, Direction.DIRECTIONS), numpy.int64)
+        # Cells passed before a wall or the maze border, like Robot._read_cell_walls
+        open_to = [maze.walls & maze_compiler.WALL_BITS[direction] == 0 for direction in range(Direction.DIRECTIONS)]
+        open_to[Direction.EAST][:, -1] = False
+        open_to[Direction.WEST][:, 0] = False
+        open_to[Direction.SOUTH][-1, :] = False
+        open_to[Direction.NORTH][0, :] = False
+        distances[..., Direction.EAST] = _open_runs(open_to[Direction.EAST])
+        distances[..., Direction.WEST] = _open_runs(open_to[Direction.WEST][:, ::-1])[:, ::-1]
+        distances[..., Direction.SOUTH] = _open_runs(open_to[Direction.SOUTH].T).T
+        distances[..., Direction.NORTH] = _open_runs(open_to[Direction.NORTH].T[:, ::-1])[:, ::-1].T
+        distances = distances * length + length // 2
+        ground = maze.ground.astype(bool)
+    else:
+        side, length = no_of_squares_per_side, cell_side_length
+        # Sensor position of the bot in each cell (same as Robot._center_point)
+        centers = (numpy.arange(1, side + 1) * length - length * 0.5).astype(int)
+        rows, cols = centers[:, None], centers[None, :]
+        distances = numpy.stack([distance_maps[direction][rows, cols]
+                                 for direction in range(Direction.DIRECTIONS)], axis=-1).astype(numpy.int64)
+        ground = ground_map[rows, cols] == 255
+    distances = numpy.minimum(distances, MAX_SIGNAL_DIST - 1).astype(numpy.uint16)
+    return distances, ground
+
+
+class SimulationWorld:
+    """One maze shared by many bots. Each bot is run by its own script instance and all scripts
+    are stepped in lockstep (one loop() of every script per step).
+
+    The wall, ground and distance maps (or the compiled maze) are loaded once and every bot senses
+    from one shared table of readings per cell. Sensors of all bots are read in one lookup at each step."""
+
+    def __init__(self, wall_map: numpy.array = None, ground_map: numpy.array = None,
+                 no_of_squares_per_side: int = None, maze=None):
+        self.wall_map = wall_map
+        self.ground_map = ground_map
+        self.maze = maze
+        if maze is not None:
+            self.no_of_squares_per_side = maze.no_of_squares_per_side
+            self.cell_side_length = maze.cell_side_length
+            self.distance_maps = None
+        else:
+            self.no_of_squares_per_side = no_of_squares_per_side
+            self.cell_side_length = len(wall_map) // no_of_squares_per_side
+            self.distance_maps = robot.build_distance_maps(wall_map)
+        self.sensor_table = build_sensor_table(self.distance_maps, ground_map, maze,
+                                               self.no_of_squares_per_side, self.cell_side_length)
+        self.bots = []
+        self.scripts = []
+        self.loops = []
+        self.elapsed_time = []
+        self.finished = []
+        self.running = []
+        self._frame = None
+
+    @classmethod
+    def from_image(cls, img: numpy.array, grid_side_squares: int, filters: tuple = None):
+        """World of a maze image. If filters (wall_map, ground_map) are given, they are used and img can be None."""
+
+        if filters is None:
+            filters = utils.apply_vision_filter(img), utils.apply_ground_filter(img)
+        wall_map, ground_map = filters
+        return cls(wall_map, ground_map, grid_side_squares)
+
+    @classmethod
+    def from_compiled(cls, maze):
+        """World of a compiled maze (maze_compiler.CompiledMaze)"""
+        return cls(maze=maze)
+
+    def add_robot(self, src_class, x: int, y: int, direction: int, max_steps: int = None) -> robot.Robot:
+        """Place a bot run by a new instance of src_class. Its setup() runs at the first step."""
+
+        bot = robot.Robot(x=x, y=y, direction=direction, wall_map=self.wall_map, ground_map=self.ground_map,
+                          no_of_squares_per_side=self.no_of_squares_per_side,
+                          cell_side_length=self.cell_side_length, max_steps=max_steps,
+                          distance_maps=self.distance_maps, maze=self.maze, sensor_table=self.sensor_table)
+        self.bots.append(bot)
+        self.scripts.append(src_class(bot))
+        self.loops.append(None)
+        self.elapsed_time.append(0.0)
+        self.finished.append(False)
+        self.running.append(True)
+        return bot
+
+    def sense_all(self) -> tuple:
+        """Readings of every bot in one lookup: (distances[bot, direction] towards each absolute direction,
+        ground[bot]). Sensor counters of the bots are not changed."""
+
+        positions = numpy.array([(bot._y - 1, bot._x - 1) for bot in self.bots], numpy.int64).reshape(-1, 2)
+        distances, ground = self.sensor_table
+        return distances[positions[:, 0], positions[:, 1]], ground[positions[:, 0], positions[:, 1]]
+
+    def poses(self) -> numpy.array:
+        """(x, y, direction) of every bot"""
+        return numpy.array([bot.pose() for bot in self.bots], numpy.int64).reshape(-1, 3)
+
+    def step(self) -> int:
+        """Run one loop() of every running script (setup() first at the first step).
+        Sensors of all bots are read with one sense_all() and handed to the sensor cache of each script,
+        readings after the bot moved in the same loop() are read by the bot itself.
+        Scripts run headless. Returns the number of scripts still running."""
+
+        distances, ground = self.sense_all()
+        headless = utils.HEADLESS
+        utils.set_headless(True)
+        try:
+            for i, src in enumerate(self.scripts):
+                if self.running[i]:
+                    self._prime_sensors(src, self.bots[i], distances[i], ground[i])
+                    self._step_one(i, src)
+        finally:
+            utils.set_headless(headless)
+        return sum(self.running)
+
+    @staticmethod
+    def _prime_sensors(src, bot: robot.Robot, distances: numpy.array, ground: bool):
+        """Hand the readings of sense_all to the sensor cache of a script (if it has one). Bots with sensor noise
+        read their sensors themselves, the table has exact readings."""
+
+        sensor_cache = getattr(src, "sensor_cache", None)
+        if sensor_cache is None or bot.noise is not None:
+            return
+        direction = bot.pose()[2]
+        sensor_cache.prime({
+            bot.front_sensor: (bot_trace.OP_FRONT_SENSOR, int(distances[direction])),
+            bot.right_sensor: (bot_trace.OP_RIGHT_SENSOR, int(distances[(direction + 1) % Direction.DIRECTIONS])),
+            bot.left_sensor: (bot_trace.OP_LEFT_SENSOR, int(distances[(direction - 1) % Direction.DIRECTIONS])),
+            bot.ground_sensor: (bot_trace.OP_OTHER, bool(ground))})
+
+    def _step_one(self, i: int, src):
+        start_time = time.perf_counter()
+        try:
+            if self.loops[i] is None:
+                src.setup()
+                self.loops[i] = 0
+            ret = src.loop(None)
+            self.loops[i] += 1
+            if ret == SimulationRunStatus.STOP_SIMULATION:
+                self.finished[i] = True
+                self.running[i] = False
+        except robot.StepLimitExceeded:
+            self.running[i] = False
+        self.elapsed_time[i] += time.perf_counter() - start_time
+
+    def run(self, max_loops: int = None, on_step=None) -> list:
+        """Step until every script stopped (or max_loops steps ran) and return the run statistics of each bot.
+        on_step(world) is called after each step (eg: to draw the bots)."""
+
+        steps = 0
+        while any(self.running) and (max_loops is None or steps < max_loops):
+            self.step()
+            steps += 1
+            if on_step is not None:
+                on_step(self)
+        return self.results()
+
+    def results(self) -> list:
+        """SimulationResult of each bot so far"""
+        return [simulation.result_of(src, bot, loops or 0, elapsed_time, finished)
+                for src, bot, loops, elapsed_time, finished
+                in zip(self.scripts, self.bots, self.loops, self.elapsed_time, self.finished)]
+
+    def draw(self, img: numpy.array) -> numpy.array:
+        """All bots drawn on one frame (the same frame buffer is reused)"""
+
+        if self._frame is None or self._frame.shape != img.shape:
+            self._frame = numpy.empty_like(img)
+        numpy.copyto(self._frame, img)
+        for bot in self.bots:
+            utils.draw_robot(bot, self._frame)
+        return self._frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run many bots in one maze in lockstep and print their results')
+    parser.add_argument('--scripts', nargs='+', default=batch.DEFAULT_SCRIPTS,
+                        help='Script classes as module.ClassName (one bot each)')
+    parser.add_argument('--copies', type=int, default=1, help='Bots per script')
+    parser.add_argument('--start', type=batch.parse_start, default=None,
+                        help='Start pose X,Y,DIRECTION of every bot (default from settings)')
+    parser.add_argument('--compiled', action='store_true', help='Sense walls from the compiled maze')
+    parser.add_argument('--max-steps', type=int, default=100000, help='Step limit of each bot')
+    parser.add_argument('--max-loops', type=int, default=None, help='Stop after this many lockstep steps')
+    parser.add_argument('--show', action='store_true', help='Show all bots in a window after each step')
+    parser.add_argument('--delay', type=int, default=1, help='Milliseconds to show each step with --show')
+    parser.add_argument('--out', default=None, help='Save the last frame to this file')
+    args = parser.parse_args()
+
+    utils.set_goal_size(settings.settingsGoalSize)
+    if args.compiled:
+        world = SimulationWorld.from_compiled(
+            maze_compiler.load_or_compile(settings.settingsImagePath, settings.settingsGridSideSquares))
+    else:
+        world = SimulationWorld.from_image(None, settings.settingsGridSideSquares,
+                                           filter_cache.load_filters(settings.settingsImagePath))
+    start = args.start or (settings.settingsStartX, settings.settingsStartY, settings.settingsFaceDirection)
+    for script_path in args.scripts:
+        for _ in range(args.copies):
+            world.add_robot(batch.load_class(script_path), *start, max_steps=args.max_steps)
+
+    img = utils.open_image(settings.settingsImagePath) if args.show or args.out else None
+
+    def show(simulation_world: SimulationWorld):
+        cv2.imshow(utils.WINDOW_NAME, simulation_world.draw(img))
+        cv2.waitKey(args.delay)
+
+    start_time = time.perf_counter()
+    results = world.run(args.max_loops, on_step=show if args.show else None)
+    elapsed_time = time.perf_counter() - start_time
+    for script_path, result in zip([path for path in args.scripts for _ in range(args.copies)], results):
+        print(script_path, result)
+    print("{} bots in {:.3f}s".format(len(results), elapsed_time))
+    if args.out:
+        cv2.imwrite(args.out, world.draw(img))
+
+
+if __name__ == '__main__':
+    main()